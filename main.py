@@ -1,7 +1,14 @@
 import argparse
 import time
+from src.analyzer.enrichment_pipeline import EnrichmentPipeline
 from src.analyzer.spotify_analyzer import SpotifyAnalyzer
-from src.report.pdf_generator import PDFGenerator
+from src.data.response_cache import ResponseCache
+from src.data.spotify_client import API_URL, SpotifyClient
+from src.report.pdf_generator import PDFGenerator, CHART_FORMATS
+from src.report.batch_generator import BatchReportGenerator, load_manifest
+from src.report.report_watcher import ReportWatcher
+from src.server.analysis_server import run_server
+from src.utils.metrics import metrics
 from datetime import datetime
 import os
 
@@ -26,13 +33,91 @@ def generate_unique_filename(base_output):
     
     return os.path.join(output_dir, new_filename)
 
+def run_batch(data_folders, args):
+    # One report per export folder, named after the folder
+    jobs = []
+    used_names = set()
+    for data_folder in data_folders:
+        user = os.path.basename(os.path.normpath(data_folder)) or 'export'
+        name, suffix = user, 1
+        while name in used_names:
+            suffix += 1
+            name = f"{user}_{suffix}"
+        used_names.add(name)
+        base_output = os.path.join(os.path.dirname(args.output) or 'output',
+                                   f"{name}_{os.path.basename(args.output)}")
+        jobs.append((data_folder, generate_unique_filename(base_output)))
+
+    print(f"Generating {len(jobs)} reports in batch mode...")
+    batch = BatchReportGenerator(jobs, args.max_items, args.chart_format, args.workers, args.timezone,
+                                 args.audio_features, args.genres)
+    batch.run()
+    batch.print_summary()
+
 def main():
     parser = argparse.ArgumentParser(description='Create mood-based playlist recommendations from Spotify listening history')
-    parser.add_argument('data_folder', help='Folder containing your Spotify JSON data export files')
+    parser.add_argument('data_folder', nargs='*',
+                        help='Folder containing your Spotify JSON data export files (several folders enable batch mode)')
+    parser.add_argument('--manifest', help='Text file listing export folders to process in batch mode, one per line')
+    parser.add_argument('--workers', type=int, help='Number of worker processes in batch mode')
     parser.add_argument('--output', default=os.path.join('output', 'spotify_analysis.pdf'), help='Output PDF file')
     parser.add_argument('--max-items', type=int, default=20, help='Maximum items in each category')
+    parser.add_argument('--chart-format', choices=CHART_FORMATS, default='vector',
+                        help='Embed charts as native PDF vector drawings or as rasterized PNGs')
+    parser.add_argument('--timezone', help='Your IANA time zone (e.g. Europe/Prague) for hour-of-day statistics; default UTC')
+    parser.add_argument('--audio-features',
+                        help='Local audio features file (CSV, Parquet or JSON keyed by track URI) used for mood analysis')
+    parser.add_argument('--genres',
+                        help='Artist to genre mapping file (CSV artist,genre,weight or JSON); default is a small bundled one')
+    parser.add_argument('--enrich', action='store_true',
+                        help='Fetch genres and audio features of your top artists and tracks from the Spotify API '
+                             'while the export loads (needs SPOTIPY_CLIENT_ID and SPOTIPY_CLIENT_SECRET)')
+    parser.add_argument('--api-url', default=API_URL, help='Spotify Web API base URL for --enrich (e.g. a local mock)')
+    parser.add_argument('--api-token', help='Access token for --enrich instead of client credentials')
+    parser.add_argument('--store', help='SQLite file caching parsed plays; repeat runs on the same export skip JSON parsing')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and update the report when export files are added or changed')
+    parser.add_argument('--watch-interval', type=float, default=5.0, help='Seconds between folder polls in --watch mode')
+    parser.add_argument('--serve', action='store_true', help='Keep the export loaded and serve queries over HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to bind in --serve mode')
+    parser.add_argument('--port', type=int, default=8000, help='Port to bind in --serve mode')
+    parser.add_argument('--metrics', help='Write per-stage timing and memory metrics to this JSON file')
     args = parser.parse_args()
 
+    data_folders = list(args.data_folder)
+    if args.manifest:
+        data_folders.extend(load_manifest(args.manifest))
+    if not data_folders:
+        parser.error('at least one data folder or --manifest is required')
+    if args.enrich and (args.watch or args.serve or len(data_folders) > 1 or args.manifest):
+        parser.error('--enrich is only supported for single-report runs')
+    if args.enrich and not args.api_token and not (os.environ.get('SPOTIPY_CLIENT_ID')
+                                                   and os.environ.get('SPOTIPY_CLIENT_SECRET')):
+        parser.error('--enrich needs SPOTIPY_CLIENT_ID and SPOTIPY_CLIENT_SECRET set, or --api-token')
+    if args.enrich and args.store:
+        parser.error('--enrich streams the JSON export and cannot be combined with --store')
+    if args.watch:
+        if len(data_folders) > 1 or args.manifest:
+            parser.error('--watch takes a single data folder')
+        ReportWatcher(data_folders[0], lambda: generate_unique_filename(args.output), args.max_items,
+                      args.chart_format, args.watch_interval, args.timezone, args.audio_features,
+                      args.genres).run()
+        return
+    if args.serve:
+        if len(data_folders) > 1 or args.manifest:
+            parser.error('--serve takes a single data folder')
+        run_server(data_folders[0], args.max_items, args.store, args.host, args.port, args.timezone,
+                   args.audio_features, args.genres)
+        return
+    if len(data_folders) > 1 or args.manifest:
+        if args.metrics:
+            parser.error('--metrics is only supported for single-report runs')
+        run_batch(data_folders, args)
+        return
+
+    if args.metrics:
+        metrics.enable()
+    
     start_time = time.time()
     print("Starting Spotify listening history analysis...")
     
@@ -40,17 +125,31 @@ def main():
     output_file = generate_unique_filename(args.output)
     
     # Initialize and run analyzer
-    analyzer = SpotifyAnalyzer(args.data_folder, args.max_items)
-    analyzer.analyze()
+    analyzer = SpotifyAnalyzer(data_folders[0], args.max_items, store_path=args.store, timezone=args.timezone,
+                               audio_features_path=args.audio_features, genres_path=args.genres)
+    if args.enrich:
+        # Enrichment requests run while the files are still being ingested
+        with SpotifyClient(token=args.api_token, api_url=args.api_url, cache=ResponseCache()) as client:
+            EnrichmentPipeline(analyzer, client).run()
+            print(f"Enriched from the Spotify API: {client.stats['requests']} requests, "
+                  f"{client.stats['cache_hits']} cached")
+    else:
+        analyzer.analyze()
     
     # Generate PDF report
     print("Generating PDF report...")
-    pdf_gen = PDFGenerator(analyzer, output_file)
+    pdf_gen = PDFGenerator(analyzer, output_file, chart_format=args.chart_format)
     pdf_gen.generate_report()
+    analyzer.close()
     
     elapsed_time = time.time() - start_time
     print(f"Analysis complete! Time taken: {elapsed_time:.2f} seconds")
     print(f"Report saved to: {output_file}")
+    
+    if args.metrics:
+        metrics.print_summary()
+        metrics.export_json(args.metrics)
+        print(f"Metrics saved to: {args.metrics}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,106 @@
+from typing import Optional, Tuple
+import numpy as np
+
+# Lists probed per query; more probes raise recall and cost speed, probing all is exact
+DEFAULT_PROBES = 8
+# Below this many vectors a brute-force scan is as fast as probing lists
+MIN_INDEXED_ITEMS = 5000
+KMEANS_ITERATIONS = 10
+# k-means trains on a sample this large; the rest are only assigned to the final centroids
+KMEANS_SAMPLE = 50_000
+# Rows scored against the centroids at once, bounding the (rows x lists) temporary
+ASSIGN_BLOCK = 8192
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for every vector"""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        labels[start:start + ASSIGN_BLOCK] = np.argmax(vectors[start:start + ASSIGN_BLOCK] @ centroids.T, axis=1)
+    return labels
+
+class IVFIndex:
+    """Inverted-file index for inner-product search over unit-length vectors.
+
+    Spherical k-means splits the vectors into about sqrt(n) lists, stored contiguously
+    in list order. A query scores the centroids first and then only the vectors of the
+    `probes` closest lists, so it touches roughly probes / sqrt(n) of the data.
+    """
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, indptr: np.ndarray,
+                 ids: np.ndarray, probes: int = DEFAULT_PROBES):
+        self.centroids = centroids
+        self.indptr = indptr
+        self.ids = ids
+        self.probes = probes
+        # Vectors in list order, so every list is one slice
+        self.vectors = vectors[ids]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, lists: Optional[int] = None, iterations: int = KMEANS_ITERATIONS,
+              probes: int = DEFAULT_PROBES, seed: int = 0) -> 'IVFIndex':
+        rng = np.random.default_rng(seed)
+        lists = max(1, min(lists or int(np.sqrt(len(vectors))), len(vectors)))
+        sample = vectors[rng.choice(len(vectors), min(KMEANS_SAMPLE, len(vectors)), replace=False)]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].astype(np.float32)
+        for _ in range(iterations):
+            labels = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Lists left empty restart from a random sample vector
+            empty = norms[:, 0] == 0
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = sums / np.where(empty[:, None], 1, norms)
+
+        labels = _assign(vectors, centroids)
+        ids = np.argsort(labels, kind='stable')
+        indptr = np.zeros(lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=lists), out=indptr[1:])
+        return cls(vectors, centroids, indptr, ids, probes)
+
+    def _probe(self, queries: np.ndarray, probes: int) -> np.ndarray:
+        """The probes closest lists of every query, as a (queries, probes) array"""
+        probes = min(probes, len(self.centroids))
+        scores = queries @ self.centroids.T
+        return np.argpartition(scores, scores.shape[1] - probes, axis=1)[:, scores.shape[1] - probes:]
+
+    def search(self, query: np.ndarray, k: int = 10, probes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and scores of the (approximately) k best vectors for one query, best first"""
+        lists = self._probe(query[None, :], probes or self.probes)[0]
+        rows = np.concatenate([np.arange(self.indptr[i], self.indptr[i + 1]) for i in lists])
+        scores = self.vectors[rows] @ query
+        k = min(k, len(rows))
+        best = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return self.ids[rows[best]], scores[best]
+
+    def search_batch(self, queries: np.ndarray, k: int = 10,
+                     probes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """search() for many queries at once, as (queries, k) arrays padded with -1 / -inf.
+
+        Queries are grouped by the lists they probe, so every list is scored against all
+        of its queries in one matrix product.
+        """
+        lists = self._probe(queries, probes or self.probes)
+        candidate_ids = np.full((len(queries), lists.shape[1] * k), -1, dtype=np.int64)
+        candidate_scores = np.full(candidate_ids.shape, -np.inf, dtype=np.float32)
+        filled = np.zeros(len(queries), dtype=np.int64)
+        for list_id in np.unique(lists):
+            low, high = self.indptr[list_id], self.indptr[list_id + 1]
+            if high == low:
+                continue
+            members = np.flatnonzero((lists == list_id).any(axis=1))
+            scores = queries[members] @ self.vectors[low:high].T
+            width = min(k, high - low)
+            best = np.argpartition(scores, high - low - width, axis=1)[:, high - low - width:]
+            slots = filled[members, None] + np.arange(width)
+            candidate_ids[members[:, None], slots] = self.ids[low + best]
+            candidate_scores[members[:, None], slots] = np.take_along_axis(scores, best, axis=1)
+            filled[members] += width
+
+        k = min(k, candidate_ids.shape[1])
+        best = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(candidate_scores, best, axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')
+        return (np.take_along_axis(np.take_along_axis(candidate_ids, best, axis=1), order, axis=1),
+                np.take_along_axis(scores, order, axis=1))
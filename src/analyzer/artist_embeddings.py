@@ -0,0 +1,115 @@
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .ann_index import MIN_INDEXED_ITEMS, IVFIndex
+from .artist_graph import ArtistGraph
+from .time_cube import top_k
+
+DIMENSIONS = 32
+# Extra random directions and power iterations of the range finder (Halko et al.)
+OVERSAMPLING = 10
+POWER_ITERATIONS = 4
+# Co-listen entries multiplied at once, bounding the (entries x columns) temporary
+BLOCK_ENTRIES = 1 << 18
+
+def _multiply(indptr: np.ndarray, indices: np.ndarray, values: np.ndarray, dense: np.ndarray) -> np.ndarray:
+    """Sparse CSR matrix times a dense one, in row blocks of about BLOCK_ENTRIES entries"""
+    n = len(indptr) - 1
+    result = np.zeros((n, dense.shape[1]))
+    row = 0
+    while row < n:
+        end = max(int(np.searchsorted(indptr, indptr[row] + BLOCK_ENTRIES, side='right')) - 1, row + 1)
+        low, high = indptr[row], indptr[end]
+        products = values[low:high, None] * dense[indices[low:high]]
+        # reduceat misreads empty rows, so only sum into rows that have entries
+        filled = row + np.flatnonzero(np.diff(indptr[row:end + 1]))
+        if len(filled):
+            result[filled] = np.add.reduceat(products, indptr[filled] - low, axis=0)
+        row = end
+    return result
+
+class ArtistEmbeddings:
+    """Dense low-dimensional artist vectors from the co-listening graph.
+
+    The graph's positive PMI matrix is factorized with a randomized truncated SVD that
+    only ever multiplies the sparse matrix by thin dense blocks. Rows are U * sqrt(S),
+    scaled to unit length, so similarity is a single matrix-vector product. With many
+    artists an IVF index answers nearest() instead of scanning every vector.
+    """
+
+    def __init__(self, names: List[str], vectors: np.ndarray, index: Optional[IVFIndex] = None):
+        self.names = names
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.vectors = vectors
+        self.index = index
+        if index is None and len(names) >= MIN_INDEXED_ITEMS:
+            self.index = IVFIndex.build(vectors)
+
+    @classmethod
+    def from_graph(cls, graph: ArtistGraph, dimensions: int = DIMENSIONS,
+                   oversampling: int = OVERSAMPLING, iterations: int = POWER_ITERATIONS,
+                   seed: int = 0) -> 'ArtistEmbeddings':
+        n = len(graph.names)
+        rank = min(dimensions, n)
+        if graph.edges == 0 or rank == 0:
+            return cls(graph.names, np.zeros((n, dimensions), dtype=np.float32))
+
+        values = ArtistGraph(graph.names, graph.indptr, graph.indices, graph.counts, measure='pmi').scores
+        # The matrix is symmetric, so A^T = A and one product serves both directions
+        product = lambda dense: _multiply(graph.indptr, graph.indices, values, dense)
+        sample = np.random.default_rng(seed).standard_normal((n, min(rank + oversampling, n)))
+        basis = np.linalg.qr(product(sample))[0]
+        for _ in range(iterations):
+            basis = np.linalg.qr(product(basis))[0]
+        small_u, singular, _ = np.linalg.svd(product(basis).T, full_matrices=False)
+        vectors = (basis @ small_u[:, :rank]) * np.sqrt(singular[:rank])
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        padded = np.zeros((n, dimensions), dtype=np.float32)
+        padded[:, :rank] = vectors
+        return cls(graph.names, padded)
+
+    def vector(self, artists: List[str]) -> Optional[np.ndarray]:
+        """Mean direction of the given artists, or None if none of them is known"""
+        rows = [self.ids[artist] for artist in artists if artist in self.ids]
+        if not rows:
+            return None
+        return self.vectors[rows].mean(axis=0)
+
+    def nearest(self, vector: np.ndarray, k: int = 10, exclude: Tuple[str, ...] = (),
+                probes: Optional[int] = None) -> List[Tuple[str, float]]:
+        """The k artists with the highest cosine similarity to a vector, best first"""
+        vector = vector.astype(np.float32)
+        if self.index is not None:
+            ids, scores = self.index.search(vector, k + len(exclude), probes)
+            return [(self.names[i], float(score)) for i, score in zip(ids.tolist(), scores.tolist())
+                    if score > 0 and self.names[i] not in exclude][:k]
+        scores = self.vectors @ vector
+        scores[[self.ids[artist] for artist in exclude if artist in self.ids]] = 0
+        return [(self.names[i], float(scores[i])) for i in top_k(scores, k)]
+
+    def similar(self, artists: List[str], k: int = 10) -> List[Tuple[str, float]]:
+        """Artists closest to the given ones, which are left out of the result"""
+        vector = self.vector(artists)
+        if vector is None:
+            return []
+        return self.nearest(vector, k, exclude=tuple(artists))
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            index = {}
+            if self.index is not None:
+                index = {'centroids': self.index.centroids, 'indptr': self.index.indptr, 'ids': self.index.ids}
+            np.savez(f, names=np.array(self.names, dtype=str), vectors=self.vectors, **index)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'ArtistEmbeddings':
+        with np.load(path) as data:
+            index = None
+            if 'centroids' in data:
+                index = IVFIndex(data['vectors'], data['centroids'], data['indptr'], data['ids'])
+            return cls(data['names'].tolist(), data['vectors'], index)
@@ -0,0 +1,91 @@
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Plays at most this many positions apart within a session count as listened together
+CO_LISTEN_WINDOW = 10
+# Pairs seen fewer times than this are dropped as noise before normalizing
+MIN_CO_LISTENS = 2
+MEASURES = ('cosine', 'pmi')
+
+class ArtistGraph:
+    """Co-listening graph over interned artist ids, stored as a symmetric CSR matrix.
+
+    Row i holds the artists listened to near artist i, in indices[indptr[i]:indptr[i + 1]],
+    with the raw co-listen counts and a normalized similarity score per entry. Nothing
+    dense is ever allocated, so memory grows with the number of distinct pairs only.
+    """
+
+    def __init__(self, names: List[str], indptr: np.ndarray, indices: np.ndarray,
+                 counts: np.ndarray, measure: str = 'cosine'):
+        if measure not in MEASURES:
+            raise ValueError(f"measure must be one of {', '.join(MEASURES)}")
+        self.names = names
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.measure = measure
+        self.scores = self._normalize(measure)
+
+    @classmethod
+    def from_sessions(cls, names: List[str], artist_ids: np.ndarray, session_ids: np.ndarray,
+                      window: int = CO_LISTEN_WINDOW, min_count: int = MIN_CO_LISTENS,
+                      measure: str = 'cosine') -> 'ArtistGraph':
+        """Build from plays in time order: the artist id and session id of every play"""
+        n = len(names)
+        keys = [np.zeros(0, dtype=np.int64)]
+        counts = [np.zeros(0, dtype=np.int64)]
+        # One vectorized pass per offset keeps memory at O(plays + distinct pairs)
+        for offset in range(1, min(window, len(artist_ids) - 1) + 1):
+            same = session_ids[offset:] == session_ids[:-offset]
+            a, b = artist_ids[:-offset][same], artist_ids[offset:][same]
+            distinct = a != b
+            a, b = a[distinct], b[distinct]
+            offset_keys, offset_counts = np.unique(np.minimum(a, b) * n + np.maximum(a, b), return_counts=True)
+            keys.append(offset_keys)
+            counts.append(offset_counts)
+
+        pair_keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        pair_counts = np.bincount(inverse, weights=np.concatenate(counts), minlength=len(pair_keys)).astype(np.int64)
+        frequent = pair_counts >= min_count
+        low, high = np.divmod(pair_keys[frequent], max(n, 1))
+        pair_counts = pair_counts[frequent]
+
+        rows = np.concatenate([low, high])
+        columns = np.concatenate([high, low])
+        order = np.lexsort((columns, rows))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return cls(names, indptr, columns[order], np.concatenate([pair_counts, pair_counts])[order], measure)
+
+    def _normalize(self, measure: str) -> np.ndarray:
+        if len(self.counts) == 0:
+            return np.zeros(0)
+        rows = np.repeat(np.arange(len(self.names)), np.diff(self.indptr))
+        counts = self.counts.astype(np.float64)
+        marginals = np.bincount(rows, weights=counts, minlength=len(self.names))
+        expected = marginals[rows] * marginals[self.indices]
+        if measure == 'cosine':
+            return counts / np.sqrt(expected)
+        # Positive PMI: how much more often a pair co-occurs than if the artists were independent
+        return np.maximum(np.log(counts * self.counts.sum() / expected), 0)
+
+    @property
+    def edges(self) -> int:
+        return len(self.indices) // 2
+
+    def neighbours(self, artist: str, k: int = 10) -> List[Tuple[str, float]]:
+        """The k artists most similar to the given one, best first (top k picked with argpartition)"""
+        artist_id = self.ids.get(artist)
+        if artist_id is None:
+            return []
+        start, end = self.indptr[artist_id], self.indptr[artist_id + 1]
+        scores = self.scores[start:end]
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if k <= 0:
+            return []
+        best = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        # Equal scores (common with PMI on rare pairs) go to the pair heard together more often
+        best = best[np.lexsort((-self.counts[start:end][best], -scores[best]))]
+        return [(self.names[self.indices[start + i]], float(scores[i])) for i in best]
+
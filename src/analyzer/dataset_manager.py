@@ -0,0 +1,117 @@
+import os
+import random
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .snapshot import is_current_snapshot, load_snapshot, save_snapshot
+from .spotify_analyzer import SpotifyAnalyzer
+from ..data.data_loader import DataLoader
+
+# Rough per-entry cost of a dict slot plus the Track instance dict, on top of getsizeof
+DICT_ENTRY_OVERHEAD = 100
+FOOTPRINT_SAMPLE_SIZE = 1000
+
+def estimate_footprint(analyzer: SpotifyAnalyzer) -> int:
+    """Approximate bytes held by an analyzer's aggregates: the track table, extrapolated from a
+    sample of tracks, plus every numpy array the processor holds or has cached"""
+    processor = analyzer.track_processor
+    tracks = list(processor.tracks.items())
+    sample = tracks if len(tracks) <= FOOTPRINT_SAMPLE_SIZE else random.Random(0).sample(tracks, FOOTPRINT_SAMPLE_SIZE)
+
+    per_track = 0
+    for key, track in sample:
+        per_track += (sys.getsizeof(key) + sys.getsizeof(track) + sys.getsizeof(track.__dict__)
+                      + sum(sys.getsizeof(value) for value in track.__dict__.values())
+                      + DICT_ENTRY_OVERHEAD)
+    track_bytes = per_track / len(sample) * len(tracks) if sample else 0
+
+    artist_bytes = sum(sys.getsizeof(artist) + DICT_ENTRY_OVERHEAD for artist in processor.artists)
+    marquee_bytes = sum(
+        sys.getsizeof(artist) + 8
+        for artists in analyzer.marquee_segments.values() for artist in artists
+    )
+    return int(track_bytes + artist_bytes + marquee_bytes) + processor.array_bytes()
+
+class DatasetManager:
+    """Keeps analyzers for many exports in memory within a budget.
+
+    Analyzers are keyed by export fingerprint. When the budget is exceeded the least
+    recently used ones are written to a snapshot and dropped; asking for them again
+    restores the snapshot instead of re-parsing JSON.
+    """
+
+    def __init__(self, memory_budget_mb: float = 512, snapshot_dir: str = os.path.join('.cache', 'snapshots'),
+                 max_items: int = 20, timezone: Optional[str] = None):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.snapshot_dir = snapshot_dir
+        self.max_items = max_items
+        self.timezone = timezone
+        self._loaded: 'OrderedDict[str, SpotifyAnalyzer]' = OrderedDict()
+        self._footprints: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'snapshot_loads': 0, 'json_loads': 0, 'evictions': 0}
+
+    @property
+    def memory_used(self) -> int:
+        return sum(self._footprints.values())
+
+    def get(self, data_folder: str) -> SpotifyAnalyzer:
+        fingerprint = DataLoader(data_folder).fingerprint()
+        with self._lock:
+            analyzer = self._loaded.get(fingerprint)
+            if analyzer is not None:
+                self._loaded.move_to_end(fingerprint)
+                self.stats['hits'] += 1
+                return analyzer
+
+        # Load outside the lock so one slow export does not stall requests for others
+        analyzer = SpotifyAnalyzer(data_folder, self.max_items, timezone=self.timezone)
+        snapshot_path = self._snapshot_path(fingerprint)
+        try:
+            analyzer.track_processor, analyzer.marquee_segments = load_snapshot(snapshot_path)
+            source = 'snapshot_loads'
+        except (FileNotFoundError, ValueError):  # No snapshot yet, or an outdated format
+            analyzer.analyze()
+            source = 'json_loads'
+        # Artist embeddings live next to the snapshot; they are read from there on first use
+        analyzer.track_processor.embeddings_path = self._embeddings_path(fingerprint)
+        footprint = estimate_footprint(analyzer)
+
+        with self._lock:
+            self.stats[source] += 1
+            if fingerprint in self._loaded:  # Loaded concurrently by another caller
+                self._loaded.move_to_end(fingerprint)
+                return self._loaded[fingerprint]
+            self._loaded[fingerprint] = analyzer
+            self._footprints[fingerprint] = footprint
+            evicted = self._evict()
+
+        # Persist outside the lock: snapshots and the factorization can take seconds
+        for fingerprint, evicted_analyzer in evicted:
+            self._persist(fingerprint, evicted_analyzer)
+        return analyzer
+
+    def _evict(self) -> List[Tuple[str, SpotifyAnalyzer]]:
+        """Drop least recently used analyzers until within budget; returns those dropped"""
+        evicted = []
+        # Never evict the most recent entry, even if it alone exceeds the budget
+        while self.memory_used > self.memory_budget and len(self._loaded) > 1:
+            fingerprint, analyzer = self._loaded.popitem(last=False)
+            del self._footprints[fingerprint]
+            evicted.append((fingerprint, analyzer))
+            self.stats['evictions'] += 1
+        return evicted
+
+    def _persist(self, fingerprint: str, analyzer: SpotifyAnalyzer) -> None:
+        snapshot_path = self._snapshot_path(fingerprint)
+        if not os.path.exists(snapshot_path) or not is_current_snapshot(snapshot_path):
+            save_snapshot(analyzer.track_processor, analyzer.marquee_segments, snapshot_path)
+        # Factorize now, off the query path, so a restored analyzer finds them on disk
+        analyzer.track_processor.artist_embeddings()
+
+    def _snapshot_path(self, fingerprint: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{fingerprint}.snapshot")
+
+    def _embeddings_path(self, fingerprint: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{fingerprint}.embeddings.npz")
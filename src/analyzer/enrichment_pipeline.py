@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from .spotify_analyzer import SpotifyAnalyzer
+from ..data.audio_features import URI_PREFIX
+from ..data.data_loader import DataLoader
+from ..data.spotify_client import BATCH_SIZES, Enrichment, SpotifyAPIError, SpotifyClient
+from ..utils.metrics import metrics
+
+# Artists and tracks to enrich: the top ones by listening time, which carry the report
+TOP_ARTISTS = 500
+TOP_TRACKS = 2000
+# Share of each top list counted as settled once an item ranks inside it after two files in
+# a row; items nearer the cut-off often drop out later, and would be fetched for nothing
+SETTLED_SHARE = 0.5
+# While files are still streaming in, tracks are sent in multiples of this many so every
+# call is a full batch for both the tracks and the audio-features endpoint
+TRACK_BATCH = max(BATCH_SIZES['tracks'], BATCH_SIZES['audio-features'])
+# Ingestion order of the data categories, as in SpotifyAnalyzer: extended history first, so
+# tracks are created from the records that carry their URIs
+CATEGORY_ORDER = ('extended_history', 'recent_history', 'marquee', 'playlists')
+
+class EnrichmentPipeline:
+    """Stream an export into the analyzer one file at a time while enriching it from the API.
+
+    Files are decoded and aggregated in a worker thread. After each one, the artists and
+    tracks ranked in the upper part of the top lists both before and after it count as
+    settled, and their API requests start at once, so network waits overlap with ingesting
+    the remaining files. What is left of the final top lists is requested when ingestion ends; the
+    results are joined in before moods are classified.
+
+    An API error does not stop the run: it is reported once, no further requests are made,
+    and the report keeps the local genre map and audio features.
+    """
+
+    def __init__(self, analyzer: SpotifyAnalyzer, client: SpotifyClient,
+                 top_artists: int = TOP_ARTISTS, top_tracks: int = TOP_TRACKS):
+        self.analyzer = analyzer
+        self.client = client
+        self.top_artists = top_artists
+        self.top_tracks = top_tracks
+        self.enrichment = Enrichment()
+        # Settled tracks not sent yet, as (track id, also needed for its artist's genres)
+        self._pending: Dict[str, bool] = {}
+        self._requested: Set[str] = set()
+        self._artists_requested: Set[str] = set()
+        # Tracks already requested without their artist, whose artist is now needed too
+        self._artist_only: Set[str] = set()
+        # Settled candidates after the previous file: the upper part of each top list
+        self._previous: Tuple[Set[str], Set[str]] = (set(), set())
+        self._tasks: List[asyncio.Task] = []
+        # The first API error, after which nothing more is requested or applied
+        self.error: Optional[SpotifyAPIError] = None
+
+    def run(self) -> Enrichment:
+        with metrics.stage('enriched ingest'):
+            return asyncio.run(self._run())
+
+    async def _run(self) -> Enrichment:
+        loader = self.analyzer.data_loader
+        files = sorted(
+            (loader.data_folder / name for name in loader.file_fingerprints() if DataLoader.classify(name)),
+            key=lambda file: CATEGORY_ORDER.index(DataLoader.classify(file.name))
+        )
+        for file in files:
+            await asyncio.to_thread(self.analyzer.ingest_files, [file], False)
+            artists, tracks = self._top(SETTLED_SHARE)
+            self._queue(artists & self._previous[0], tracks & self._previous[1])
+            self._previous = (artists, tracks)
+            self._dispatch(final=False)
+        self._queue(*self._top())
+        self._dispatch(final=True)
+        await asyncio.gather(*self._tasks)
+        # Every track is fetched by now, so the remaining artist lookups can go out
+        await self._enrich_artists(sorted(self._artist_only))
+        self._apply()
+        return self.enrichment
+
+    def _top(self, share: float = 1.0) -> Tuple[Set[str], Set[str]]:
+        """The leading share of the current top artists and top tracks"""
+        processor = self.analyzer.track_processor
+        artists = {artist for artist, _ in Counter(processor.artists).most_common(int(self.top_artists * share))}
+        tracks = {key for key, _ in heapq.nlargest(int(self.top_tracks * share), processor.tracks.items(),
+                                                    key=lambda item: item[1].ms_played)}
+        return artists, tracks
+
+    def _queue(self, artists: Set[str], tracks: Set[str]) -> None:
+        """Queue the URIs of settled tracks, plus each new artist's most played track, whose
+        artist ID leads to the artist's genres"""
+        processor = self.analyzer.track_processor
+        for key in tracks:
+            uri = processor.tracks[key].uri
+            if uri.startswith(URI_PREFIX) and uri[len(URI_PREFIX):] not in self._requested:
+                self._pending.setdefault(uri[len(URI_PREFIX):], False)
+
+        artists -= self._artists_requested
+        if not artists:
+            return
+        best: Dict[str, Tuple[int, str]] = {}
+        for track in processor.tracks.values():
+            if track.artist in artists and track.uri.startswith(URI_PREFIX):
+                if track.ms_played > best.get(track.artist, (-1, ''))[0]:
+                    best[track.artist] = (track.ms_played, track.uri[len(URI_PREFIX):])
+        for artist, (_, track_id) in best.items():
+            if track_id in self._requested:
+                self._artist_only.add(track_id)
+            else:
+                self._pending[track_id] = True
+            self._artists_requested.add(artist)
+
+    def _dispatch(self, final: bool) -> None:
+        """Start requests for the queued tracks: whole batches only, unless ingestion is over.
+        Artists of tracks fetched earlier are looked up on their own, also in whole batches."""
+        fetched = sorted(track_id for track_id in self._artist_only if track_id in self.enrichment.tracks)
+        fetched = fetched[:len(fetched) // BATCH_SIZES['artists'] * BATCH_SIZES['artists']]
+        if fetched:
+            self._artist_only.difference_update(fetched)
+            self._tasks.append(asyncio.create_task(self._enrich_artists(fetched)))
+
+        count = len(self._pending) if final else len(self._pending) // TRACK_BATCH * TRACK_BATCH
+        if not count:
+            return
+        queued = list(self._pending.items())
+        batch, self._pending = queued[:count], dict(queued[count:])
+        self._requested.update(track_id for track_id, _ in batch)
+        self._tasks.append(asyncio.create_task(
+            self._enrich([track_id for track_id, _ in batch], [track_id for track_id, artist in batch if artist])))
+
+    async def _enrich(self, track_ids: List[str], artist_track_ids: List[str]) -> None:
+        tracks, features = await asyncio.gather(
+            self._call(self.client.fetch, 'tracks', track_ids),
+            self._call(self.client.fetch_audio_features, track_ids)
+        )
+        self.enrichment.tracks.update(tracks)
+        self.enrichment.audio_features.update(features)
+        await self._enrich_artists(artist_track_ids)
+
+    async def _enrich_artists(self, track_ids: List[str]) -> None:
+        """Fetch the first credited artist of tracks that were already fetched"""
+        artist_ids = [artist['id'] for track in (self.enrichment.tracks.get(track_id) for track_id in track_ids)
+                      if track for artist in track.get('artists', [])[:1] if artist.get('id')]
+        if artist_ids:
+            self.enrichment.artists.update(await self._call(self.client.fetch, 'artists', artist_ids))
+
+    async def _call(self, fetch: Callable[..., dict], *args) -> dict:
+        """Run a client call in a thread; nothing once an API error has occurred"""
+        if self.error:
+            return {}
+        try:
+            return await asyncio.to_thread(fetch, *args)
+        except SpotifyAPIError as e:
+            if not self.error:
+                self.error = e
+                print(f"Spotify API enrichment failed ({e}); using the local genre map and audio features")
+            return {}
+
+    def _apply(self) -> None:
+        """Use the fetched genres and audio features where no local file provides them, then
+        classify moods, which ingestion left for now. After an API error the partial results
+        are dropped, so the report does not mix fetched and local data."""
+        if self.error:
+            self.analyzer.annotate_tracks()
+            return
+        if self.analyzer.audio_features is None and any(self.enrichment.audio_features.values()):
+            self.analyzer.audio_features = self.enrichment.audio_feature_table()
+        if self.analyzer.genres_path is None and any(self.enrichment.artists.values()):
+            genre_map = self.enrichment.genre_map()
+            if genre_map.artists:
+                self.analyzer.genre_map = genre_map
+        self.analyzer.annotate_tracks()
@@ -0,0 +1,62 @@
+import warnings
+from typing import Dict, List, Optional
+import numpy as np
+
+MOODS = ('Relaxing', 'Energetic', 'Melancholic', 'Happy', 'Focus')
+
+# Listening time per track is binned by local part of day, weekdays then weekends
+DAYPARTS = ('night', 'morning', 'afternoon', 'evening')  # 00-06, 06-12, 12-18, 18-24
+TIME_BINS = 2 * len(DAYPARTS)
+
+# Spotify audio features a track may carry, as 0-1 values (tempo in BPM)
+AUDIO_FEATURES = ('energy', 'valence', 'acousticness', 'instrumentalness', 'tempo')
+
+# How strongly each feature, in standard deviations from the average track, pulls a
+# track towards a mood. Features missing from the matrix simply do not contribute.
+MOOD_WEIGHTS: Dict[str, Dict[str, float]] = {
+    'Relaxing': {'evening': 1.0, 'night': 0.5, 'weekend': 0.5, 'skip_rate': -0.5,
+                 'energy': -1.0, 'acousticness': 1.0, 'tempo': -0.5},
+    'Energetic': {'morning': 0.5, 'afternoon': 0.5, 'skip_rate': 0.5, 'session_minutes': -0.5,
+                  'energy': 1.5, 'tempo': 1.0},
+    'Melancholic': {'night': 1.5, 'evening': 0.5, 'morning': -0.5,
+                    'valence': -1.5, 'energy': -0.5},
+    'Happy': {'weekend': 1.0, 'afternoon': 0.5, 'night': -0.5, 'skip_rate': -0.5,
+              'valence': 1.5, 'energy': 0.5},
+    'Focus': {'morning': 1.0, 'afternoon': 0.5, 'weekend': -1.0, 'session_minutes': 1.5, 'skip_rate': -1.0,
+              'instrumentalness': 1.5},
+}
+
+class MoodEngine:
+    """Linear mood scoring of every track at once.
+
+    Each feature column is standardized (missing values count as average), then one
+    matrix product with the MOOD_WEIGHTS matrix scores every track against every mood.
+    Artists are scored as the listening-time weighted mean of their tracks.
+    """
+
+    def __init__(self, features: np.ndarray, columns: List[str]):
+        self.columns = columns
+        # Tracks with no feature at all (e.g. no timestamps) get no mood
+        self.known = ~np.isnan(features).all(axis=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # Columns with no values at all
+            mean = np.nanmean(features, axis=0)
+            std = np.nanstd(features, axis=0)
+        standardized = np.nan_to_num((features - mean) / np.where(std > 0, std, np.inf))
+        weights = np.array([[MOOD_WEIGHTS[mood].get(column, 0.0) for column in columns] for mood in MOODS])
+        self.scores = standardized @ weights.T
+
+    def track_moods(self) -> List[Optional[str]]:
+        """Best scoring mood per track, None where nothing is known about the track"""
+        best = np.argmax(self.scores, axis=1)
+        return [MOODS[mood] if known else None for mood, known in zip(best.tolist(), self.known.tolist())]
+
+    def artist_scores(self, artist_of_track: np.ndarray, ms_played: np.ndarray, artists: int) -> np.ndarray:
+        """(artists, moods) scores: the ms-weighted mean over each artist's known tracks"""
+        weights = np.where(self.known, ms_played, 0).astype(np.float64)
+        totals = np.bincount(artist_of_track, weights=weights, minlength=artists)
+        scores = np.stack([
+            np.bincount(artist_of_track, weights=weights * self.scores[:, mood], minlength=artists)
+            for mood in range(len(MOODS))
+        ], axis=1)
+        return scores / np.where(totals > 0, totals, 1)[:, None]
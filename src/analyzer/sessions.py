@@ -0,0 +1,76 @@
+from array import array
+from typing import Dict, Optional
+import numpy as np
+
+# A pause longer than this between two plays starts a new listening session
+SESSION_GAP_SECONDS = 30 * 60
+
+class SessionBuilder:
+    """Group time-ordered plays into listening sessions in a single streaming pass.
+
+    A session ends when the next play starts more than gap_seconds after the previous one
+    ended. The only state kept per step is the open session; closed sessions go into
+    compact columns, each referring to a contiguous range of track_ids (plays in time order).
+    A play older than the open session also closes it, so out-of-order input never merges
+    unrelated plays.
+    """
+
+    def __init__(self, gap_seconds: int = SESSION_GAP_SECONDS):
+        self.gap_seconds = gap_seconds
+        self.track_ids = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.firsts = array('q')
+        self.ms_played = array('q')
+        self._open: Optional[list] = None  # [start, end, first play, ms played]
+
+    def add(self, ended_at: int, ms_played: int, track_id: int) -> None:
+        """Feed one play: its end as epoch seconds (Spotify's ts), duration and track id"""
+        started_at = ended_at - ms_played // 1000
+        session = self._open
+        if session is not None and (started_at - session[1] > self.gap_seconds or started_at < session[0]):
+            self._close()
+            session = None
+        if session is None:
+            self._open = [started_at, ended_at, len(self.track_ids), ms_played]
+        else:
+            session[1] = max(session[1], ended_at)
+            session[3] += ms_played
+        self.track_ids.append(track_id)
+
+    def _close(self) -> None:
+        start, end, first, ms_played = self._open
+        self.starts.append(start)
+        self.ends.append(end)
+        self.firsts.append(first)
+        self.ms_played.append(ms_played)
+        self._open = None
+
+    def __len__(self) -> int:
+        return len(self.starts) + (self._open is not None)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """All sessions, the open one included, as numpy columns.
+
+        Plays of session i are track_ids[first[i]:first[i] + plays[i]].
+        """
+        pending = [self._open] if self._open is not None else []
+        starts = np.array(self.starts.tolist() + [s[0] for s in pending], dtype=np.int64)
+        firsts = np.array(self.firsts.tolist() + [s[2] for s in pending], dtype=np.int64)
+        return {
+            'start': starts,
+            'end': np.array(self.ends.tolist() + [s[1] for s in pending], dtype=np.int64),
+            'first': firsts,
+            'plays': np.diff(np.append(firsts, len(self.track_ids))),
+            'ms_played': np.array(self.ms_played.tolist() + [s[3] for s in pending], dtype=np.int64),
+            'track_ids': np.array(self.track_ids, dtype=np.int64),
+        }
+
+    def restore(self, columns: Dict[str, np.ndarray]) -> None:
+        """Load sessions saved from columns(); they are all treated as closed"""
+        self.track_ids = array('q', columns['track_ids'].tolist())
+        self.starts = array('q', columns['start'].tolist())
+        self.ends = array('q', columns['end'].tolist())
+        self.firsts = array('q', columns['first'].tolist())
+        self.ms_played = array('q', columns['ms_played'].tolist())
+        self._open = None
@@ -0,0 +1,235 @@
+"""Compact binary snapshots of analyzed TrackProcessor state.
+
+Layout (native byte order, recorded in the header):
+
+    header   magic (8s) | version (I) | byteorder (B) | pad (3x) | section count (I) | pad (4x)
+    table    per section: name (24s) | typecode (c) | pad (7x) | offset (Q) | item count (Q)
+    data     one 8-byte aligned block per section
+
+Strings (track, artist, album, uri, mood, genre, segment and time zone names) are interned
+into one UTF-8 blob plus an offsets column; id 0 stands for None. Everything else
+is a typed numeric column. Restore reads the columns through a read-only mmap of the
+file and copies each one once into the processor, which owns (and may grow) its
+arrays; the map is closed before the processor is returned.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from .moods import TIME_BINS
+from .track_processor import Track, TrackProcessor
+
+MAGIC = b'SPHSNAP\x00'
+VERSION = 8
+HEADER = struct.Struct('=8sIB3xI4x')
+SECTION = struct.Struct('=24sc7xQQ')
+BYTEORDER = {'little': 0, 'big': 1}
+
+EPOCH = datetime(1970, 1, 1)
+NO_TIMESTAMP = -(2 ** 63)
+NO_DAY = NO_TIMESTAMP
+NO_SIZE = -1
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        string_id = self.ids.get(value)
+        if string_id is None:
+            self.values.append(value)
+            string_id = self.ids[value] = len(self.values)
+        return string_id
+
+    def columns(self) -> Tuple[array, bytes]:
+        encoded = [value.encode('utf-8') for value in self.values]
+        offsets = array('Q', [0])
+        total = 0
+        for chunk in encoded:
+            total += len(chunk)
+            offsets.append(total)
+        return offsets, b''.join(encoded)
+
+def _to_epoch(dt: Optional[datetime]) -> int:
+    return (dt - EPOCH) // timedelta(seconds=1) if dt else NO_TIMESTAMP
+
+def save_snapshot(processor: TrackProcessor, marquee_segments: Dict[str, List[str]], path: str) -> None:
+    """Write analyzed state to disk so it can be restored without re-reading JSON"""
+    strings = _StringTable()
+    tracks = list(processor.tracks.values())
+    play_log = processor.play_log()
+    sessions = processor.sessions.columns()
+    source_files = [processor.partitions.files[name] for name in processor.sources]
+
+    sections = {
+        'track.name': array('I', (strings.intern(t.name) for t in tracks)),
+        'track.artist': array('I', (strings.intern(t.artist) for t in tracks)),
+        'track.album': array('I', (strings.intern(t.album) for t in tracks)),
+        'track.uri': array('I', (strings.intern(t.uri) for t in tracks)),
+        'track.mood': array('I', (strings.intern(t.mood) for t in tracks)),
+        'track.ms_played': array('q', (t.ms_played for t in tracks)),
+        'track.play_count': array('q', (t.play_count for t in tracks)),
+        'track.last_played': array('q', (_to_epoch(t.last_played) for t in tracks)),
+        'track.skip_count': array('q', (t.skip_count for t in tracks)),
+        'track.time_ms': array('q', processor.track_time_ms[:len(tracks)].ravel().tolist()),
+        'artist.name': array('I', (strings.intern(a) for a in processor.artists)),
+        'artist.ms_played': array('q', processor.artists.values()),
+        'genre.name': array('I', (strings.intern(g) for g in processor.genres)),
+        'genre.ms_played': array('q', processor.genres.values()),
+        'marquee.segment': array('I', (strings.intern(segment)
+                                       for segment, artists in marquee_segments.items() for _ in artists)),
+        'marquee.artist': array('I', (strings.intern(artist)
+                                      for artists in marquee_segments.values() for artist in artists)),
+        'hour_of_week.ms': array('q', processor.hour_of_week_ms.tolist()),
+        'hour_of_week.plays': array('q', processor.hour_of_week_plays.tolist()),
+        'daily.first_day': array('q', [NO_DAY if processor.first_day is None else processor.first_day]),
+        'daily.ms': array('q', processor.daily_ms.tolist()),
+        'daily.plays': array('q', processor.daily_plays.tolist()),
+        'plays.track': array('q', play_log[0].tolist()),
+        'plays.day': array('q', play_log[1].tolist()),
+        'plays.ms': array('q', play_log[2].tolist()),
+        'plays.source': array('q', processor.play_sources().tolist()),
+        'source.name': array('I', (strings.intern(name) for name in processor.sources)),
+        'source.weight': array('q', (source.weight for source in source_files)),
+        'source.size': array('q', (source.fingerprint[0] if source.fingerprint else NO_SIZE for source in source_files)),
+        'source.mtime': array('q', (source.fingerprint[1] if source.fingerprint else NO_SIZE for source in source_files)),
+        'sessions.start': array('q', sessions['start'].tolist()),
+        'sessions.end': array('q', sessions['end'].tolist()),
+        'sessions.first': array('q', sessions['first'].tolist()),
+        'sessions.ms_played': array('q', sessions['ms_played'].tolist()),
+        'sessions.track_ids': array('q', sessions['track_ids'].tolist()),
+        'sessions.from_extended': array('B', [processor.sessions_from_extended]),
+        'meta.timezone': array('I', [strings.intern(processor.timezone)]),
+    }
+    offsets, blob = strings.columns()
+    sections['strings.offsets'] = offsets
+    sections['strings.blob'] = array('B', blob)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTEORDER[sys.byteorder], len(sections)))
+        position = HEADER.size + SECTION.size * len(sections)
+        table = []
+        for name, column in sections.items():
+            position += -position % 8
+            table.append(SECTION.pack(name.encode('ascii'), column.typecode.encode('ascii'), position, len(column)))
+            position += len(column) * column.itemsize
+        f.write(b''.join(table))
+        for column in sections.values():
+            f.write(b'\x00' * (-f.tell() % 8))
+            column.tofile(f)
+    os.replace(temp_path, path)
+
+def is_current_snapshot(path: str) -> bool:
+    """True if the file is a snapshot this version can restore"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return False
+    magic, version, byteorder, _ = HEADER.unpack(header)
+    return magic == MAGIC and version == VERSION and byteorder == BYTEORDER[sys.byteorder]
+
+@contextmanager
+def read_sections(path: str) -> Iterator[Dict[str, memoryview]]:
+    """Map a snapshot and yield every section as a typed memoryview into the map.
+
+    The views are only valid inside the with block; the map is closed on exit, so
+    anything kept has to be copied out first.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            memoryview(mapped) as buffer:
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"{path} is not a snapshot file")
+        magic, version, byteorder, count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} (expected {VERSION})")
+        if byteorder != BYTEORDER[sys.byteorder]:
+            raise ValueError("Snapshot was written on a machine with a different byte order")
+
+        sections = {}
+        try:
+            for index in range(count):
+                name, typecode, offset, length = SECTION.unpack_from(buffer, HEADER.size + index * SECTION.size)
+                typecode = typecode.decode('ascii')
+                itemsize = array(typecode).itemsize
+                sections[name.rstrip(b'\x00').decode('ascii')] = \
+                    buffer[offset:offset + length * itemsize].cast(typecode)
+            yield sections
+        finally:
+            # Views still exported would keep the map from closing
+            for view in sections.values():
+                view.release()
+
+def load_snapshot(path: str) -> Tuple[TrackProcessor, Dict[str, List[str]]]:
+    with read_sections(path) as sections:
+        return _restore(sections)
+
+def _restore(sections: Dict[str, memoryview]) -> Tuple[TrackProcessor, Dict[str, List[str]]]:
+    """Build a processor from mapped sections, copying every column it keeps"""
+    offsets = sections['strings.offsets']
+    blob = bytes(sections['strings.blob'])
+    strings: List[Optional[str]] = [None]
+    strings.extend(blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1))
+
+    processor = TrackProcessor(timezone=strings[sections['meta.timezone'][0]])
+    processor.hour_of_week_ms = np.array(sections['hour_of_week.ms'], dtype=np.int64)
+    processor.hour_of_week_plays = np.array(sections['hour_of_week.plays'], dtype=np.int64)
+    first_day = sections['daily.first_day'][0]
+    processor.first_day = None if first_day == NO_DAY else first_day
+    processor.daily_ms = np.array(sections['daily.ms'], dtype=np.int64)
+    processor.daily_plays = np.array(sections['daily.plays'], dtype=np.int64)
+    for name, weight, size, mtime in zip(sections['source.name'], sections['source.weight'],
+                                         sections['source.size'], sections['source.mtime']):
+        processor.source_id(strings[name], weight, (size, mtime) if size != NO_SIZE else None)
+    processor.add_to_play_log(np.array(sections['plays.track']), np.array(sections['plays.day']),
+                              np.array(sections['plays.ms']), np.array(sections['plays.source']))
+    processor.sessions.restore({
+        column: np.array(sections[f'sessions.{column}'], dtype=np.int64)
+        for column in ('start', 'end', 'first', 'ms_played', 'track_ids')
+    })
+    processor.sessions_from_extended = bool(sections['sessions.from_extended'][0])
+    processor.track_time_ms = np.array(sections['track.time_ms'], dtype=np.int64).reshape(-1, TIME_BINS)
+    names = sections['track.name']
+    artists = sections['track.artist']
+    albums = sections['track.album']
+    uris = sections['track.uri']
+    moods = sections['track.mood']
+    ms_played = sections['track.ms_played']
+    play_counts = sections['track.play_count']
+    last_played = sections['track.last_played']
+    skip_counts = sections['track.skip_count']
+    for i in range(len(names)):
+        track = Track(
+            name=strings[names[i]],
+            artist=strings[artists[i]],
+            album=strings[albums[i]],
+            uri=strings[uris[i]],
+            ms_played=ms_played[i],
+            play_count=play_counts[i],
+            last_played=EPOCH + timedelta(seconds=last_played[i]) if last_played[i] != NO_TIMESTAMP else None,
+            mood=strings[moods[i]],
+            skip_count=skip_counts[i]
+        )
+        key = f"{track.name}:{track.artist}"
+        processor.tracks[key] = track
+        processor.track_ids[key] = i
+
+    processor.artists = dict(zip((strings[i] for i in sections['artist.name']), sections['artist.ms_played']))
+    processor.genres = dict(zip((strings[i] for i in sections['genre.name']), sections['genre.ms_played']))
+
+    marquee_segments: Dict[str, List[str]] = {}
+    for segment, artist in zip(sections['marquee.segment'], sections['marquee.artist']):
+        marquee_segments.setdefault(strings[segment], []).append(strings[artist])
+
+    return processor, marquee_segments
@@ -1,19 +1,27 @@
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 from pathlib import Path
 import concurrent.futures
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import time
 from dataclasses import dataclass
 from collections import Counter
+from zoneinfo import ZoneInfo
 import matplotlib.pyplot as plt
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from .track_processor import TrackProcessor
+from .year_partitions import YearPartitions
+from ..data.audio_features import AudioFeatures
 from ..data.data_loader import DataLoader
+from ..data.genre_map import DEFAULT_GENRES_FILE, GenreMap
+from ..data.play_store import PlayStore
+from ..utils.metrics import metrics
+
+EPOCH_DATE = date(1970, 1, 1)
 
 @dataclass
 class Track:
@@ -25,30 +33,148 @@ class Track:
     play_count: int = 0
 
 class SpotifyAnalyzer:
-    def __init__(self, data_folder: str, max_items: int = 20):
+    def __init__(self, data_folder: str, max_items: int = 20, store_path: Optional[str] = None,
+                 timezone: Optional[str] = None, audio_features_path: Optional[str] = None,
+                 genres_path: Optional[str] = None):
         self.data_loader = DataLoader(data_folder)
-        self.track_processor = TrackProcessor()
+        self.timezone = timezone
+        self.track_processor = TrackProcessor(timezone)
         self.max_items = max_items
         self.marquee_segments: Dict[str, List[str]] = {}
+        self.store = PlayStore(store_path) if store_path else None
+        # Offline audio features (tempo, energy, valence, ...) joined onto the tracks by URI
+        self.audio_features: Optional[AudioFeatures] = None
+        if audio_features_path:
+            with metrics.stage('load audio features'):
+                self.audio_features = AudioFeatures.load(audio_features_path)
+        # Artist -> genre mapping behind the genre statistics; a small bundled one by default
+        self.genres_path = genres_path
+        with metrics.stage('load genres'):
+            self.genre_map = GenreMap.load(genres_path or DEFAULT_GENRES_FILE)
         
     def analyze(self) -> None:
-        data = self.data_loader.load_all_files()
+        if self.store:
+            fingerprint = self.data_loader.fingerprint()
+            if self.store.is_current(fingerprint):
+                # Same export as last time: rebuild aggregates from SQLite, skip JSON entirely
+                with metrics.stage('store restore'):
+                    self.store.load_track_processor(self.track_processor)
+                    self.marquee_segments = self.store.get_marquee_segments()
+                self.annotate_tracks()
+                return
+        
+        with metrics.stage('load files'):
+            data = self.data_loader.load_all_files()
+        
+        self._ingest(data)
+        
+        if self.store:
+            with metrics.stage('store load'):
+                self.store.load_export(data, fingerprint, self.track_processor._parse_datetime,
+                                       self.data_loader.sources)
+        
+    def close(self) -> None:
+        """Close the play store connection, if any"""
+        if self.store:
+            self.store.close()
+        
+    def ingest_files(self, files: List[Path], annotate: bool = True) -> Set[str]:
+        """Add the plays from the given files to the current aggregates; returns the categories touched.
+        
+        With annotate=False moods are left for a later annotate_tracks() call, e.g. after the last file.
+        """
+        with metrics.stage('load files'):
+            data = self.data_loader.load_files(files)
+        self._ingest(data, annotate)
+        return {category for category, items in data.items() if items}
+        
+    def reset(self, categories: Optional[Set[str]] = None) -> Set[str]:
+        """Drop aggregated state built from the given data categories (all by default).
+        
+        Returns every category that has to be re-ingested: both history kinds share
+        the TrackProcessor, so resetting one resets the other.
+        """
+        categories = set(categories) if categories is not None else {
+            'extended_history', 'recent_history', 'marquee', 'playlists'
+        }
+        if categories & {'extended_history', 'recent_history'}:
+            # Year partitions of files that are still there unchanged carry over, so only
+            # the years of replaced or removed files are summarized and merged again
+            partitions = self.track_processor.partitions
+            partitions.retain(self.data_loader.file_fingerprints())
+            self.track_processor = TrackProcessor(self.timezone)
+            self.track_processor.partitions = partitions
+            categories |= {'extended_history', 'recent_history'}
+        if 'marquee' in categories:
+            self.marquee_segments = {}
+        return categories
+        
+    def _ingest(self, data: Dict[str, List[dict]], annotate: bool = True) -> None:
+        with metrics.stage('process data'):
+            sources = self.data_loader.sources
+            self.track_processor.process_extended_history(data['extended_history'], sources.get('extended_history'))
+            self.track_processor.process_recent_history(data['recent_history'], sources.get('recent_history'))
+            with metrics.stage('aggregation', records=len(data['marquee']), source='marquee'):
+                self._process_marquee_data(data['marquee'])
+        if annotate:
+            self.annotate_tracks()
+        
+    def annotate_tracks(self) -> None:
+        """Join audio features onto the track table, then classify every track's mood"""
+        if self.audio_features is not None:
+            tracks = self.track_processor.tracks
+            with metrics.stage('audio features join', records=len(tracks)):
+                self.track_processor.set_audio_features(
+                    self.audio_features.join([track.uri for track in tracks.values()]))
+        self.track_processor.classify_moods()
+        
+    def get_top_tracks(self, timeframe: str = 'all', start: Optional[date] = None,
+                       end: Optional[date] = None) -> List[Tuple[str, int]]:
+        """Tracks ranked by listening time, over a timeframe or any [start, end) range of local dates"""
+        start, end = self._date_range(timeframe, start, end)
+        if self.store:
+            return self.store.get_top_tracks(self._to_utc(start), self.max_items, self._to_utc(end))
+        
+        if start is None and end is None:
+            tracks = [(track, stats.ms_played) for track, stats in self.track_processor.tracks.items()]
+            return sorted(tracks, key=lambda x: x[1], reverse=True)[:self.max_items]
+        return self.track_processor.time_cube('tracks').top(
+            self._day_number(start), self._day_number(end), self.max_items)
+        
+    def get_top_artists(self, timeframe: str = 'all', start: Optional[date] = None,
+                        end: Optional[date] = None) -> List[Tuple[str, int]]:
+        """Artists ranked by listening time, over a timeframe or any [start, end) range of local dates"""
+        start, end = self._date_range(timeframe, start, end)
+        if self.store:
+            return self.store.get_top_artists(self._to_utc(start), self.max_items, self._to_utc(end))
+        
+        if start is None and end is None:
+            return Counter(self.track_processor.artists).most_common(self.max_items)
+        return self.track_processor.time_cube('artists').top(
+            self._day_number(start), self._day_number(end), self.max_items)
         
-        # Process all data
-        self.track_processor.process_extended_history(data['extended_history'])
-        self.track_processor.process_recent_history(data['recent_history'])
-        self._process_marquee_data(data['marquee'])
+    def get_year_partitions(self) -> YearPartitions:
+        """Per-year aggregates of the ingested history, with a lifetime roll-up"""
+        return self.track_processor.year_partitions()
         
-    def get_top_tracks(self, timeframe: str = 'all') -> List[Tuple[str, int]]:
-        cutoff_date = self._get_cutoff_date(timeframe)
+    def _date_range(self, timeframe: str, start: Optional[date],
+                    end: Optional[date]) -> Tuple[Optional[date], Optional[date]]:
+        if start is None:
+            cutoff_date = self._get_cutoff_date(timeframe)
+            start = cutoff_date.date() if cutoff_date else None
+        return start, end
         
-        tracks = [
-            (track, stats.ms_played)
-            for track, stats in self.track_processor.tracks.items()
-            if not cutoff_date or (stats.last_played and stats.last_played >= cutoff_date)
-        ]
+    def _day_number(self, day: Optional[date]) -> Optional[int]:
+        return (day - EPOCH_DATE).days if day else None
         
-        return sorted(tracks, key=lambda x: x[1], reverse=True)[:self.max_items]
+    def _to_utc(self, day: Optional[date]) -> Optional[datetime]:
+        """Local midnight starting the given day as a naive UTC datetime, like stored timestamps"""
+        if day is None:
+            return None
+        midnight = datetime.combine(day, datetime.min.time())
+        if not self.timezone:
+            return midnight
+        return midnight.replace(tzinfo=ZoneInfo(self.timezone)).astimezone(dt_timezone.utc).replace(tzinfo=None)
         
     def _get_cutoff_date(self, timeframe: str) -> datetime:
         now = datetime.now()
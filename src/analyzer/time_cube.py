@@ -0,0 +1,81 @@
+from typing import List, Optional, Tuple
+import numpy as np
+
+# Items (tracks or artists) that get a dense per-day prefix row; the rest form the sparse tail
+DENSE_ITEMS = 256
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest positive values, largest first, without sorting everything"""
+    k = min(k, int(np.count_nonzero(values > 0)))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(values, len(values) - k)[len(values) - k:]
+    return candidates[np.argsort(values[candidates], kind='stable')[::-1]]
+
+class TimeCube:
+    """Day-bucketed prefix sums of listening time for [start, end) date range queries.
+
+    The most played items get a dense cumulative row over all days, so their total in
+    any window is the difference of two prefix entries. Plays of the long tail stay in
+    a day-sorted log that is only scanned when a tail item could still reach the top K:
+    a tail item never has more in a window than its all-time total.
+    """
+
+    def __init__(self, names: List[str], item_ids: np.ndarray, days: np.ndarray,
+                 ms_played: np.ndarray, dense_items: int = DENSE_ITEMS):
+        self.names = names
+        totals = np.bincount(item_ids, weights=ms_played, minlength=len(names)).astype(np.int64)
+        order = np.argsort(totals, kind='stable')[::-1]
+        self.dense = order[:dense_items]
+        # Largest all-time total among tail items, an upper bound on any tail window sum
+        self.tail_bound = int(totals[order[dense_items]]) if len(order) > dense_items else 0
+
+        self.first_day = int(days.min()) if len(days) else 0
+        self.day_count = int(days.max()) - self.first_day + 1 if len(days) else 0
+
+        rows = np.full(len(names), -1, dtype=np.int64)
+        rows[self.dense] = np.arange(len(self.dense))
+        play_rows = rows[item_ids]
+        in_dense = play_rows >= 0
+
+        # Column 0 stays zero so prefix[:, end] - prefix[:, start] needs no special case
+        width = self.day_count + 1
+        cells = play_rows[in_dense] * width + (days[in_dense] - self.first_day + 1)
+        daily = np.bincount(cells, weights=ms_played[in_dense], minlength=len(self.dense) * width)
+        self.prefix = np.cumsum(daily.astype(np.int64).reshape(len(self.dense), width), axis=1)
+
+        in_tail = ~in_dense
+        tail_order = np.argsort(days[in_tail], kind='stable')
+        self.tail_days = days[in_tail][tail_order]
+        self.tail_items = item_ids[in_tail][tail_order]
+        self.tail_ms = ms_played[in_tail][tail_order]
+
+    def window(self, start_day: Optional[int] = None, end_day: Optional[int] = None) -> Tuple[int, int]:
+        """Clamp a [start_day, end_day) range of day numbers to prefix columns"""
+        start = 0 if start_day is None else start_day - self.first_day
+        end = self.day_count if end_day is None else end_day - self.first_day
+        start = min(max(start, 0), self.day_count)
+        return start, min(max(end, start), self.day_count)
+
+    def totals(self, start_day: Optional[int] = None, end_day: Optional[int] = None) -> np.ndarray:
+        """Listening time of every item in [start_day, end_day), indexed like names"""
+        start, end = self.window(start_day, end_day)
+        low, high = np.searchsorted(self.tail_days, [start + self.first_day, end + self.first_day])
+        window_ms = np.bincount(self.tail_items[low:high], weights=self.tail_ms[low:high],
+                                minlength=len(self.names)).astype(np.int64)
+        window_ms[self.dense] = self.prefix[:, end] - self.prefix[:, start]
+        return window_ms
+
+    def top(self, start_day: Optional[int] = None, end_day: Optional[int] = None,
+            k: int = 20) -> List[Tuple[str, int]]:
+        """The k items with the most listening time in [start_day, end_day), largest first"""
+        start, end = self.window(start_day, end_day)
+        dense_ms = self.prefix[:, end] - self.prefix[:, start]
+        best = top_k(dense_ms, k)
+
+        if len(best) == k and dense_ms[best[-1]] >= self.tail_bound:
+            return [(self.names[self.dense[i]], int(dense_ms[i])) for i in best]
+
+        # The tail could still place: add up its plays inside the window and rank everything
+        window_ms = self.totals(start_day, end_day)
+        return [(self.names[i], int(window_ms[i])) for i in top_k(window_ms, k)]
@@ -1,7 +1,24 @@
+import os
+import warnings
+from array import array
+from collections import Counter
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional, Dict, List
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, Dict, List, Tuple
+from zoneinfo import ZoneInfo
+import numpy as np
 from dateutil import parser
+from .artist_embeddings import ArtistEmbeddings
+from .artist_graph import ArtistGraph
+from .moods import AUDIO_FEATURES, DAYPARTS, TIME_BINS, MoodEngine
+from .sessions import SessionBuilder
+from .time_cube import TimeCube
+from .track_similarity import TrackSimilarityIndex
+from .year_partitions import YearPartitions, build_partitions
+from ..utils.metrics import metrics
+
+HOURS_PER_WEEK = 7 * 24
+SECONDS_PER_DAY = 24 * 60 * 60
 
 @dataclass
 class Track:
@@ -13,27 +30,129 @@ class Track:
     play_count: int = 0
     last_played: Optional[datetime] = None
     mood: Optional[str] = None
+    skip_count: int = 0
+
+def is_track_play(item: dict) -> bool:
+    """True for extended history entries of a music track. Podcast episodes, audiobooks and
+    plays without metadata have a null track or artist and stay out of every aggregate."""
+    return bool(item.get('master_metadata_track_name') and item.get('master_metadata_album_artist_name'))
+
+def is_recent_track_play(item: dict) -> bool:
+    """Same for recent (account data) history entries"""
+    return bool(item.get('trackName') and item.get('artistName'))
+
+def to_epoch_seconds(timestamps: List[Optional[datetime]]) -> np.ndarray:
+    """Naive UTC datetimes as a datetime64[s] array, with NaT for missing ones"""
+    return np.array(timestamps, dtype='datetime64[s]')
+
+def array_bytes(structure) -> int:
+    """Bytes in the numpy and typed arrays among an object's attributes, nested objects included"""
+    total = 0
+    for value in vars(structure).values():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, array):
+            total += len(value) * value.itemsize
+        elif hasattr(value, '__dict__'):
+            total += array_bytes(value)
+    return total
+
+def parse_timestamps(values: List[Optional[str]], parse_datetime) -> np.ndarray:
+    """Parse timestamp strings to a datetime64[s] array, with NaT for missing ones.
+    
+    Plain ISO 8601 values (what Spotify exports contain) are parsed by numpy in one call;
+    if any value is in another format, all of them go through parse_datetime instead.
+    """
+    plain = [(value[:-1] if value.endswith('Z') else value) if value else 'NaT' for value in values]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')  # numpy only warns about UTC offsets
+            return np.array(plain, dtype='datetime64[s]')
+    except (ValueError, UserWarning):
+        return to_epoch_seconds([parse_datetime(value) if value else None for value in values])
 
 class TrackProcessor:
-    def __init__(self):
+    def __init__(self, timezone: Optional[str] = None):
         self.tracks: Dict[str, Track] = {}
+        # Position of each key in self.tracks, the id used by the play log
+        self.track_ids: Dict[str, int] = {}
         self.artists: Dict[str, int] = {}
         self.genres: Dict[str, int] = {}
+        # Skips of tracks not played through yet, per key; credited once the track is played,
+        # which may be in a file ingested later
+        self.pending_skips: Counter = Counter()
+        # Listening time and plays per (weekday, hour) in the user's time zone, Monday 00:00 first
+        self.timezone = timezone
+        self.hour_of_week_ms = np.zeros(HOURS_PER_WEEK, dtype=np.int64)
+        self.hour_of_week_plays = np.zeros(HOURS_PER_WEEK, dtype=np.int64)
+        # Listening time and plays per local calendar day; index 0 is day number first_day
+        # (days since 1970-01-01), and the arrays grow to cover every day that has a play
+        self.first_day: Optional[int] = None
+        self.daily_ms = np.zeros(0, dtype=np.int64)
+        self.daily_plays = np.zeros(0, dtype=np.int64)
+        # Weighted plays as (track id, local day, ms, source) columns, appended one batch at a
+        # time; source indexes self.sources, the names of the files the plays came from
+        self._play_log: List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+        self.sources: List[str] = []
+        # Per-year aggregates, one partition per source file, built from the play log on first use
+        self.partitions = YearPartitions()
+        # Listening time per track id and local part of day (see moods.DAYPARTS), for mood features
+        self.track_time_ms = np.zeros((0, TIME_BINS), dtype=np.int64)
+        # Optional per-track audio features by name (see moods.AUDIO_FEATURES), NaN where unknown
+        self.audio_features: Dict[str, np.ndarray] = {}
+        self._mood_engine: Optional[MoodEngine] = None
+        self._time_cubes: Dict[str, TimeCube] = {}
+        # Listening sessions, from extended history; the account-data history (which
+        # repeats the same plays) is only used when there is no extended history
+        self.sessions = SessionBuilder()
+        self.sessions_from_extended = False
+        self._artist_graph: Optional[ArtistGraph] = None
+        self._artist_embeddings: Optional[ArtistEmbeddings] = None
+        # Where artist embeddings are cached on disk, if anywhere (next to a snapshot)
+        self.embeddings_path: Optional[str] = None
+        self._track_similarity: Optional[TrackSimilarityIndex] = None
+        
+    def process_extended_history(self, data: List[dict], sources: Optional[List[Tuple]] = None) -> None:
+        """Add extended history plays; sources lists the (file name, fingerprint, record count)
+        of the files data was read from, in order (see DataLoader.sources)"""
+        source_ids = self.source_ids(sources, len(data), 'extended_history', weight=1)
+        tracked = np.fromiter((is_track_play(item) for item in data), dtype=bool, count=len(data))
+        data = [item for item, keep in zip(data, tracked) if keep]
+        played = np.fromiter((not item.get('skipped', False) for item in data), dtype=bool, count=len(data))
+        plays = [item for item, keep in zip(data, played) if keep]
+        source_ids = source_ids[tracked][played]
+        skips = Counter(
+            f"{item.get('master_metadata_track_name', '')}:{item.get('master_metadata_album_artist_name', '')}"
+            for item in data if item.get('skipped', False)
+        )
+        
+        with metrics.stage('timestamp parsing', records=len(plays), source='extended_history'):
+            played_at = parse_timestamps([item.get('ts') for item in plays], self._parse_datetime)
+            timestamps = played_at.tolist()
+        
+        with metrics.stage('aggregation', records=len(plays), source='extended_history'):
+            track_ids = np.empty(len(plays), dtype=np.int64)
+            for index, (item, last_played) in enumerate(zip(plays, timestamps)):
+                track = Track(
+                    name=item.get('master_metadata_track_name', ''),
+                    artist=item.get('master_metadata_album_artist_name', ''),
+                    album=item.get('master_metadata_album_album_name', ''),
+                    uri=item.get('spotify_track_uri', ''),
+                    ms_played=item.get('ms_played', 0),
+                    last_played=last_played
+                )
+                track_ids[index] = self._update_track_stats(track)
+            # Skips only count for tracks that were also played through at some point
+            self.pending_skips.update(skips)
+            self._credit_skips()
+        
+        ms_played = np.fromiter((item.get('ms_played', 0) for item in plays), dtype=np.int64, count=len(plays))
+        with metrics.stage('time binning', records=len(plays), source='extended_history'):
+            self.record_play_times(played_at, ms_played, track_ids, sources=source_ids)
         
-    def process_extended_history(self, data: List[dict]) -> None:
-        for item in data:
-            if item.get('skipped', False):
-                continue
-                
-            track = Track(
-                name=item.get('master_metadata_track_name', ''),
-                artist=item.get('master_metadata_album_artist_name', ''),
-                album=item.get('master_metadata_album_album_name', ''),
-                uri=item.get('spotify_track_uri', ''),
-                ms_played=item.get('ms_played', 0),
-                last_played=self._parse_datetime(item.get('ts', '')) if item.get('ts') else None
-            )
-            self._update_track_stats(track)
+        with metrics.stage('session detection', records=len(plays), source='extended_history'):
+            self.record_sessions(played_at, ms_played, track_ids)
+            self.sessions_from_extended = self.sessions_from_extended or len(plays) > 0
 
     def _parse_datetime(self, datetime_str: str) -> datetime:
         """Parse datetime string to naive datetime object"""
@@ -43,27 +162,312 @@ class TrackProcessor:
             dt = dt.replace(tzinfo=None)
         return dt
 
-    def process_recent_history(self, data: List[dict]) -> None:
-        for item in data:
-            track = Track(
-                name=item.get('trackName', ''),
-                artist=item.get('artistName', ''),
-                ms_played=item.get('msPlayed', 0),
-                last_played=self._parse_datetime(item.get('endTime', ''))
-            )
-            self._update_track_stats(track, weight=2)  # Recent history counts double
+    def process_recent_history(self, data: List[dict], sources: Optional[List[Tuple]] = None) -> None:
+        """Add recent (account data) history plays; sources as in process_extended_history"""
+        source_ids = self.source_ids(sources, len(data), 'recent_history', weight=2)
+        tracked = np.fromiter((is_recent_track_play(item) for item in data), dtype=bool, count=len(data))
+        data = [item for item, keep in zip(data, tracked) if keep]
+        source_ids = source_ids[tracked]
+        with metrics.stage('timestamp parsing', records=len(data), source='recent_history'):
+            played_at = parse_timestamps([item.get('endTime') for item in data], self._parse_datetime)
+            timestamps = played_at.tolist()
+        
+        with metrics.stage('aggregation', records=len(data), source='recent_history'):
+            track_ids = np.empty(len(data), dtype=np.int64)
+            for index, (item, last_played) in enumerate(zip(data, timestamps)):
+                track = Track(
+                    name=item.get('trackName', ''),
+                    artist=item.get('artistName', ''),
+                    ms_played=item.get('msPlayed', 0),
+                    last_played=last_played
+                )
+                track_ids[index] = self._update_track_stats(track, weight=2)  # Recent history counts double
+            self._credit_skips()
+        
+        ms_played = np.fromiter((item.get('msPlayed', 0) for item in data), dtype=np.int64, count=len(data))
+        # Recent history repeats plays the extended history already has, so it only fills the
+        # time bins (like sessions) when there is no extended history; it still counts double
+        # in the play log, as in the track totals
+        with metrics.stage('time binning', records=len(data), source='recent_history'):
+            self.record_play_times(played_at, ms_played, track_ids, weight=2,
+                                   bin_times=not self.sessions_from_extended, sources=source_ids)
+        
+        if not self.sessions_from_extended:
+            with metrics.stage('session detection', records=len(data), source='recent_history'):
+                self.record_sessions(played_at, ms_played, track_ids)
+    
+    def record_play_times(self, played_at: np.ndarray, ms_played: np.ndarray,
+                          track_ids: Optional[np.ndarray] = None, weight=1, bin_times: bool = True,
+                          sources: Optional[np.ndarray] = None) -> None:
+        """Bin plays into the hour-of-week and per-day arrays in one vectorized pass.
+        
+        With track ids (and the source id of every play) the plays are also added, weighted,
+        to the play log behind the time cubes and year partitions, and binned per track by
+        part of day for the mood features. With bin_times=False only the play log is updated,
+        for plays that repeat ones already binned.
+        """
+        valid = ~np.isnat(played_at)
+        weight = np.broadcast_to(weight, valid.shape)[valid]
+        ms_played = ms_played[valid]
+        epoch_seconds = self._to_local(played_at[valid].astype(np.int64))
+        days, seconds = np.divmod(epoch_seconds, SECONDS_PER_DAY)
+        if len(days) == 0:
+            return
+        if track_ids is not None:
+            self.add_to_play_log(track_ids[valid], days, ms_played * weight, sources[valid])
+        if not bin_times:
+            return
+        
+        # 1970-01-01 was a Thursday, so shift by 3 to make Monday weekday 0
+        cells = ((days + 3) % 7) * 24 + seconds // 3600
+        self.hour_of_week_ms += np.bincount(cells, weights=ms_played,
+                                            minlength=HOURS_PER_WEEK).astype(np.int64)
+        self.hour_of_week_plays += np.bincount(cells, minlength=HOURS_PER_WEEK)
+        
+        self._cover_days(int(days.min()), int(days.max()))
+        day_index = days - self.first_day
+        self.daily_ms += np.bincount(day_index, weights=ms_played,
+                                     minlength=len(self.daily_ms)).astype(np.int64)
+        self.daily_plays += np.bincount(day_index, minlength=len(self.daily_plays))
+        
+        if track_ids is not None:
+            track_ids = track_ids[valid]
+            self._cover_tracks(int(track_ids.max()) + 1)
+            parts = (((days + 3) % 7) >= 5) * len(DAYPARTS) + seconds // (SECONDS_PER_DAY // len(DAYPARTS))
+            self.track_time_ms += np.bincount(track_ids * TIME_BINS + parts, weights=ms_played,
+                                              minlength=self.track_time_ms.size).astype(np.int64).reshape(-1, TIME_BINS)
+            self._mood_engine = None
+    
+    def record_sessions(self, played_at: np.ndarray, ms_played: np.ndarray, track_ids: np.ndarray) -> None:
+        """Feed plays to the session builder in time order (each batch is sorted first)"""
+        valid = ~np.isnat(played_at)
+        ended_at = played_at[valid].astype(np.int64)
+        order = np.argsort(ended_at, kind='stable')
+        self._artist_graph = None
+        self._artist_embeddings = None
+        self._track_similarity = None
+        self._mood_engine = None
+        add = self.sessions.add
+        for ended, ms, track_id in zip(ended_at[order].tolist(), ms_played[valid][order].tolist(),
+                                       track_ids[valid][order].tolist()):
+            add(ended, ms, track_id)
+    
+    def add_to_play_log(self, track_ids: np.ndarray, days: np.ndarray, ms_played: np.ndarray,
+                        sources: np.ndarray) -> None:
+        self._play_log.append((track_ids.astype(np.int64), days.astype(np.int64), ms_played.astype(np.int64),
+                               sources.astype(np.int64)))
+        self._time_cubes = {}
+    
+    def source_id(self, name: str, weight: int, fingerprint: Optional[Tuple[int, int]] = None) -> int:
+        """Index of a source file in self.sources, registering it (and its year partition) if new"""
+        if name not in self.sources:
+            self.sources.append(name)
+            self.partitions.register(name, weight, fingerprint)
+        return self.sources.index(name)
+    
+    def source_ids(self, sources: Optional[List[Tuple]], count: int, default_name: str, weight: int) -> np.ndarray:
+        """Source id of each of count records read from the given (name, fingerprint, records)
+        files; without sources they all belong to one source called default_name"""
+        sources = sources if sources is not None else [(default_name, None, count)]
+        return np.repeat([self.source_id(name, weight, fingerprint) for name, fingerprint, _ in sources],
+                         [records for _, _, records in sources]).astype(np.int64)
+    
+    def play_log(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All logged plays as (track id, local day number, weighted ms) columns"""
+        return self._play_columns()[:3]
+    
+    def play_sources(self) -> np.ndarray:
+        """Source id of every play in play_log() order, an index into self.sources"""
+        return self._play_columns()[3]
+    
+    def _play_columns(self) -> Tuple[np.ndarray, ...]:
+        if not self._play_log:
+            return (np.zeros(0, dtype=np.int64),) * 4
+        if len(self._play_log) > 1:
+            self._play_log = [tuple(np.concatenate(column) for column in zip(*self._play_log))]
+        return self._play_log[0]
+    
+    def time_cube(self, kind: str = 'tracks') -> TimeCube:
+        """Prefix-sum cube of 'tracks' or 'artists' over the play log, built on first use"""
+        if kind not in self._time_cubes:
+            track_ids, days, ms_played = self.play_log()
+            if kind == 'tracks':
+                names, item_ids = list(self.tracks), track_ids
+            else:
+                names, artist_of_track = self.artist_index()
+                item_ids = artist_of_track[track_ids]
+            with metrics.stage('time cube', kind=kind, records=len(days)):
+                self._time_cubes[kind] = TimeCube(names, item_ids, days, ms_played)
+        return self._time_cubes[kind]
+    
+    def year_partitions(self) -> YearPartitions:
+        """Per-year aggregates with one partition per source file; files ingested since the
+        last call are summarized from their rows of the play log"""
+        if self.partitions.pending():
+            track_ids, days, ms_played = self.play_log()
+            artist_names, artist_of_track = self.artist_index()
+            build_partitions(self.partitions, self.sources, self.play_sources(), days, ms_played,
+                             track_ids, list(self.tracks), artist_names, artist_of_track)
+        return self.partitions
+    
+    def array_bytes(self) -> int:
+        """Bytes held in arrays: the per-day and per-track bins, the play log, the sessions,
+        and whichever derived structures (time cubes, graph, embeddings, ...) are cached"""
+        columns = [self.hour_of_week_ms, self.hour_of_week_plays, self.daily_ms, self.daily_plays,
+                   self.track_time_ms, *self.audio_features.values()]
+        columns += [column for batch in self._play_log for column in batch]
+        cached = [*self._time_cubes.values(), self._artist_graph, self._artist_embeddings,
+                  self._track_similarity, self._mood_engine]
+        return (sum(column.nbytes for column in columns) + array_bytes(self.sessions)
+                + sum(array_bytes(structure) for structure in cached if structure is not None))
+    
+    def artist_index(self) -> Tuple[List[str], np.ndarray]:
+        """Interned artists: their names, and the artist id of every track id"""
+        artist_ids: Dict[str, int] = {}
+        artist_of_track = np.fromiter(
+            (artist_ids.setdefault(track.artist, len(artist_ids)) for track in self.tracks.values()),
+            dtype=np.int64, count=len(self.tracks)
+        )
+        return list(artist_ids), artist_of_track
+    
+    def artist_graph(self) -> ArtistGraph:
+        """Co-listening graph of artists played close together in a session, built on first use"""
+        if self._artist_graph is None:
+            sessions = self.sessions.columns()
+            names, artist_of_track = self.artist_index()
+            session_ids = np.repeat(np.arange(len(sessions['plays'])), sessions['plays'])
+            with metrics.stage('artist graph', records=len(session_ids)):
+                self._artist_graph = ArtistGraph.from_sessions(
+                    names, artist_of_track[sessions['track_ids']], session_ids)
+        return self._artist_graph
+    
+    def artist_embeddings(self) -> ArtistEmbeddings:
+        """Artist vectors factorized from the co-listening graph, built on first use.
+
+        With embeddings_path set they are read from there if present, and written there once built.
+        """
+        if self._artist_embeddings is None:
+            if self.embeddings_path and os.path.exists(self.embeddings_path):
+                self._artist_embeddings = ArtistEmbeddings.load(self.embeddings_path)
+            else:
+                graph = self.artist_graph()
+                with metrics.stage('artist embeddings', records=len(graph.names), edges=graph.edges):
+                    self._artist_embeddings = ArtistEmbeddings.from_graph(graph)
+                if self.embeddings_path:
+                    self._artist_embeddings.save(self.embeddings_path)
+        return self._artist_embeddings
+    
+    def track_similarity(self) -> TrackSimilarityIndex:
+        """Item-item similarity of tracks heard in the same sessions, built on first use"""
+        if self._track_similarity is None:
+            sessions = self.sessions.columns()
+            session_ids = np.repeat(np.arange(len(sessions['plays'])), sessions['plays'])
+            with metrics.stage('track similarity', records=len(session_ids)):
+                self._track_similarity = TrackSimilarityIndex.from_sessions(
+                    list(self.tracks), sessions['track_ids'], session_ids)
+        return self._track_similarity
+    
+    def mood_features(self) -> Tuple[np.ndarray, List[str]]:
+        """(tracks, features) matrix for the mood engine, with NaN for unknown values"""
+        count = len(self.tracks)
+        self._cover_tracks(count)
+        time_ms = self.track_time_ms[:count].astype(np.float64)
+        total = time_ms.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shares = (time_ms[:, :len(DAYPARTS)] + time_ms[:, len(DAYPARTS):]) / total[:, None]
+            weekend = time_ms[:, len(DAYPARTS):].sum(axis=1) / total
+            plays = np.fromiter((track.play_count for track in self.tracks.values()), dtype=np.float64, count=count)
+            skips = np.fromiter((track.skip_count for track in self.tracks.values()), dtype=np.float64, count=count)
+            skip_rate = skips / (skips + plays)
+            # Typical length of the sessions a track is played in, on a log scale
+            sessions = self.sessions.columns()
+            minutes = np.log1p(np.repeat(sessions['ms_played'], sessions['plays']) / 60000)
+            session_minutes = (np.bincount(sessions['track_ids'], weights=minutes, minlength=count)[:count]
+                               / np.bincount(sessions['track_ids'], minlength=count)[:count])
+        
+        columns = list(DAYPARTS) + ['weekend', 'skip_rate', 'session_minutes']
+        features = [shares, weekend[:, None], skip_rate[:, None], session_minutes[:, None]]
+        for name in AUDIO_FEATURES:
+            if name in self.audio_features:
+                values = np.full(count, np.nan)
+                known = self.audio_features[name][:count]
+                values[:len(known)] = known
+                columns.append(name)
+                features.append(values[:, None])
+        return np.hstack(features), columns
+    
+    def set_audio_features(self, columns: Dict[str, np.ndarray]) -> None:
+        """Attach per-track audio feature columns (aligned with self.tracks, NaN where unknown)"""
+        self.audio_features = columns
+        self._mood_engine = None
+    
+    def mood_engine(self) -> MoodEngine:
+        """Mood scores of every track from its listening features, built on first use"""
+        if self._mood_engine is None:
+            features, columns = self.mood_features()
+            with metrics.stage('mood classification', records=len(features), features=len(columns)):
+                self._mood_engine = MoodEngine(features, columns)
+        return self._mood_engine
+    
+    def classify_moods(self) -> None:
+        """Set Track.mood of every track to its best scoring mood"""
+        for track, mood in zip(self.tracks.values(), self.mood_engine().track_moods()):
+            track.mood = mood
+    
+    def _cover_tracks(self, count: int) -> None:
+        """Grow the per-track time bins to at least count rows, doubling to keep appends cheap"""
+        if count > len(self.track_time_ms):
+            rows = max(count, 2 * len(self.track_time_ms))
+            self.track_time_ms = np.pad(self.track_time_ms, ((0, rows - len(self.track_time_ms)), (0, 0)))
+    
+    def _cover_days(self, first_day: int, last_day: int) -> None:
+        """Grow the per-day arrays so they span first_day..last_day"""
+        if self.first_day is None:
+            self.first_day = first_day
+            self.daily_ms = np.zeros(last_day - first_day + 1, dtype=np.int64)
+            self.daily_plays = np.zeros(last_day - first_day + 1, dtype=np.int64)
+            return
+        before = max(0, self.first_day - first_day)
+        after = max(0, last_day - (self.first_day + len(self.daily_ms) - 1))
+        if before or after:
+            self.daily_ms = np.pad(self.daily_ms, (before, after))
+            self.daily_plays = np.pad(self.daily_plays, (before, after))
+            self.first_day -= before
+    
+    def _to_local(self, epoch_seconds: np.ndarray) -> np.ndarray:
+        """Shift UTC epoch seconds to the configured time zone, DST included"""
+        if not self.timezone or len(epoch_seconds) == 0:
+            return epoch_seconds
+        zone = ZoneInfo(self.timezone)
+        # Offsets only change on hour boundaries, so look them up once per distinct hour
+        hours, inverse = np.unique(epoch_seconds // 3600, return_inverse=True)
+        offsets = np.array([
+            datetime.fromtimestamp(int(hour) * 3600, dt_timezone.utc).astimezone(zone).utcoffset().total_seconds()
+            for hour in hours
+        ], dtype=np.int64)
+        return epoch_seconds + offsets[inverse]
 
-    def _update_track_stats(self, track: Track, weight: int = 1) -> None:
+    def _credit_skips(self) -> None:
+        """Move pending skips onto the tracks that exist by now"""
+        for key in [key for key in self.pending_skips if key in self.tracks]:
+            self.tracks[key].skip_count += self.pending_skips.pop(key)
+        self._mood_engine = None
+    
+    def _update_track_stats(self, track: Track, weight: int = 1) -> int:
         key = f"{track.name}:{track.artist}"
+        ms_played = track.ms_played * weight
         
         if key in self.tracks:
-            self.tracks[key].ms_played += track.ms_played * weight
+            self.tracks[key].ms_played += ms_played
             self.tracks[key].play_count += weight
             if track.last_played and (not self.tracks[key].last_played or 
                 track.last_played > self.tracks[key].last_played):
                 self.tracks[key].last_played = track.last_played
         else:
             self.tracks[key] = track
+            self.tracks[key].ms_played = ms_played
             self.tracks[key].play_count = weight
+            self.track_ids[key] = len(self.track_ids)
             
-        self.artists[track.artist] = self.artists.get(track.artist, 0) + (track.ms_played * weight)
+        self.artists[track.artist] = self.artists.get(track.artist, 0) + ms_played
+        return self.track_ids[key]
@@ -0,0 +1,102 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from .time_cube import top_k
+
+# Only the most widely played tracks get neighbours; the rest rarely share sessions anyway
+TOP_TRACKS = 5000
+NEIGHBOURS = 20
+# Tracks per block of the similarity product, bounding it to CHUNK_SIZE x TOP_TRACKS cells
+CHUNK_SIZE = 256
+
+class TrackSimilarityIndex:
+    """Item-item cosine similarity between tracks that appear in the same sessions.
+
+    Built from a binary session x track matrix, X^T X is computed one block of tracks at
+    a time with sparse gathers, so memory stays at one CHUNK_SIZE x TOP_TRACKS block. Only
+    the top K neighbours of each track are kept, as two (tracks, K) arrays.
+    """
+
+    def __init__(self, names: List[str], neighbour_ids: np.ndarray, neighbour_scores: np.ndarray):
+        self.names = names
+        self.rows: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.neighbour_ids = neighbour_ids
+        self.neighbour_scores = neighbour_scores
+
+    @classmethod
+    def from_sessions(cls, names: List[str], track_ids: np.ndarray, session_ids: np.ndarray,
+                      top_n: int = TOP_TRACKS, k: int = NEIGHBOURS,
+                      chunk_size: int = CHUNK_SIZE) -> 'TrackSimilarityIndex':
+        """Build from plays in time order: the track id and session id of every play"""
+        n = max(len(names), 1)
+        # Binary incidence: a track played twice in one session counts once
+        pairs = np.unique(session_ids * n + track_ids)
+        sessions, tracks = np.divmod(pairs, n)
+        session_counts = np.bincount(tracks, minlength=len(names))
+        top = top_k(session_counts, top_n)
+        columns = np.full(len(names), -1, dtype=np.int64)
+        columns[top] = np.arange(len(top))
+
+        kept = columns[tracks] >= 0
+        sessions = np.unique(sessions[kept], return_inverse=True)[1]
+        cells = columns[tracks[kept]]
+        # Session -> tracks (CSR); pairs are sorted by session already
+        session_indptr = np.zeros(sessions.max() + 2 if len(sessions) else 1, dtype=np.int64)
+        np.cumsum(np.bincount(sessions), out=session_indptr[1:])
+        # Track -> sessions (CSC)
+        order = np.argsort(cells, kind='stable')
+        track_sessions = sessions[order]
+        track_indptr = np.zeros(len(top) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=len(top)), out=track_indptr[1:])
+        norms = np.sqrt(np.diff(track_indptr).astype(np.float64))
+
+        k = min(k, max(len(top) - 1, 0))
+        neighbour_ids = np.full((len(top), k), -1, dtype=np.int32)
+        neighbour_scores = np.zeros((len(top), k), dtype=np.float32)
+        for first in range(0, len(top), chunk_size):
+            block = np.arange(first, min(first + chunk_size, len(top)))
+            # Every (track in block, session) entry, then every track in that session
+            entry_sessions = track_sessions[track_indptr[block[0]]:track_indptr[block[-1] + 1]]
+            entry_owner = np.repeat(block - first, np.diff(track_indptr[block[0]:block[-1] + 2]))
+            lengths = session_indptr[entry_sessions + 1] - session_indptr[entry_sessions]
+            offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            others = cells[np.repeat(session_indptr[entry_sessions], lengths) + offsets]
+            owners = np.repeat(entry_owner, lengths)
+
+            shared = np.bincount(owners * len(top) + others,
+                                 minlength=len(block) * len(top)).reshape(len(block), len(top))
+            shared[np.arange(len(block)), block] = 0
+            similarity = shared / np.outer(norms[block], norms)
+            if k == 0:
+                continue
+            best = np.argpartition(similarity, -k, axis=1)[:, -k:]
+            best_scores = np.take_along_axis(similarity, best, axis=1)
+            ranking = np.argsort(-best_scores, axis=1, kind='stable')
+            best = np.take_along_axis(best, ranking, axis=1)
+            best_scores = np.take_along_axis(best_scores, ranking, axis=1)
+            neighbour_ids[block] = np.where(best_scores > 0, best, -1)
+            neighbour_scores[block] = np.where(best_scores > 0, best_scores, 0)
+        return cls([names[i] for i in top], neighbour_ids, neighbour_scores)
+
+    def similar(self, name: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Tracks most often heard in the same sessions as the given one"""
+        row = self.rows.get(name)
+        if row is None:
+            return []
+        # Rows are stored best first, so this is a plain slice
+        return [(self.names[i], float(score))
+                for i, score in zip(self.neighbour_ids[row, :k].tolist(), self.neighbour_scores[row, :k].tolist())
+                if i >= 0]
+
+    def more_like(self, seeds: List[str], k: int = 10) -> List[Tuple[str, float]]:
+        """Tracks closest to a set of seed tracks (e.g. a playlist), seeds excluded"""
+        rows = [self.rows[seed] for seed in seeds if seed in self.rows]
+        if not rows:
+            return []
+        ids = self.neighbour_ids[rows].ravel()
+        valid = ids >= 0
+        # Only the seeds' neighbours can score, so reduce over those instead of every track
+        candidates, inverse = np.unique(ids[valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=self.neighbour_scores[rows].ravel()[valid],
+                             minlength=len(candidates))
+        totals[np.isin(candidates, rows)] = 0
+        return [(self.names[candidates[i]], float(totals[i])) for i in top_k(totals, k)]
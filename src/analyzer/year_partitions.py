@@ -0,0 +1,153 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from ..utils.metrics import metrics
+
+@dataclass
+class YearSummary:
+    year: int
+    ms_played: int = 0
+    plays: int = 0
+    # Weighted ms per "name:artist" key and per artist, ranked the same way as TrackProcessor
+    tracks: Counter = field(default_factory=Counter)
+    artists: Counter = field(default_factory=Counter)
+    monthly_ms: List[int] = field(default_factory=lambda: [0] * 12)
+    days: Set[int] = field(default_factory=set)  # Local day numbers with at least one play
+
+    def merge(self, other: 'YearSummary', with_time: bool = True) -> None:
+        """Add another summary; with_time=False only adds its track and artist rankings"""
+        self.tracks.update(other.tracks)
+        self.artists.update(other.artists)
+        if not with_time:
+            return
+        self.ms_played += other.ms_played
+        self.plays += other.plays
+        self.monthly_ms = [a + b for a, b in zip(self.monthly_ms, other.monthly_ms)]
+        self.days |= other.days
+
+@dataclass
+class FilePartition:
+    weight: int  # Play weight of the file: 1 for extended history, 2 for recent history
+    fingerprint: Optional[Tuple[int, int]] = None  # (size, mtime_ns) of the file when ingested
+    years: Optional[Dict[int, YearSummary]] = None  # None until built from the play log
+
+def summarize_plays(days: np.ndarray, weighted_ms: np.ndarray, weight: int, track_ids: np.ndarray,
+                    track_keys: List[str], artist_names: List[str],
+                    artist_of_track: np.ndarray) -> Dict[int, YearSummary]:
+    """Per-year summaries of one file's plays, from its play-log columns"""
+    dates = days.astype('datetime64[D]')
+    years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12
+    ms_played = weighted_ms // weight
+
+    summaries: Dict[int, YearSummary] = {}
+    for year in np.unique(years).tolist():
+        in_year = years == year
+        track_ms = np.bincount(track_ids[in_year], weights=weighted_ms[in_year]).astype(np.int64)
+        artist_ms = np.bincount(artist_of_track[track_ids[in_year]], weights=weighted_ms[in_year]).astype(np.int64)
+        played_tracks = np.flatnonzero(track_ms)
+        played_artists = np.flatnonzero(artist_ms)
+        summaries[year] = YearSummary(
+            year,
+            ms_played=int(ms_played[in_year].sum()),
+            plays=int(in_year.sum()),
+            tracks=Counter(dict(zip((track_keys[i] for i in played_tracks.tolist()), track_ms[played_tracks].tolist()))),
+            artists=Counter(dict(zip((artist_names[i] for i in played_artists.tolist()),
+                                     artist_ms[played_artists].tolist()))),
+            monthly_ms=np.bincount(months[in_year], weights=ms_played[in_year], minlength=12).astype(np.int64).tolist(),
+            days=set(np.unique(days[in_year]).tolist())
+        )
+    return summaries
+
+class YearPartitions:
+    """Listening aggregates per calendar year and source file, with a lifetime roll-up.
+
+    Each history file gets its own partition, summarized from that file's rows of the play
+    log; replacing or removing a file only re-merges the years it covered. Recent history
+    repeats plays the extended history has, so like the time bins its partitions only add
+    time, plays and days when there is no extended history, and otherwise only rankings.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, FilePartition] = {}
+        self._years: Dict[int, YearSummary] = {}
+        self._stale: Set[int] = set()
+        self._time_from_extended = False
+
+    def register(self, name: str, weight: int, fingerprint: Optional[Tuple[int, int]] = None) -> bool:
+        """Start a partition for a file; False if one for the same file contents is already built"""
+        current = self.files.get(name)
+        if current is not None and fingerprint is not None and current.fingerprint == fingerprint \
+                and current.weight == weight and current.years is not None:
+            return False
+        self._drop(name)
+        self.files[name] = FilePartition(weight, fingerprint)
+        return True
+
+    def retain(self, fingerprints: Dict[str, Tuple[int, int]]) -> None:
+        """Drop the partitions of files that were removed or have changed since they were built"""
+        for name, partition in list(self.files.items()):
+            if partition.fingerprint is not None and fingerprints.get(name) != partition.fingerprint:
+                self._drop(name)
+
+    def pending(self) -> List[str]:
+        """Files whose partitions still have to be built"""
+        return [name for name, partition in self.files.items() if partition.years is None]
+
+    def set_years(self, name: str, years: Dict[int, YearSummary]) -> None:
+        self.files[name].years = years
+        self._stale |= set(years)
+
+    @property
+    def years(self) -> Dict[int, YearSummary]:
+        """Merged summaries of every year with plays; only stale years are merged again"""
+        time_from_extended = any(partition.weight == 1 for partition in self.files.values())
+        if time_from_extended != self._time_from_extended:
+            # Whether recent history adds time changed, which affects every year
+            self._time_from_extended = time_from_extended
+            self._stale |= set(self._years)
+            for partition in self.files.values():
+                self._stale |= set(partition.years or ())
+        for year in self._stale:
+            merged = YearSummary(year)
+            for partition in self.files.values():
+                if partition.years and year in partition.years:
+                    merged.merge(partition.years[year], with_time=partition.weight == 1 or not time_from_extended)
+            if merged.plays:
+                self._years[year] = merged
+            else:
+                self._years.pop(year, None)
+        self._stale = set()
+        return self._years
+
+    def lifetime(self) -> YearSummary:
+        """All years rolled up into one summary (year 0)"""
+        total = YearSummary(0)
+        for summary in self.years.values():
+            total.merge(summary)
+        return total
+
+    def _drop(self, name: str) -> None:
+        partition = self.files.pop(name, None)
+        if partition is not None and partition.years:
+            self._stale |= set(partition.years)
+
+def build_partitions(partitions: YearPartitions, names: List[str], sources: np.ndarray, days: np.ndarray,
+                     weighted_ms: np.ndarray, track_ids: np.ndarray, track_keys: List[str],
+                     artist_names: List[str], artist_of_track: np.ndarray) -> None:
+    """Build every pending partition from the play log, where sources holds each play's
+    index into names (the source files in play-log order)"""
+    pending = set(partitions.pending())
+    if not pending:
+        return
+    order = np.argsort(sources, kind='stable')
+    bounds = np.searchsorted(sources[order], np.arange(len(names) + 1))
+    with metrics.stage('year partitions', files=len(pending)):
+        for source, name in enumerate(names):
+            if name not in pending:
+                continue
+            rows = order[bounds[source]:bounds[source + 1]]
+            partitions.set_years(name, summarize_plays(
+                days[rows], weighted_ms[rows], partitions.files[name].weight, track_ids[rows],
+                track_keys, artist_names, artist_of_track))
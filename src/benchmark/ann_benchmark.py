@@ -0,0 +1,101 @@
+"""Benchmark the IVF nearest-neighbour index against exact search: recall@k and queries/s.
+
+Usage:
+    python -m src.benchmark.ann_benchmark --items 100000 --probes 1 2 4 8 16
+    python -m src.benchmark.ann_benchmark --data-folder input-data
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+import numpy as np
+
+from src.analyzer.ann_index import IVFIndex
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+
+DEFAULT_PROBES = [1, 2, 4, 8, 16, 32]
+
+def synthetic_vectors(items: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    """Unit vectors scattered around random cluster centres, like artists around scenes"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimensions))
+    vectors = centres[rng.integers(0, clusters, items)] + 0.6 * rng.standard_normal((items, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def _recall(found: np.ndarray, exact: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found.tolist(), exact.tolist())]))
+
+def run(vectors: np.ndarray, queries: int, k: int, probes: List[int], seed: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    query_vectors = vectors[rng.choice(len(vectors), min(queries, len(vectors)), replace=False)]
+
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, seed=seed)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact = np.array([np.argpartition(-(vectors @ query), k)[:k] for query in query_vectors])
+    exact_qps = len(query_vectors) / (time.perf_counter() - start)
+
+    results = []
+    for probe_count in probes:
+        start = time.perf_counter()
+        single = np.array([index.search(query, k, probe_count)[0] for query in query_vectors])
+        single_qps = len(query_vectors) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        batch = index.search_batch(query_vectors, k, probe_count)[0]
+        batch_qps = len(query_vectors) / (time.perf_counter() - start)
+        results.append({
+            'probes': probe_count,
+            'recall': _recall(single, exact),
+            'batch_recall': _recall(batch, exact),
+            'qps': single_qps,
+            'batch_qps': batch_qps,
+        })
+    return {
+        'items': len(vectors),
+        'dimensions': vectors.shape[1],
+        'lists': len(index.centroids),
+        'k': k,
+        'build_seconds': build_seconds,
+        'exact_qps': exact_qps,
+        'probes': results,
+    }
+
+def print_results(report: Dict[str, Any]) -> None:
+    print(f"{report['items']} vectors x {report['dimensions']} dims, {report['lists']} lists, "
+          f"built in {report['build_seconds']:.2f}s; exact search {report['exact_qps']:.0f} q/s")
+    print(f"{'Probes':>6} {'recall@' + str(report['k']):>10} {'q/s':>9} {'batch recall':>13} {'batch q/s':>10} {'speedup':>8}")
+    for result in report['probes']:
+        print(f"{result['probes']:>6} {result['recall']:>10.3f} {result['qps']:>9.0f} {result['batch_recall']:>13.3f} "
+              f"{result['batch_qps']:>10.0f} {result['qps'] / report['exact_qps']:>7.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure recall and speed of the approximate nearest-neighbour index')
+    parser.add_argument('--items', type=int, default=100_000, help='Synthetic vectors to index')
+    parser.add_argument('--dimensions', type=int, default=32, help='Dimensions of the synthetic vectors')
+    parser.add_argument('--clusters', type=int, default=200, help='Cluster centres of the synthetic vectors')
+    parser.add_argument('--data-folder', help='Index the artist embeddings of this export instead')
+    parser.add_argument('--queries', type=int, default=500, help='Queries per setting')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--probes', type=int, nargs='+', default=DEFAULT_PROBES, help='Probe counts to try')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the vectors, queries and k-means')
+    parser.add_argument('--output', help='Save results as JSON')
+    args = parser.parse_args()
+
+    if args.data_folder:
+        analyzer = SpotifyAnalyzer(args.data_folder)
+        analyzer.analyze()
+        vectors = analyzer.track_processor.artist_embeddings().vectors
+    else:
+        vectors = synthetic_vectors(args.items, args.dimensions, args.clusters, args.seed)
+
+    report = run(vectors, args.queries, args.k, args.probes, args.seed)
+    print_results(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
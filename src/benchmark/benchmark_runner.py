@@ -0,0 +1,202 @@
+"""Benchmark ingestion, aggregation, helper queries and report build on synthetic exports.
+
+Usage:
+    python -m src.benchmark.benchmark_runner --sizes 10000 100000 --output baseline.json
+    python -m src.benchmark.benchmark_runner --sizes 10000 100000 --compare baseline.json
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+from src.analyzer.track_processor import TrackProcessor
+from src.data.data_loader import DataLoader
+from src.data.synthetic_export import SyntheticExportGenerator
+from src.report.pdf_generator import PDFGenerator
+from src.utils.helpers import HelperMethods
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+def _peak_memory_mb(func: Callable[[], Any]) -> float:
+    """Peak memory allocated by one call above what was held before it, traced with
+    tracemalloc like the pipeline stages in src/utils/metrics.py"""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        held, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return (peak - held) / (1024 * 1024)
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def _measure(func: Callable[[], Any], records: int, repeats: int) -> Dict[str, Any]:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    p50 = _percentile(latencies, 50)
+    return {
+        'records': records,
+        'repeats': repeats,
+        'mean': statistics.mean(latencies),
+        'p50': p50,
+        'p95': _percentile(latencies, 95),
+        'max': max(latencies),
+        'throughput': records / p50 if p50 > 0 else None,
+        # One extra, untimed call: tracing allocations would slow the timed ones down
+        'peak_memory_mb': _peak_memory_mb(func)
+    }
+
+def run_size(size: int, repeats: int, seed: int, data_dir: Optional[str] = None,
+             end_date: Optional[date] = None) -> Dict[str, Any]:
+    """Run every benchmark against one synthetic dataset (meant to run in its own process).
+
+    The history ends on end_date, by default today so the "recent" helper windows contain
+    data; a kept dataset is only reused for the same size, seed and end date.
+    """
+    end_date = end_date or date.today()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_folder = (os.path.join(data_dir, f"plays_{size}_seed_{seed}_end_{end_date.isoformat()}") if data_dir
+                       else os.path.join(temp_dir, 'export'))
+        if not os.path.isdir(data_folder):
+            SyntheticExportGenerator(data_folder, plays=size, seed=seed, end_date=end_date).generate()
+
+        results: Dict[str, Any] = {}
+        loader = DataLoader(data_folder)
+        data = loader.load_all_files()
+        history_records = len(data['extended_history']) + len(data['recent_history'])
+
+        results['load_all_files'] = _measure(loader.load_all_files, history_records, repeats)
+        results['process_extended_history'] = _measure(
+            lambda: TrackProcessor().process_extended_history(data['extended_history']),
+            len(data['extended_history']), repeats)
+        results['process_recent_history'] = _measure(
+            lambda: TrackProcessor().process_recent_history(data['recent_history']),
+            len(data['recent_history']), repeats)
+
+        analyzer = SpotifyAnalyzer(data_folder)
+        analyzer.analyze()
+        tracks = len(analyzer.track_processor.tracks)
+        helpers = HelperMethods(analyzer)
+        top_artists = [artist for artist, _ in helpers._get_recent_artists(days=90).most_common(5)]
+        top_artist = top_artists[0] if top_artists else ''
+
+        queries = {
+            '_get_recent_tracks': lambda: helpers._get_recent_tracks(days=90),
+            '_get_recent_artists': lambda: helpers._get_recent_artists(days=90),
+            '_calculate_daily_average': helpers._calculate_daily_average,
+            '_get_peak_listening_hours': helpers._get_peak_listening_hours,
+            '_analyze_genres': helpers._analyze_genres,
+            '_calculate_artist_playtime': lambda: helpers._calculate_artist_playtime(top_artist),
+            '_get_mood_related_artists': lambda: helpers._get_mood_related_artists('Relaxing'),
+            '_generate_discovery_suggestions': helpers._generate_discovery_suggestions,
+            '_get_similar_artists': lambda: helpers._get_similar_artists(top_artists),
+            '_get_more_like_this': helpers._get_more_like_this,
+            '_get_genre_recommendations': helpers._get_genre_recommendations,
+            '_find_hidden_gems': helpers._find_hidden_gems,
+        }
+        for name, query in queries.items():
+            results[f"helpers.{name}"] = _measure(query, tracks, repeats)
+
+        report_file = os.path.join(temp_dir, 'report.pdf')
+        results['generate_report'] = _measure(
+            lambda: PDFGenerator(analyzer, report_file).generate_report(), tracks, repeats)
+
+    return results
+
+def run_benchmarks(sizes: List[int], repeats: int, seed: int, data_dir: Optional[str] = None,
+                   end_date: Optional[date] = None) -> Dict[str, Any]:
+    end_date = end_date or date.today()
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'end_date': end_date.isoformat(),
+        'sizes': {}
+    }
+    for size in sizes:
+        print(f"Benchmarking {size} plays...")
+        # A fresh process per size keeps caches and allocator state from earlier sizes out of the figures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            report['sizes'][str(size)] = executor.submit(run_size, size, repeats, seed, data_dir, end_date).result()
+    return report
+
+def print_results(report: Dict[str, Any]) -> None:
+    for size, results in report['sizes'].items():
+        print(f"\n{size} plays")
+        print(f"{'Benchmark':<42} {'p50 (s)':>9} {'p95 (s)':>9} {'rec/s':>12} {'Peak MB':>8}")
+        for name, result in results.items():
+            throughput = f"{result['throughput']:.0f}" if result['throughput'] else '-'
+            print(f"{name:<42} {result['p50']:>9.4f} {result['p95']:>9.4f} {throughput:>12} "
+                  f"{result['peak_memory_mb']:>8.1f}")
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Return the benchmarks whose median latency regressed by more than `threshold`"""
+    regressions = []
+    print(f"\n{'Size':>10} {'Benchmark':<42} {'base p50':>9} {'new p50':>9} {'change':>8}")
+    for size, results in current['sizes'].items():
+        for name, result in results.items():
+            base = baseline['sizes'].get(size, {}).get(name)
+            if not base or not base['p50']:
+                continue
+            change = result['p50'] / base['p50'] - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append(f"{size}:{name}")
+            print(f"{size:>10} {name:<42} {base['p50']:>9.4f} {result['p50']:>9.4f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the analysis pipeline on synthetic Spotify exports')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Dataset sizes in plays')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repetitions per benchmark')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic datasets')
+    parser.add_argument('--data-dir', help='Keep generated datasets here and reuse them between runs')
+    parser.add_argument('--end-date', type=date.fromisoformat,
+                        help='Last day of the synthetic histories (YYYY-MM-DD); default today')
+    parser.add_argument('--output', help='Save results as a JSON baseline')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative p50 slowdown that counts as a regression (default 0.1 = 10%%)')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.repeats, args.seed, args.data_dir, args.end_date)
+    print_results(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+# Numeric columns kept from an audio-features file; anything else is ignored
+FEATURE_COLUMNS = ('danceability', 'energy', 'valence', 'acousticness', 'instrumentalness',
+                   'speechiness', 'liveness', 'loudness', 'tempo')
+# Column holding the track, first match wins: full URIs, open.spotify.com links or bare ids
+URI_COLUMNS = ('spotify_track_uri', 'uri', 'track_uri', 'id', 'track_id')
+URI_PREFIX = 'spotify:track:'
+# A Spotify track id (22 base62 characters) at the end of the value, optionally followed by a query
+TRACK_ID_PATTERN = r'([0-9A-Za-z]{22})(?:\?.*)?$'
+
+class AudioFeatures:
+    """Audio features of many tracks as typed numpy columns, with a hash index by track URI.
+
+    Loaded from a local CSV, Parquet or JSON file (a list of records, JSON lines, or a saved
+    Spotify API response with an "audio_features" list), so no network access is needed.
+    """
+
+    def __init__(self, uris: List[str], columns: Dict[str, np.ndarray]):
+        self.uris = uris
+        self.columns = columns
+        # URI -> row; for a URI listed twice the later row wins
+        self.rows: Dict[str, int] = {uri: row for row, uri in enumerate(uris)}
+
+    def __len__(self) -> int:
+        return len(self.uris)
+
+    @classmethod
+    def load(cls, path: str) -> 'AudioFeatures':
+        # pandas is only needed when a features file is given, so keep it off the import path
+        import pandas as pd
+
+        suffix = Path(path).suffix.lower()
+        if suffix in ('.parquet', '.pq'):
+            frame = pd.read_parquet(path)
+        elif suffix in ('.json', '.jsonl'):
+            with open(path, 'r', encoding='utf-8') as f:
+                if suffix == '.jsonl':
+                    records = [json.loads(line) for line in f if line.strip()]
+                else:
+                    records = json.load(f)
+            if isinstance(records, dict):
+                records = records.get('audio_features', [])
+            frame = pd.DataFrame.from_records([record for record in records if record])
+        elif suffix in ('.csv', '.tsv', '.txt'):
+            frame = pd.read_csv(path, sep='\t' if suffix == '.tsv' else ',')
+        else:
+            raise ValueError(f"Unsupported audio features file {path} (use CSV, Parquet or JSON)")
+
+        uri_column = next((column for column in URI_COLUMNS if column in frame.columns), None)
+        if uri_column is None:
+            raise ValueError(f"{path} has no track URI column (one of {', '.join(URI_COLUMNS)})")
+        values = frame[uri_column].astype(str).str.strip()
+        uris = values.where(values.str.startswith(URI_PREFIX) & (values.str.len() == len(URI_PREFIX) + 22))
+        # Regex extraction is slow, so only run it on values not already in spotify:track: form
+        other = uris.isna()
+        if other.any():
+            uris[other] = URI_PREFIX + values[other].str.extract(TRACK_ID_PATTERN)[0]
+        frame = frame[uris.notna()]
+        uris = uris[uris.notna()].tolist()
+        columns = {
+            column: pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64)
+            for column in FEATURE_COLUMNS if column in frame.columns
+        }
+        return cls(uris, columns)
+
+    def join(self, uris: List[str]) -> Dict[str, np.ndarray]:
+        """Every column aligned with the given URIs (e.g. the track table), NaN where a URI is unknown"""
+        rows = np.fromiter((self.rows.get(uri, -1) for uri in uris), dtype=np.int64, count=len(uris))
+        found = rows >= 0
+        joined = {}
+        for name, column in self.columns.items():
+            values = np.full(len(uris), np.nan)
+            values[found] = column[rows[found]]
+            joined[name] = values
+        return joined
@@ -1,35 +1,84 @@
+import hashlib
 import json
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
 from tqdm import tqdm
+from ..utils.metrics import metrics
+
+class SourceFile(NamedTuple):
+    name: str
+    fingerprint: Tuple[int, int]  # (size, mtime_ns) when read
+    records: int  # Entries it added to its category's list
 
 class DataLoader:
     def __init__(self, data_folder: str):
         self.data_folder = Path(data_folder)
+        # Files behind each category's list in the last load_files result, in order
+        self.sources: Dict[str, List[SourceFile]] = {}
+        
+    def file_fingerprints(self) -> Dict[str, Tuple[int, int]]:
+        """Map each JSON file name to its (size, mtime_ns) without reading it"""
+        fingerprints = {}
+        for file in sorted(self.data_folder.glob("*.json")):
+            stat = file.stat()
+            fingerprints[file.name] = (stat.st_size, stat.st_mtime_ns)
+        return fingerprints
+        
+    def fingerprint(self) -> str:
+        """Hash identifying the current contents of the export folder"""
+        digest = hashlib.sha1()
+        for name, (size, mtime_ns) in self.file_fingerprints().items():
+            digest.update(f"{name}:{size}:{mtime_ns};".encode('utf-8'))
+        return digest.hexdigest()
         
     def load_all_files(self) -> Dict[str, List[Any]]:
+        with metrics.stage('file discovery') as stage:
+            files = list(self.data_folder.glob("*.json"))
+            stage.records = len(files)
+        return self.load_files(files)
+        
+    @staticmethod
+    def classify(file_name: str) -> Optional[str]:
+        """Data category a file belongs to, or None for files this tool ignores"""
+        if "Streaming_History_Audio" in file_name:
+            return 'extended_history'
+        elif "StreamingHistory_music" in file_name:
+            return 'recent_history'
+        elif "Marquee" in file_name:
+            return 'marquee'
+        elif "Playlist" in file_name:
+            return 'playlists'
+        return None
+        
+    def load_files(self, files: List[Path]) -> Dict[str, List[Any]]:
         data = {
             'extended_history': [],
             'recent_history': [],
             'marquee': [],
             'playlists': []
         }
+        self.sources = {category: [] for category in data}
         
-        files = list(self.data_folder.glob("*.json"))
         for file in tqdm(files, desc="Loading files"):
-            with open(file, 'r', encoding='utf-8') as f:
+            category = self.classify(file.name)
+            if category is None:
+                continue
+            
+            with open(file, 'r', encoding='utf-8') as f, \
+                    metrics.stage('json decode', file=file.name) as stage:
                 content = json.load(f)
+                stage.records = len(content) if isinstance(content, list) else 1
+                stat = file.stat()
                 
-                if "Streaming_History_Audio" in file.name:
-                    data['extended_history'].extend(content)
-                elif "StreamingHistory_music" in file.name:
-                    data['recent_history'].extend(content)
-                elif "Marquee" in file.name:
-                    data['marquee'].extend(content)
-                elif "Playlist" in file.name:
+                before = len(data[category])
+                if category == 'playlists':
                     if isinstance(content, dict) and 'playlists' in content:
                         data['playlists'].extend(content['playlists'])
                     else:
                         data['playlists'].append(content)
+                else:
+                    data[category].extend(content)
+                self.sources[category].append(
+                    SourceFile(file.name, (stat.st_size, stat.st_mtime_ns), len(data[category]) - before))
                         
         return data
@@ -0,0 +1,67 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+from .data_loader import DataLoader
+
+@dataclass
+class FolderChanges:
+    new: List[Path] = field(default_factory=list)
+    changed: List[Path] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.new or self.changed or self.removed)
+
+class FolderWatcher:
+    """Detect new, changed and removed export files by polling (size, mtime) fingerprints.
+
+    A file is only reported once its fingerprint is the same on two consecutive polls,
+    so half-copied files are not picked up.
+    """
+
+    def __init__(self, data_folder: str):
+        self.data_loader = DataLoader(data_folder)
+        self.known: Dict[str, Tuple[int, int]] = {}
+        self._pending: Dict[str, Tuple[int, int]] = {}
+
+    def _export_files(self) -> Dict[str, Tuple[int, int]]:
+        return {
+            name: fingerprint
+            for name, fingerprint in self.data_loader.file_fingerprints().items()
+            if DataLoader.classify(name)
+        }
+
+    def mark_current(self) -> None:
+        """Treat everything currently in the folder as already ingested"""
+        self.known = self._export_files()
+        self._pending = {}
+
+    def known_files(self) -> List[Path]:
+        return [self.data_loader.data_folder / name for name in self.known]
+
+    def poll(self) -> FolderChanges:
+        current = self._export_files()
+        changes = FolderChanges()
+
+        for name, fingerprint in current.items():
+            if self.known.get(name) == fingerprint:
+                self._pending.pop(name, None)
+                continue
+            if self._pending.get(name) != fingerprint:
+                # First sighting of this version; wait for it to settle
+                self._pending[name] = fingerprint
+                continue
+            del self._pending[name]
+            path = self.data_loader.data_folder / name
+            (changes.changed if name in self.known else changes.new).append(path)
+            self.known[name] = fingerprint
+
+        for name in list(self.known):
+            if name not in current:
+                changes.removed.append(name)
+                del self.known[name]
+        for name in list(self._pending):
+            if name not in current:
+                del self._pending[name]
+
+        return changes
@@ -0,0 +1,110 @@
+import csv
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Mapping used when no file is given: a starter set of artists and genres
+DEFAULT_GENRES_FILE = Path(__file__).with_name('artist_genres.csv')
+
+class GenreMap:
+    """Weighted artist -> genre mapping as a CSR matrix over interned ids.
+
+    Row i holds the genres of artist i in indices[indptr[i]:indptr[i + 1]] with weights
+    that sum to 1, so spreading an artist's listening time over its genres keeps totals
+    intact. The genre distribution of any per-artist vector is one sparse product.
+    """
+
+    def __init__(self, artists: List[str], genres: List[str], indptr: np.ndarray,
+                 indices: np.ndarray, weights: np.ndarray):
+        self.artists = artists
+        self.genres = genres
+        self.artist_ids: Dict[str, int] = {name: i for i, name in enumerate(artists)}
+        self.genre_ids: Dict[str, int] = {name: i for i, name in enumerate(genres)}
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def from_pairs(cls, pairs: List[Tuple[str, str, float]]) -> 'GenreMap':
+        """Build from (artist, genre, weight) triples; repeated pairs add up"""
+        artist_ids: Dict[str, int] = {}
+        genre_ids: Dict[str, int] = {}
+        rows = np.fromiter((artist_ids.setdefault(artist, len(artist_ids)) for artist, _, _ in pairs),
+                           dtype=np.int64, count=len(pairs))
+        columns = np.fromiter((genre_ids.setdefault(genre, len(genre_ids)) for _, genre, _ in pairs),
+                              dtype=np.int64, count=len(pairs))
+        weights = np.fromiter((weight for _, _, weight in pairs), dtype=np.float64, count=len(pairs))
+
+        keys, inverse = np.unique(rows * max(len(genre_ids), 1) + columns, return_inverse=True)
+        weights = np.bincount(inverse, weights=weights, minlength=len(keys))
+        rows, columns = np.divmod(keys, max(len(genre_ids), 1))
+        keep = weights > 0
+        rows, columns, weights = rows[keep], columns[keep], weights[keep]
+        # Keys are sorted, so rows already come in CSR order
+        indptr = np.zeros(len(artist_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(artist_ids)), out=indptr[1:])
+        totals = np.bincount(rows, weights=weights, minlength=len(artist_ids))
+        return cls(list(artist_ids), list(genre_ids), indptr, columns, weights / totals[rows])
+
+    @classmethod
+    def load(cls, path: str) -> 'GenreMap':
+        """Read a CSV of artist,genre[,weight] rows, or JSON mapping each artist to a list
+        of genres or to {genre: weight}"""
+        if Path(path).suffix.lower() == '.json':
+            with open(path, 'r', encoding='utf-8') as f:
+                mapping = json.load(f)
+            pairs = []
+            for artist, genres in mapping.items():
+                if isinstance(genres, str):
+                    genres = [genres]
+                if isinstance(genres, dict):
+                    pairs.extend((artist, genre, float(weight)) for genre, weight in genres.items())
+                else:
+                    pairs.extend((artist, genre, 1.0) for genre in genres)
+            return cls.from_pairs(pairs)
+
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            # The artist,genre[,weight] header row is optional
+            rows = [] if [column.strip().lower() for column in header[:2]] == ['artist', 'genre'] else [header]
+            rows.extend(reader)
+        return cls.from_pairs([
+            (row[0].strip(), row[1].strip(), float(row[2]) if len(row) > 2 and row[2].strip() else 1.0)
+            for row in rows if len(row) >= 2 and row[0].strip() and row[1].strip()
+        ])
+
+    def rows_for(self, artists: List[str]) -> np.ndarray:
+        """Row of each given artist in this map, -1 for artists it does not know"""
+        return np.fromiter((self.artist_ids.get(artist, -1) for artist in artists),
+                           dtype=np.int64, count=len(artists))
+
+    def distribution(self, artists: List[str], ms_played: np.ndarray) -> np.ndarray:
+        """Listening time per genre for ms_played given per artist: the product M^T x"""
+        rows = self.rows_for(artists)
+        known = rows >= 0
+        x = np.bincount(rows[known], weights=ms_played[known], minlength=len(self.artists))
+        return np.bincount(self.indices, weights=self.weights * np.repeat(x, np.diff(self.indptr)),
+                           minlength=len(self.genres))
+
+    def genres_of(self, artist: str) -> List[Tuple[str, float]]:
+        """An artist's genres with their weights, strongest first"""
+        row = self.artist_ids.get(artist)
+        if row is None:
+            return []
+        start, end = self.indptr[row], self.indptr[row + 1]
+        order = np.argsort(-self.weights[start:end], kind='stable')
+        return [(self.genres[self.indices[start + i]], float(self.weights[start + i])) for i in order]
+
+    def artists_in(self, genres: List[str]) -> List[Tuple[str, float]]:
+        """Artists tagged with any of the given genres, by their summed weight in them"""
+        genre_ids = [self.genre_ids[genre] for genre in genres if genre in self.genre_ids]
+        if not genre_ids:
+            return []
+        matches = np.isin(self.indices, genre_ids)
+        rows = np.repeat(np.arange(len(self.artists)), np.diff(self.indptr))
+        scores = np.bincount(rows[matches], weights=self.weights[matches], minlength=len(self.artists))
+        found = np.flatnonzero(scores)
+        order = found[np.argsort(-scores[found], kind='stable')]
+        return [(self.artists[i], float(scores[i])) for i in order]
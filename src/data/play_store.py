@@ -0,0 +1,299 @@
+import calendar
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..analyzer.track_processor import (Track, TrackProcessor, is_recent_track_play, is_track_play,
+                                        parse_timestamps)
+from ..utils.metrics import metrics
+
+SCHEMA_VERSION = '3'
+EPOCH = datetime(1970, 1, 1)
+
+# Plays from the recent (account data) history count double, as in TrackProcessor
+EXTENDED_WEIGHT = 1
+RECENT_WEIGHT = 2
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE artists (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE albums (id INTEGER PRIMARY KEY, name TEXT, artist_id INTEGER NOT NULL);
+CREATE TABLE tracks (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    artist_id INTEGER NOT NULL,
+    album_id INTEGER,
+    uri TEXT
+);
+CREATE TABLE sources (id INTEGER PRIMARY KEY, name TEXT NOT NULL, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE events (
+    ts INTEGER,
+    track_id INTEGER NOT NULL,
+    artist_id INTEGER NOT NULL,
+    ms_played INTEGER NOT NULL,
+    weight INTEGER NOT NULL,
+    source_id INTEGER NOT NULL
+);
+CREATE TABLE marquee (artist TEXT, segment TEXT NOT NULL);
+"""
+
+# Created after the bulk insert, which is much faster than maintaining them row by row
+INDEXES = """
+CREATE INDEX idx_events_ts ON events (ts);
+CREATE INDEX idx_events_artist_ts ON events (artist_id, ts);
+CREATE INDEX idx_events_track_ts ON events (track_id, ts);
+"""
+
+def to_epoch(dt: Optional[datetime]) -> Optional[int]:
+    return calendar.timegm(dt.timetuple()) if dt else None
+
+def from_epoch(ts: Optional[int]) -> Optional[datetime]:
+    return EPOCH + timedelta(seconds=ts) if ts is not None else None
+
+class PlayStore:
+    """SQLite store of individual plays with track, artist and album dimension tables"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # Autocommit mode: transactions are opened explicitly where they matter. The server
+        # opens the store in a worker thread and queries it from the event loop, so the
+        # connection is shared across threads and every use goes through the lock
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        except sqlite3.OperationalError:  # Empty database, no schema yet
+            return None
+        return row[0] if row else None
+
+    def is_current(self, fingerprint: str) -> bool:
+        """True if the store already holds the export with this fingerprint"""
+        return (self.get_meta('schema_version') == SCHEMA_VERSION
+                and self.get_meta('fingerprint') == fingerprint)
+
+    def load_export(self, data: Dict[str, List[dict]], fingerprint: str, parse_datetime=None,
+                    sources: Optional[Dict[str, List[Tuple]]] = None) -> None:
+        """Replace the store contents with a loaded export in a single transaction.
+
+        sources lists the (name, fingerprint, records) of the files behind each category, as
+        DataLoader.sources does; every play keeps the id of its file, for the year partitions.
+        """
+        parse_datetime = parse_datetime or TrackProcessor()._parse_datetime
+        source_rows = []
+        source_ids = {}
+        for category in ('extended_history', 'recent_history'):
+            files = (sources or {}).get(category) or [(category, None, len(data[category]))]
+            ids = []
+            for name, file_fingerprint, records in files:
+                size, mtime_ns = file_fingerprint or (None, None)
+                source_rows.append((len(source_rows) + 1, name, size, mtime_ns))
+                ids.extend([len(source_rows)] * records)
+            source_ids[category] = ids
+        artist_ids: Dict[str, int] = {}
+        album_ids: Dict[Tuple[str, int], int] = {}
+        track_ids: Dict[str, int] = {}
+        albums, tracks, events = [], [], []
+
+        def intern(name: str, artist: str, album: str, uri: str) -> Tuple[int, int]:
+            artist_id = artist_ids.setdefault(artist, len(artist_ids) + 1)
+            key = f"{name}:{artist}"
+            track_id = track_ids.get(key)
+            if track_id is None:
+                album_id = None
+                if album:
+                    album_id = album_ids.get((album, artist_id))
+                    if album_id is None:
+                        album_id = album_ids[(album, artist_id)] = len(album_ids) + 1
+                        albums.append((album_id, album, artist_id))
+                track_id = track_ids[key] = len(track_ids) + 1
+                tracks.append((track_id, name, artist_id, album_id, uri))
+            return track_id, artist_id
+
+        timestamps = []
+        with metrics.stage('store intern', records=len(data['extended_history']) + len(data['recent_history'])):
+            for item, source_id in zip(data['extended_history'], source_ids['extended_history']):
+                if item.get('skipped', False) or not is_track_play(item):
+                    continue
+                track_id, artist_id = intern(
+                    item.get('master_metadata_track_name', ''),
+                    item.get('master_metadata_album_artist_name', ''),
+                    item.get('master_metadata_album_album_name', ''),
+                    item.get('spotify_track_uri', '')
+                )
+                timestamps.append(item.get('ts'))
+                events.append((track_id, artist_id, item.get('ms_played', 0), EXTENDED_WEIGHT, source_id))
+
+            for item, source_id in zip(data['recent_history'], source_ids['recent_history']):
+                if not is_recent_track_play(item):
+                    continue
+                track_id, artist_id = intern(item.get('trackName', ''), item.get('artistName', ''), '', '')
+                timestamps.append(item.get('endTime'))
+                events.append((track_id, artist_id, item.get('msPlayed', 0), RECENT_WEIGHT, source_id))
+
+        # One vectorized parse, as in TrackProcessor; dateutil only if some value is not plain ISO 8601
+        with metrics.stage('timestamp parsing', records=len(timestamps), source='store'):
+            played_at = parse_timestamps(timestamps, parse_datetime)
+            missing = np.isnat(played_at).tolist()
+        events = [(None if is_missing else ts, *event)
+                  for ts, is_missing, event in zip(played_at.astype(np.int64).tolist(), missing, events)]
+
+        with metrics.stage('store insert', records=len(events)), self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                for table in ('meta', 'artists', 'albums', 'tracks', 'sources', 'events', 'marquee'):
+                    self.conn.execute(f'DROP TABLE IF EXISTS {table}')
+                for statement in SCHEMA.split(';'):
+                    if statement.strip():
+                        self.conn.execute(statement)
+                self.conn.executemany('INSERT INTO artists (id, name) VALUES (?, ?)',
+                                      [(artist_id, name) for name, artist_id in artist_ids.items()])
+                self.conn.executemany('INSERT INTO albums (id, name, artist_id) VALUES (?, ?, ?)', albums)
+                self.conn.executemany('INSERT INTO tracks (id, name, artist_id, album_id, uri) VALUES (?, ?, ?, ?, ?)', tracks)
+                self.conn.executemany('INSERT INTO sources (id, name, size, mtime_ns) VALUES (?, ?, ?, ?)', source_rows)
+                self.conn.executemany('INSERT INTO events (ts, track_id, artist_id, ms_played, weight, source_id) '
+                                      'VALUES (?, ?, ?, ?, ?, ?)', events)
+                self.conn.executemany('INSERT INTO marquee (artist, segment) VALUES (?, ?)', [
+                    (item.get('artistName', ''), item.get('segment', ''))
+                    for item in data['marquee'] if item.get('segment', '')
+                ])
+                for statement in INDEXES.split(';'):
+                    if statement.strip():
+                        self.conn.execute(statement)
+                self.conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', [
+                    ('schema_version', SCHEMA_VERSION),
+                    ('fingerprint', fingerprint),
+                    ('loaded_at', datetime.now().isoformat(timespec='seconds'))
+                ])
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def load_track_processor(self, processor: TrackProcessor) -> None:
+        """Rebuild TrackProcessor aggregates from the stored plays without touching JSON"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT e.track_id, t.name, a.name, COALESCE(al.name, ''), COALESCE(t.uri, ''),
+                       SUM(e.ms_played * e.weight), SUM(e.weight), MAX(e.ts)
+                FROM events e
+                JOIN tracks t ON t.id = e.track_id
+                JOIN artists a ON a.id = t.artist_id
+                LEFT JOIN albums al ON al.id = t.album_id
+                GROUP BY e.track_id
+            """).fetchall()
+            artists = self.conn.execute("""
+                SELECT a.name, SUM(e.ms_played * e.weight)
+                FROM events e JOIN artists a ON a.id = e.artist_id
+                GROUP BY e.artist_id
+            """).fetchall()
+            plays = np.array(self.conn.execute(
+                'SELECT ts, ms_played, weight, track_id, source_id FROM events WHERE ts IS NOT NULL'
+            ).fetchall(), dtype=np.int64).reshape(-1, 5)
+            # A source holds one kind of history, so its weight is that of any of its plays
+            sources = self.conn.execute("""
+                SELECT s.id, s.name, s.size, s.mtime_ns, MAX(e.weight)
+                FROM sources s JOIN events e ON e.source_id = s.id
+                GROUP BY s.id ORDER BY s.id
+            """).fetchall()
+
+        # Store track id -> position in processor.tracks, for the play log
+        track_positions = {}
+        for track_id, name, artist, album, uri, ms_played, play_count, last_played in rows:
+            key = f"{name}:{artist}"
+            track_positions[track_id] = processor.track_ids[key] = len(processor.track_ids)
+            processor.tracks[key] = Track(
+                name=name,
+                artist=artist,
+                album=album,
+                uri=uri,
+                ms_played=ms_played,
+                play_count=play_count,
+                last_played=from_epoch(last_played)
+            )
+        for artist, ms_played in artists:
+            processor.artists[artist] = ms_played
+
+        positions = np.zeros(max(track_positions, default=0) + 1, dtype=np.int64)
+        positions[list(track_positions)] = list(track_positions.values())
+        # Store source id -> id in the processor
+        source_ids = np.zeros(max((row[0] for row in sources), default=0) + 1, dtype=np.int64)
+        for source_id, name, size, mtime_ns, weight in sources:
+            source_ids[source_id] = processor.source_id(name, weight, (size, mtime_ns) if size is not None else None)
+
+        # Time bins and sessions come from extended history when there is any, as during
+        # ingestion; recent plays then only go to the play log
+        extended = plays[:, 2] == EXTENDED_WEIGHT
+        processor.sessions_from_extended = bool(extended.any())
+        session_plays = plays[extended] if processor.sessions_from_extended else plays
+        processor.record_play_times(session_plays[:, 0].astype('datetime64[s]'), session_plays[:, 1],
+                                    positions[session_plays[:, 3]], weight=session_plays[:, 2],
+                                    sources=source_ids[session_plays[:, 4]])
+        if processor.sessions_from_extended:
+            recent_plays = plays[~extended]
+            processor.record_play_times(recent_plays[:, 0].astype('datetime64[s]'), recent_plays[:, 1],
+                                        positions[recent_plays[:, 3]], weight=recent_plays[:, 2], bin_times=False,
+                                        sources=source_ids[recent_plays[:, 4]])
+        processor.record_sessions(session_plays[:, 0].astype('datetime64[s]'), session_plays[:, 1],
+                                  positions[session_plays[:, 3]])
+
+    def get_marquee_segments(self) -> Dict[str, List[str]]:
+        segments: Dict[str, List[str]] = {}
+        with self._lock:
+            rows = self.conn.execute('SELECT artist, segment FROM marquee ORDER BY rowid').fetchall()
+        for artist, segment in rows:
+            segments.setdefault(segment, []).append(artist)
+        return segments
+
+    def get_top_tracks(self, cutoff_date: Optional[datetime] = None, limit: int = 20,
+                       end_date: Optional[datetime] = None) -> List[Tuple[str, int]]:
+        """Tracks ranked by ms played in [cutoff_date, end_date) (uses the (track_id, ts) and (ts) indexes)"""
+        where, params = self._window(cutoff_date, end_date)
+        with self._lock:
+            rows = self.conn.execute(f"""
+                SELECT t.name, a.name, SUM(e.ms_played * e.weight) AS ms
+                FROM events e
+                JOIN tracks t ON t.id = e.track_id
+                JOIN artists a ON a.id = t.artist_id
+                {where}
+                GROUP BY e.track_id
+                ORDER BY ms DESC
+                LIMIT ?
+            """, params + [limit]).fetchall()
+        # Same "name:artist" keys as TrackProcessor.tracks
+        return [(f"{name}:{artist}", ms) for name, artist, ms in rows]
+
+    def get_top_artists(self, cutoff_date: Optional[datetime] = None, limit: int = 20,
+                        end_date: Optional[datetime] = None) -> List[Tuple[str, int]]:
+        """Artists ranked by ms played in [cutoff_date, end_date) (uses the (artist_id, ts) and (ts) indexes)"""
+        where, params = self._window(cutoff_date, end_date)
+        with self._lock:
+            return self.conn.execute(f"""
+                SELECT a.name, SUM(e.ms_played * e.weight) AS ms
+                FROM events e
+                JOIN artists a ON a.id = e.artist_id
+                {where}
+                GROUP BY e.artist_id
+                ORDER BY ms DESC
+                LIMIT ?
+            """, params + [limit]).fetchall()
+
+    def _window(self, cutoff_date: Optional[datetime],
+                end_date: Optional[datetime] = None) -> Tuple[str, list]:
+        conditions, params = [], []
+        if cutoff_date is not None:
+            conditions.append('e.ts >= ?')
+            params.append(to_epoch(cutoff_date))
+        if end_date is not None:
+            conditions.append('e.ts < ?')
+            params.append(to_epoch(end_date))
+        return ('WHERE ' + ' AND '.join(conditions) if conditions else ''), params
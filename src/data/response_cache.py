@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+DEFAULT_CACHE_PATH = os.path.join('.cache', 'spotify_responses.sqlite')
+
+DAY = 24 * 60 * 60
+# How long a cached object stays fresh, per endpoint: audio features never change, track
+# and album metadata rarely, while artist genres are re-tagged now and then
+TTLS = {'tracks': 30 * DAY, 'albums': 30 * DAY, 'audio-features': 365 * DAY, 'artists': 7 * DAY}
+DEFAULT_TTL = 7 * DAY
+# IDs the API did not know are remembered for a shorter time, in case they appear later
+NEGATIVE_TTL = DAY
+# Reserved ID whose negative entry records that an endpoint refused this app (403)
+CLOSED_ID = '*'
+# Bound parameters per query, under SQLite's historic limit of 999
+QUERY_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    endpoint TEXT NOT NULL,
+    id TEXT NOT NULL,
+    body TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, id)
+) WITHOUT ROWID;
+"""
+
+class ResponseCache:
+    """SQLite cache of Web API objects keyed by (endpoint, id), with per-endpoint TTLs.
+
+    A NULL body records an ID the API returned nothing for (negative caching), or under
+    CLOSED_ID an endpoint that refused the app; both expire after negative_ttl. Lookups
+    and stores take whole batches, so checking 50 IDs is one query.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttls: Optional[Dict[str, float]] = None,
+                 negative_ttl: float = NEGATIVE_TTL):
+        self.db_path = db_path
+        self.ttls = {**TTLS, **(ttls or {})}
+        self.negative_ttl = negative_ttl
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Shared by the client's worker threads, so serialize access ourselves
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get_many(self, endpoint: str, ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """Fresh cached entries among the given IDs; None values are cached negatives.
+
+        IDs missing from the result are the misses to fetch.
+        """
+        ids = list(ids)
+        now = time.time()
+        positive_cutoff = now - self.ttls.get(endpoint, DEFAULT_TTL)
+        negative_cutoff = now - self.negative_ttl
+        found: Dict[str, Optional[dict]] = {}
+        with self._lock:
+            for start in range(0, len(ids), QUERY_CHUNK):
+                chunk = ids[start:start + QUERY_CHUNK]
+                rows = self.conn.execute(
+                    f"SELECT id, body FROM responses WHERE endpoint = ? AND id IN ({','.join('?' * len(chunk))}) "
+                    "AND fetched_at >= CASE WHEN body IS NULL THEN ? ELSE ? END",
+                    (endpoint, *chunk, negative_cutoff, positive_cutoff)
+                )
+                found.update((key, json.loads(body) if body is not None else None) for key, body in rows)
+        return found
+
+    def put_many(self, endpoint: str, objects: Dict[str, Optional[dict]]) -> None:
+        """Store fetched objects in one transaction; None stores a negative entry"""
+        now = time.time()
+        rows = [(endpoint, key, json.dumps(value) if value is not None else None, now)
+                for key, value in objects.items()]
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)', rows)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def mark_closed(self, endpoint: str) -> None:
+        """Remember that the endpoint refused this app, so it is not asked again before negative_ttl"""
+        self.put_many(endpoint, {CLOSED_ID: None})
+
+    def is_closed(self, endpoint: str) -> bool:
+        return CLOSED_ID in self.get_many(endpoint, [CLOSED_ID])
+
+    def purge_expired(self) -> int:
+        """Delete entries past their TTL; returns how many were removed"""
+        now = time.time()
+        with self._lock:
+            removed = self.conn.execute('DELETE FROM responses WHERE body IS NULL AND fetched_at < ?',
+                                        (now - self.negative_ttl,)).rowcount
+            for endpoint in {endpoint for (endpoint,) in self.conn.execute('SELECT DISTINCT endpoint FROM responses')}:
+                removed += self.conn.execute(
+                    'DELETE FROM responses WHERE endpoint = ? AND body IS NOT NULL AND fetched_at < ?',
+                    (endpoint, now - self.ttls.get(endpoint, DEFAULT_TTL))
+                ).rowcount
+        return removed
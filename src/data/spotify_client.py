@@ -0,0 +1,333 @@
+"""Enrich an export with artist genres, audio features and album info from the Spotify Web API.
+
+Usage:
+    SPOTIPY_CLIENT_ID=... SPOTIPY_CLIENT_SECRET=... python -m src.data.spotify_client input-data --output enrichment
+    python -m src.data.spotify_client input-data --api-url http://127.0.0.1:8900/v1 --token test
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Set
+import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
+from .audio_features import FEATURE_COLUMNS, URI_PREFIX, AudioFeatures
+from .data_loader import DataLoader
+from .genre_map import GenreMap
+from .response_cache import DEFAULT_CACHE_PATH, ResponseCache
+
+API_URL = 'https://api.spotify.com/v1'
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+# Most IDs each endpoint accepts in one call, and the response key holding the objects
+BATCH_SIZES = {'tracks': 50, 'artists': 50, 'audio-features': 100, 'albums': 20}
+RESPONSE_KEYS = {'tracks': 'tracks', 'artists': 'artists', 'audio-features': 'audio_features', 'albums': 'albums'}
+DEFAULT_CONCURRENCY = 8
+MAX_RETRIES = 5
+# Seconds to wait after a 429 without a usable Retry-After header, and the cap on 5xx backoff
+DEFAULT_RETRY_AFTER = 1.0
+MAX_BACKOFF = 30.0
+REQUEST_TIMEOUT = 30
+# Refresh the access token this many seconds before it expires
+TOKEN_MARGIN = 60
+
+class SpotifyAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Spotify API error {status}: {message}")
+        self.status = status
+
+def _retry_after(response: requests.Response) -> float:
+    """Seconds the server asks us to wait: Retry-After as seconds or an HTTP date"""
+    value = response.headers.get('Retry-After', '')
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+class SpotifyClient:
+    """Client-credentials access to the Web API's batch endpoints.
+
+    One pooled HTTP session is shared by all worker threads. A bounded semaphore caps the
+    requests in flight across every caller, and a 429 pauses all of them for Retry-After
+    seconds, since the rate limit applies to the app rather than to one connection.
+    """
+
+    def __init__(self, client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                 token: Optional[str] = None, api_url: str = API_URL, token_url: str = TOKEN_URL,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 cache: Optional[ResponseCache] = None):
+        # Same environment variables spotipy reads
+        self.client_id = client_id or os.environ.get('SPOTIPY_CLIENT_ID')
+        self.client_secret = client_secret or os.environ.get('SPOTIPY_CLIENT_SECRET')
+        self.api_url = api_url.rstrip('/')
+        self.token_url = token_url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._token = token
+        self._token_expires = float('inf') if token else 0.0
+        # time.monotonic() until which no request may start, after a 429
+        self._paused_until = 0.0
+        # Endpoints that answered 403 during this run
+        self._closed: Set[str] = set()
+        # Calls made, 429s received, other retries and IDs answered from the cache, for reporting
+        self.stats: Counter = Counter()
+
+    def close(self) -> None:
+        self.session.close()
+        if self.cache:
+            # Expired entries are never served again, so keep them from piling up across runs
+            self.cache.purge_expired()
+            self.cache.close()
+
+    def __enter__(self) -> 'SpotifyClient':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _access_token(self) -> str:
+        with self._lock:
+            if time.monotonic() < self._token_expires - TOKEN_MARGIN:
+                return self._token
+            if not (self.client_id and self.client_secret):
+                raise SpotifyAPIError(401, "no credentials; set SPOTIPY_CLIENT_ID and SPOTIPY_CLIENT_SECRET")
+            response = self.session.post(self.token_url, data={'grant_type': 'client_credentials'},
+                                         auth=(self.client_id, self.client_secret), timeout=REQUEST_TIMEOUT)
+            if response.status_code != 200:
+                raise SpotifyAPIError(response.status_code, response.text[:200])
+            payload = response.json()
+            self._token = payload['access_token']
+            self._token_expires = time.monotonic() + payload.get('expires_in', 3600)
+            return self._token
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_for_pause(self) -> None:
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def get_batch(self, endpoint: str, ids: List[str]) -> List[Optional[dict]]:
+        """One call to a batch endpoint; objects in the order of ids, None for unknown IDs.
+
+        429s are retried after Retry-After, 5xx and connection errors with jittered
+        exponential backoff; other errors raise SpotifyAPIError.
+        """
+        if len(ids) > BATCH_SIZES[endpoint]:
+            raise ValueError(f"{endpoint} takes at most {BATCH_SIZES[endpoint]} IDs per call")
+        error = None
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            token = self._access_token()
+            with self._slots:
+                self._count('requests')
+                try:
+                    response = self.session.get(f"{self.api_url}/{endpoint}", params={'ids': ','.join(ids)},
+                                                headers={'Authorization': f"Bearer {token}"},
+                                                timeout=REQUEST_TIMEOUT)
+                except requests.RequestException as e:
+                    response, error = None, SpotifyAPIError(0, str(e))
+            if response is not None:
+                if response.status_code == 200:
+                    objects = response.json().get(RESPONSE_KEYS[endpoint]) or []
+                    return objects + [None] * (len(ids) - len(objects))
+                error = SpotifyAPIError(response.status_code, response.text[:200])
+                if response.status_code == 429:
+                    self._count('rate_limited')
+                    self._pause(_retry_after(response))
+                    continue
+                if response.status_code == 401 and self.client_id:
+                    # Token expired early or was revoked: fetch a new one and try again
+                    with self._lock:
+                        self._token_expires = 0.0
+                    continue
+                if response.status_code < 500:
+                    raise error
+            self._count('retries')
+            time.sleep(min(MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.0))
+        raise error
+
+    def fetch(self, endpoint: str, ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """Objects for any number of IDs; only cache misses go to the network, in full-size
+        batches fetched concurrently.
+
+        Each batch is cached as soon as it arrives, so when one batch fails for good the
+        others are kept for the next run; the first failure is raised once all have finished.
+        """
+        unique = list(dict.fromkeys(ids))
+        objects = self.cache.get_many(endpoint, unique) if self.cache else {}
+        with self._lock:
+            self.stats['cache_hits'] += len(objects)
+        misses = [key for key in unique if key not in objects]
+        size = BATCH_SIZES[endpoint]
+        batches = [misses[start:start + size] for start in range(0, len(misses), size)]
+        error: Optional[SpotifyAPIError] = None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.get_batch, endpoint, batch): batch for batch in batches}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    fetched = dict(zip(futures[future], future.result()))
+                except SpotifyAPIError as e:
+                    error = error or e
+                    continue
+                if self.cache:
+                    self.cache.put_many(endpoint, fetched)
+                objects.update(fetched)
+        if error:
+            raise error
+        return objects
+
+    def enrich(self, track_uris: Iterable[str]) -> 'Enrichment':
+        """Tracks (with albums) and audio features of the given URIs, then the genres of their artists"""
+        track_ids = [uri[len(URI_PREFIX):] for uri in track_uris if uri.startswith(URI_PREFIX)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            tracks = executor.submit(self.fetch, 'tracks', track_ids)
+            features = executor.submit(self.fetch_audio_features, track_ids)
+            tracks, features = tracks.result(), features.result()
+        artist_ids = [artist['id'] for track in tracks.values() if track
+                      for artist in track.get('artists', [])[:1] if artist.get('id')]
+        return Enrichment(tracks, self.fetch('artists', artist_ids), features)
+
+    def fetch_audio_features(self, track_ids: List[str]) -> Dict[str, Optional[dict]]:
+        """fetch('audio-features', ...), or nothing for apps the endpoint is closed to.
+
+        A refusal is cached like a negative entry, so later runs skip the endpoint until it expires.
+        """
+        if 'audio-features' in self._closed or (self.cache and self.cache.is_closed('audio-features')):
+            return {}
+        try:
+            return self.fetch('audio-features', track_ids)
+        except SpotifyAPIError as e:
+            # Apps registered since late 2024 are refused the audio-features endpoint
+            if e.status != 403:
+                raise
+            self._closed.add('audio-features')
+            if self.cache:
+                self.cache.mark_closed('audio-features')
+            print(f"Audio features unavailable to this app ({e}); skipping them")
+            return {}
+
+@dataclass
+class Enrichment:
+    """API objects by Spotify ID, as returned by the batch endpoints (None for unknown IDs)"""
+    tracks: Dict[str, Optional[dict]] = field(default_factory=dict)
+    artists: Dict[str, Optional[dict]] = field(default_factory=dict)
+    audio_features: Dict[str, Optional[dict]] = field(default_factory=dict)
+
+    def save(self, folder: str) -> Dict[str, str]:
+        """Write artist_genres.csv, audio_features.csv and albums.csv, usable with --genres
+        and --audio-features; returns the paths written"""
+        os.makedirs(folder, exist_ok=True)
+        paths = {name: os.path.join(folder, f"{name}.csv") for name in ('artist_genres', 'audio_features', 'albums')}
+
+        with open(paths['artist_genres'], 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['artist', 'genre', 'weight'])
+            for artist in self.artists.values():
+                for genre in (artist or {}).get('genres', []):
+                    writer.writerow([artist['name'], genre, 1])
+
+        with open(paths['audio_features'], 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['spotify_track_uri', *FEATURE_COLUMNS])
+            for track_id, features in self.audio_features.items():
+                if features:
+                    writer.writerow([URI_PREFIX + track_id, *(features.get(column, '') for column in FEATURE_COLUMNS)])
+
+        with open(paths['albums'], 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['spotify_track_uri', 'album_id', 'album', 'album_type', 'release_date', 'total_tracks'])
+            for track_id, track in self.tracks.items():
+                album = (track or {}).get('album')
+                if album:
+                    writer.writerow([URI_PREFIX + track_id, album.get('id', ''), album.get('name', ''),
+                                     album.get('album_type', ''), album.get('release_date', ''),
+                                     album.get('total_tracks', '')])
+        return paths
+
+    def audio_feature_table(self) -> AudioFeatures:
+        """The fetched audio features as a table to join onto the tracks"""
+        rows = [(URI_PREFIX + track_id, features) for track_id, features in self.audio_features.items() if features]
+        return AudioFeatures([uri for uri, _ in rows], {
+            column: np.array([np.nan if features.get(column) is None else features[column] for _, features in rows],
+                             dtype=np.float64)
+            for column in FEATURE_COLUMNS
+        })
+
+    def genre_map(self) -> GenreMap:
+        """The fetched artists' genres, each weighted equally"""
+        return GenreMap.from_pairs([
+            (artist['name'], genre, 1.0) for artist in self.artists.values() if artist
+            for genre in artist.get('genres', [])
+        ])
+
+    def to_json(self) -> Dict[str, Dict[str, Optional[dict]]]:
+        """The raw objects per endpoint, the recording format the mock server replays"""
+        return {'tracks': self.tracks, 'artists': self.artists, 'audio-features': self.audio_features}
+
+def export_track_uris(data_folder: str) -> List[str]:
+    """Distinct track URIs in an export's extended history (the only history carrying URIs)"""
+    data = DataLoader(data_folder).load_all_files()
+    return list(dict.fromkeys(
+        item['spotify_track_uri'] for item in data['extended_history'] if item.get('spotify_track_uri')
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch artist genres, audio features and album info for an export')
+    parser.add_argument('data_folder', help='Spotify export folder')
+    parser.add_argument('--output', default='enrichment', help='Folder to write the CSV files to')
+    parser.add_argument('--record', help='Also save the raw API responses as JSON, for replay by the mock server')
+    parser.add_argument('--api-url', default=API_URL, help='Web API base URL (e.g. a local mock server)')
+    parser.add_argument('--token-url', default=TOKEN_URL, help='Client-credentials token endpoint')
+    parser.add_argument('--token', help='Use this access token instead of client credentials')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='SQLite file caching API responses between runs')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch everything from the API, bypassing the cache')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Requests in flight at once')
+    args = parser.parse_args()
+
+    uris = export_track_uris(args.data_folder)
+    start = time.perf_counter()
+    with SpotifyClient(token=args.token, api_url=args.api_url, token_url=args.token_url,
+                       concurrency=args.concurrency, cache=None if args.no_cache else ResponseCache(args.cache)) as client:
+        enrichment = client.enrich(uris)
+        stats = client.stats
+    elapsed = time.perf_counter() - start
+
+    paths = enrichment.save(args.output)
+    if args.record:
+        with open(args.record, 'w', encoding='utf-8') as f:
+            json.dump(enrichment.to_json(), f)
+    print(f"Enriched {len(uris)} tracks and {len(enrichment.artists)} artists in {elapsed:.2f}s "
+          f"({stats['requests']} requests, {stats['rate_limited']} rate limited, {stats['retries']} retried, "
+          f"{stats['cache_hits']} cached)")
+    for path in paths.values():
+        print(f"Saved: {path}")
+
+if __name__ == "__main__":
+    main()
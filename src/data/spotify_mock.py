@@ -0,0 +1,166 @@
+"""Local stand-in for the Spotify Web API batch endpoints, replaying recorded objects.
+
+Recordings are the JSON written by `python -m src.data.spotify_client --record`: for each
+endpoint ("tracks", "artists", "audio-features"), the API object of each Spotify ID.
+
+Usage:
+    python -m src.data.spotify_mock responses.json --port 8900 --rate-limit 20 --latency 0.05
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+from .spotify_client import BATCH_SIZES, RESPONSE_KEYS
+
+class MockSpotifyServer:
+    """Serves recorded objects from the batch endpoints with the real response shapes.
+
+    Optionally adds latency and enforces a requests-per-second limit, answering 429 with a
+    Retry-After header once it is exceeded. Endpoints listed in closed answer 403, as
+    audio-features does for newer apps, and the first `failures` admitted requests answer
+    503. Counts requests and the largest batch seen.
+    """
+
+    def __init__(self, recordings: Dict[str, Dict[str, Optional[dict]]], host: str = '127.0.0.1',
+                 port: int = 0, rate_limit: Optional[float] = None, latency: float = 0.0,
+                 closed: Iterable[str] = (), failures: int = 0):
+        self.recordings = recordings
+        self.closed = set(closed)
+        self.failures = failures
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.stats = {'requests': 0, 'rate_limited': 0, 'server_errors': 0, 'max_batch': 0}
+        self._lock = threading.Lock()
+        # Start of the current one-second rate window and the requests admitted in it
+        self._window_start = 0.0
+        self._window_requests = 0
+        self._thread: Optional[threading.Thread] = None
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                mock._handle_get(self)
+
+            def do_POST(self):
+                # Token endpoint: any client credentials are accepted
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                mock._send(self, 200, {'access_token': 'mock-token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @classmethod
+    def from_file(cls, path: str, **options) -> 'MockSpotifyServer':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), **options)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockSpotifyServer':
+        """Serve from a background thread; the API is at url + '/v1', tokens at url + '/api/token'"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def _admit(self) -> Optional[float]:
+        """None if a request may proceed, else the seconds until the next rate window"""
+        with self._lock:
+            self.stats['requests'] += 1
+            if not self.rate_limit:
+                return None
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_requests = now, 0
+            if self._window_requests < self.rate_limit:
+                self._window_requests += 1
+                return None
+            self.stats['rate_limited'] += 1
+            return 1.0 - (now - self._window_start)
+
+    def _handle_get(self, request: BaseHTTPRequestHandler) -> None:
+        url = urlsplit(request.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if endpoint not in RESPONSE_KEYS:
+            self._send(request, 404, {'error': {'status': 404, 'message': 'Service not found'}})
+            return
+        ids = [value for value in ','.join(parse_qs(url.query).get('ids', [])).split(',') if value]
+        if not ids or len(ids) > BATCH_SIZES[endpoint]:
+            self._send(request, 400, {'error': {'status': 400, 'message': 'Invalid ids'}})
+            return
+
+        wait = self._admit()
+        if wait is not None:
+            # Whole seconds, like the real API
+            self._send(request, 429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                       {'Retry-After': str(max(1, round(wait)))})
+            return
+        with self._lock:
+            failing = self.stats['server_errors'] < self.failures
+            if failing:
+                self.stats['server_errors'] += 1
+        if failing:
+            self._send(request, 503, {'error': {'status': 503, 'message': 'Service unavailable'}})
+            return
+        if endpoint in self.closed:
+            self._send(request, 403, {'error': {'status': 403, 'message': 'Forbidden'}})
+            return
+        with self._lock:
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(ids))
+        if self.latency:
+            time.sleep(self.latency)
+        objects = self.recordings.get(endpoint, {})
+        self._send(request, 200, {RESPONSE_KEYS[endpoint]: [objects.get(value) for value in ids]})
+
+    @staticmethod
+    def _send(request: BaseHTTPRequestHandler, status: int, payload: dict,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded Spotify Web API responses locally')
+    parser.add_argument('recordings', help='JSON recordings written by spotify_client --record')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to bind')
+    parser.add_argument('--port', type=int, default=8900, help='Port to bind')
+    parser.add_argument('--rate-limit', type=float, help='Requests per second before answering 429')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API response')
+    parser.add_argument('--closed', nargs='*', default=[], choices=sorted(RESPONSE_KEYS),
+                        help='Endpoints to answer with 403, e.g. audio-features')
+    parser.add_argument('--failures', type=int, default=0, help='Answer this many first requests with 503')
+    args = parser.parse_args()
+
+    server = MockSpotifyServer.from_file(args.recordings, host=args.host, port=args.port,
+                                         rate_limit=args.rate_limit, latency=args.latency, closed=args.closed,
+                                         failures=args.failures)
+    print(f"Mock Spotify API at {server.url}/v1 (tokens at {server.url}/api/token)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Served {server.stats['requests']} requests, {server.stats['rate_limited']} rate limited")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Deterministic generator of synthetic Spotify data exports for scale testing.
+
+Usage:
+    python -m src.data.synthetic_export output/synthetic --plays 1000000 --seed 42
+"""
+import argparse
+import json
+import math
+import os
+import random
+import string
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import List, Optional
+from tqdm import tqdm
+
+MIN_PLAYS = 10_000
+MAX_PLAYS = 50_000_000
+
+# Relative listening activity per hour of day and per weekday (Monday first)
+HOUR_WEIGHTS = [
+    0.8, 0.4, 0.2, 0.1, 0.1, 0.2, 0.6, 1.6, 2.4, 2.2, 1.8, 1.7,
+    1.9, 1.8, 1.7, 1.8, 2.1, 2.6, 2.8, 2.7, 2.5, 2.2, 1.8, 1.3
+]
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.05, 1.05, 1.15, 1.25, 0.9]
+
+PLATFORMS = ['android', 'ios', 'windows', 'osx', 'web_player']
+SYLLABLES = [
+    'ka', 'lo', 'mi', 're', 'su', 'ta', 'vo', 'ne', 'ri', 'sa', 'do', 'el',
+    'an', 'or', 'ix', 'um', 'ly', 'ze', 'qu', 'ba', 'no', 'vi', 'ra', 'th'
+]
+NAME_WORDS = [
+    'Night', 'Light', 'Echo', 'River', 'Dream', 'Fire', 'Glass', 'Velvet',
+    'Signal', 'Ghost', 'Summer', 'Static', 'Silver', 'Paper', 'Heart', 'Wire'
+]
+MARQUEE_SEGMENTS = [
+    'Super Listeners', 'Moderate listeners', 'Light listeners', 'Previously Active Listeners'
+]
+
+@dataclass
+class _Artist:
+    name: str
+    track_ids: List[int]
+    track_cum_weights: List[float]
+
+@dataclass
+class _Track:
+    name: str
+    artist: str
+    album: str
+    uri: str
+    duration_ms: int
+    fragment: str  # pre-serialized JSON fields shared by every play of this track
+
+def _zipf_cum_weights(count: int, exponent: float) -> List[float]:
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+class SyntheticExportGenerator:
+    """Write a realistic, seed-deterministic Spotify export to a folder"""
+
+    def __init__(self, output_folder: str, plays: int = 100_000, seed: int = 42,
+                 end_date: date = date(2025, 6, 30), years: int = 6,
+                 artists: Optional[int] = None, artist_exponent: float = 1.1,
+                 track_exponent: float = 1.3, recent_days: int = 365,
+                 plays_per_file: int = 16_000, playlists: int = 12):
+        if not MIN_PLAYS <= plays <= MAX_PLAYS:
+            raise ValueError(f"plays must be between {MIN_PLAYS} and {MAX_PLAYS}")
+        self.output_folder = output_folder
+        self.plays = plays
+        self.rng = random.Random(seed)
+        self.end_date = end_date
+        self.start_date = end_date - timedelta(days=365 * years)
+        self.artist_count = artists or min(50_000, max(100, int(math.sqrt(plays) * 4)))
+        self.artist_exponent = artist_exponent
+        self.track_exponent = track_exponent
+        self.recent_days = recent_days
+        self.plays_per_file = plays_per_file
+        self.playlist_count = playlists
+
+        self.artists: List[_Artist] = []
+        self.tracks: List[_Track] = []
+        self.artist_plays: List[int] = []
+
+    def generate(self) -> None:
+        os.makedirs(self.output_folder, exist_ok=True)
+        self._build_catalog()
+        self._write_history()
+        self._write_marquee()
+        self._write_playlists()
+
+    def _name(self, syllables: int) -> str:
+        return ''.join(self.rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+    def _title(self) -> str:
+        return ' '.join(self.rng.choice(NAME_WORDS) for _ in range(self.rng.randint(1, 3)))
+
+    def _uri(self) -> str:
+        alphabet = string.ascii_letters + string.digits
+        return 'spotify:track:' + ''.join(self.rng.choice(alphabet) for _ in range(22))
+
+    def _build_catalog(self) -> None:
+        for artist_id in range(self.artist_count):
+            artist_name = f"{self._name(2)} {self._name(self.rng.randint(1, 3))}"
+            track_ids = []
+            for album_no in range(self.rng.randint(1, 5)):
+                album_name = f"{self._title()} {album_no + 1}" if album_no else self._title()
+                for track_no in range(self.rng.randint(5, 14)):
+                    track_name = f"{self._title()} ({self._name(2)})" if track_no % 4 == 3 else self._title()
+                    uri = self._uri()
+                    fragment = (
+                        f'"master_metadata_track_name": {json.dumps(track_name)}, '
+                        f'"master_metadata_album_artist_name": {json.dumps(artist_name)}, '
+                        f'"master_metadata_album_album_name": {json.dumps(album_name)}, '
+                        f'"spotify_track_uri": "{uri}"'
+                    )
+                    track_ids.append(len(self.tracks))
+                    self.tracks.append(_Track(track_name, artist_name, album_name, uri,
+                                              self.rng.randint(120_000, 360_000), fragment))
+            # Popularity inside an artist's catalogue is skewed too, in shuffled order
+            self.rng.shuffle(track_ids)
+            self.artists.append(_Artist(artist_name, track_ids,
+                                        _zipf_cum_weights(len(track_ids), self.track_exponent)))
+        self.artist_plays = [0] * self.artist_count
+
+    def _daily_play_counts(self) -> List[int]:
+        """Spread the total play count over days: weekday effect, slow drift, idle days"""
+        days = (self.end_date - self.start_date).days
+        weights = []
+        level = 1.0
+        for offset in range(days):
+            day = self.start_date + timedelta(days=offset)
+            level = min(3.0, max(0.3, level * math.exp(self.rng.gauss(0, 0.03))))
+            if self.rng.random() < 0.12:
+                weights.append(0.0)
+            else:
+                weights.append(level * WEEKDAY_WEIGHTS[day.weekday()] * self.rng.lognormvariate(0, 0.4))
+
+        scale = self.plays / sum(weights)
+        counts = [int(w * scale) for w in weights]
+        remainders = sorted(range(days), key=lambda i: weights[i] * scale - counts[i], reverse=True)
+        for i in remainders[:self.plays - sum(counts)]:
+            counts[i] += 1
+        return counts
+
+    def _write_history(self) -> None:
+        artist_cum = _zipf_cum_weights(self.artist_count, self.artist_exponent)
+        artist_total = artist_cum[-1]
+        hour_cum = list(accumulate(HOUR_WEIGHTS))
+        recent_start = self.end_date - timedelta(days=self.recent_days)
+        epoch = datetime(1970, 1, 1)
+
+        extended = _ChunkedJsonWriter(self.output_folder, 'Streaming_History_Audio', self.plays_per_file, True)
+        recent = _ChunkedJsonWriter(self.output_folder, 'StreamingHistory_music', 10_000, False)
+        rng = self.rng
+        clock = 0  # seconds since epoch of the end of the previous play
+
+        with tqdm(total=self.plays, desc="Generating plays") as progress:
+            for offset, day_plays in enumerate(self._daily_play_counts()):
+                if not day_plays:
+                    continue
+                day = self.start_date + timedelta(days=offset)
+                day_start = int((datetime(day.year, day.month, day.day) - epoch).total_seconds())
+                in_recent = day >= recent_start
+
+                # Split the day into listening sessions starting at typical hours
+                sessions = []
+                remaining = day_plays
+                while remaining:
+                    length = min(remaining, max(1, int(rng.expovariate(1 / 12))))
+                    hour = bisect_right(hour_cum, rng.random() * hour_cum[-1])
+                    sessions.append((hour * 3600 + rng.randrange(3600), length))
+                    remaining -= length
+                sessions.sort()
+
+                for start, length in sessions:
+                    clock = max(clock, day_start + start)
+                    artist_id = bisect_right(artist_cum, rng.random() * artist_total)
+                    shuffle = rng.random() < 0.4
+                    reason_start = 'clickrow'
+                    for _ in range(length):
+                        # Sessions mostly stay with one artist, occasionally drifting
+                        if rng.random() < 0.3:
+                            artist_id = bisect_right(artist_cum, rng.random() * artist_total)
+                        artist = self.artists[artist_id]
+                        pick = bisect_right(artist.track_cum_weights,
+                                            rng.random() * artist.track_cum_weights[-1])
+                        track = self.tracks[artist.track_ids[pick]]
+
+                        skipped = rng.random() < 0.15
+                        if skipped:
+                            ms_played = rng.randint(500, 30_000)
+                            reason_end = 'fwdbtn'
+                        else:
+                            ms_played = track.duration_ms if rng.random() < 0.9 else rng.randint(30_000, track.duration_ms)
+                            reason_end = 'trackdone' if ms_played == track.duration_ms else 'endplay'
+
+                        clock += ms_played // 1000 + 1
+                        when = epoch + timedelta(seconds=clock)
+                        extended.write(when, (
+                            f'{{"ts": "{when:%Y-%m-%dT%H:%M:%SZ}", "platform": "{PLATFORMS[artist_id % len(PLATFORMS)]}", '
+                            f'"ms_played": {ms_played}, "conn_country": "CZ", "ip_addr": "10.0.0.1", '
+                            f'{track.fragment}, "episode_name": null, "episode_show_name": null, '
+                            f'"spotify_episode_uri": null, "audiobook_title": null, "audiobook_uri": null, '
+                            f'"audiobook_chapter_uri": null, "audiobook_chapter_title": null, '
+                            f'"reason_start": "{reason_start}", "reason_end": "{reason_end}", '
+                            f'"shuffle": {"true" if shuffle else "false"}, "skipped": {"true" if skipped else "false"}, '
+                            f'"offline": false, "offline_timestamp": {clock * 1000}, "incognito_mode": false}}'
+                        ))
+                        if in_recent:
+                            recent.write(when, json.dumps({
+                                'endTime': when.strftime('%Y-%m-%d %H:%M'),
+                                'artistName': track.artist,
+                                'trackName': track.name,
+                                'msPlayed': ms_played
+                            }))
+                        self.artist_plays[artist_id] += 1
+                        reason_start = 'fwdbtn' if skipped else 'trackdone'
+                    progress.update(length)
+
+        extended.close()
+        recent.close()
+
+    def _write_marquee(self) -> None:
+        ranked = sorted(range(self.artist_count), key=lambda i: self.artist_plays[i], reverse=True)
+        listened = [i for i in ranked if self.artist_plays[i]]
+        marquee = []
+        for position, artist_id in enumerate(listened[:500]):
+            segment = MARQUEE_SEGMENTS[min(3, position * 4 // max(1, min(500, len(listened))))]
+            marquee.append({'artistName': self.artists[artist_id].name, 'segment': segment})
+        with open(os.path.join(self.output_folder, 'Marquee.json'), 'w', encoding='utf-8') as f:
+            json.dump(marquee, f, indent=2)
+
+    def _write_playlists(self) -> None:
+        playlists = []
+        popular = sorted(range(self.artist_count), key=lambda i: self.artist_plays[i], reverse=True)[:200]
+        for number in range(self.playlist_count):
+            modified = self.start_date + timedelta(days=self.rng.randrange((self.end_date - self.start_date).days))
+            items = []
+            for _ in range(self.rng.randint(15, 80)):
+                artist = self.artists[self.rng.choice(popular)]
+                track = self.tracks[self.rng.choice(artist.track_ids)]
+                items.append({
+                    'track': {
+                        'trackName': track.name,
+                        'artistName': track.artist,
+                        'albumName': track.album,
+                        'trackUri': track.uri
+                    },
+                    'episode': None,
+                    'audiobook': None,
+                    'localTrack': None,
+                    'addedDate': modified.isoformat()
+                })
+            playlists.append({
+                'name': f"{self._title()} Mix {number + 1}",
+                'lastModifiedDate': modified.isoformat(),
+                'collaborators': [],
+                'items': items,
+                'description': None,
+                'numberOfFollowers': 0
+            })
+        with open(os.path.join(self.output_folder, 'Playlist1.json'), 'w', encoding='utf-8') as f:
+            json.dump({'playlists': playlists}, f, indent=2)
+
+class _ChunkedJsonWriter:
+    """Stream JSON array records into numbered files, named like Spotify names them"""
+
+    def __init__(self, folder: str, prefix: str, records_per_file: int, year_in_name: bool):
+        self.folder = folder
+        self.prefix = prefix
+        self.records_per_file = records_per_file
+        self.year_in_name = year_in_name
+        self.index = 0
+        self.file = None
+        self.count = 0
+        self.first_year = None
+        self.last_year = None
+
+    def write(self, when: datetime, record: str) -> None:
+        if self.file is None:
+            self.file = open(self._temp_path(), 'w', encoding='utf-8')
+            self.file.write('[\n')
+            self.first_year = when.year
+        else:
+            self.file.write(',\n')
+        self.file.write(record)
+        self.last_year = when.year
+        self.count += 1
+        if self.count == self.records_per_file:
+            self._finish_file()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self._finish_file()
+
+    def _temp_path(self) -> str:
+        return os.path.join(self.folder, f".{self.prefix}_{self.index}.json.tmp")
+
+    def _finish_file(self) -> None:
+        self.file.write('\n]\n')
+        self.file.close()
+        if not self.year_in_name:
+            name = f"{self.prefix}_{self.index}.json"
+        elif self.first_year == self.last_year:
+            name = f"{self.prefix}_{self.first_year}_{self.index}.json"
+        else:
+            name = f"{self.prefix}_{self.first_year}-{self.last_year}_{self.index}.json"
+        os.replace(self._temp_path(), os.path.join(self.folder, name))
+        self.file = None
+        self.count = 0
+        self.index += 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Spotify data export for scale testing')
+    parser.add_argument('output_folder', help='Folder to write the JSON export files to')
+    parser.add_argument('--plays', type=int, default=100_000, help=f'Number of plays ({MIN_PLAYS}-{MAX_PLAYS})')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives identical files')
+    parser.add_argument('--years', type=int, default=6, help='Years of listening history to cover')
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date(2025, 6, 30),
+                        help='Last day of the history (YYYY-MM-DD)')
+    parser.add_argument('--artists', type=int, help='Number of artists in the catalogue (default scales with plays)')
+    args = parser.parse_args()
+
+    SyntheticExportGenerator(args.output_folder, args.plays, args.seed, args.end_date,
+                             args.years, args.artists).generate()
+    print(f"Synthetic export written to: {args.output_folder}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import concurrent.futures
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from reportlab.lib.styles import getSampleStyleSheet
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+from src.report.pdf_generator import PDFGenerator
+
+# Per-worker state, created once by _init_worker and reused for every report
+_worker_styles = None
+
+@dataclass
+class BatchResult:
+    data_folder: str
+    output_file: str
+    elapsed: float
+    error: Optional[str] = None
+
+def _init_worker():
+    """Warm up a worker process: build the stylesheet once for all its reports"""
+    global _worker_styles
+    _worker_styles = getSampleStyleSheet()
+
+def _generate_single_report(data_folder: str, output_file: str, max_items: int,
+                            chart_format: str, timezone: Optional[str] = None,
+                            audio_features_path: Optional[str] = None,
+                            genres_path: Optional[str] = None) -> BatchResult:
+    """Analyze one export folder and write its report (runs inside a worker)"""
+    if _worker_styles is None:
+        _init_worker()
+
+    start_time = time.perf_counter()
+    try:
+        analyzer = SpotifyAnalyzer(data_folder, max_items, timezone=timezone,
+                                   audio_features_path=audio_features_path, genres_path=genres_path)
+        analyzer.analyze()
+        PDFGenerator(analyzer, output_file, chart_format=chart_format,
+                     styles=_worker_styles).generate_report()
+    except Exception as e:
+        return BatchResult(data_folder, output_file, time.perf_counter() - start_time, str(e))
+    return BatchResult(data_folder, output_file, time.perf_counter() - start_time)
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def load_manifest(manifest_file: str) -> List[str]:
+    """Read export folders from a manifest (one path per line, '#' comments allowed)"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    folders = []
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            folders.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return folders
+
+class BatchReportGenerator:
+    """Generate one report per export folder using a shared pool of warm worker processes"""
+
+    def __init__(self, jobs: List[Tuple[str, str]], max_items: int = 20,
+                 chart_format: str = 'vector', workers: Optional[int] = None,
+                 timezone: Optional[str] = None, audio_features_path: Optional[str] = None,
+                 genres_path: Optional[str] = None):
+        self.jobs = jobs
+        self.max_items = max_items
+        self.chart_format = chart_format
+        self.timezone = timezone
+        self.audio_features_path = audio_features_path
+        self.genres_path = genres_path
+        self.workers = workers or min(len(jobs), os.cpu_count() or 1)
+        self.results: List[BatchResult] = []
+        self.elapsed = 0.0
+
+    def run(self) -> List[BatchResult]:
+        start_time = time.perf_counter()
+        self.results = []
+
+        if self.workers <= 1:
+            _init_worker()
+            for data_folder, output_file in self.jobs:
+                self._record(_generate_single_report(
+                    data_folder, output_file, self.max_items, self.chart_format, self.timezone,
+                    self.audio_features_path, self.genres_path))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker) as executor:
+                futures = [
+                    executor.submit(_generate_single_report, data_folder, output_file,
+                                    self.max_items, self.chart_format, self.timezone,
+                                    self.audio_features_path, self.genres_path)
+                    for data_folder, output_file in self.jobs
+                ]
+                for future in concurrent.futures.as_completed(futures):
+                    self._record(future.result())
+
+        self.elapsed = time.perf_counter() - start_time
+        return self.results
+
+    def _record(self, result: BatchResult) -> None:
+        self.results.append(result)
+        if result.error:
+            print(f"Failed {result.data_folder}: {result.error}")
+        else:
+            print(f"Report for {result.data_folder} saved to {result.output_file} ({result.elapsed:.2f}s)")
+
+    def print_summary(self) -> None:
+        latencies = [result.elapsed for result in self.results if not result.error]
+        failures = len(self.results) - len(latencies)
+
+        print(f"Batch complete: {len(latencies)} reports, {failures} failed, "
+              f"{self.workers} workers, {self.elapsed:.2f} seconds")
+        if not latencies:
+            return
+
+        throughput = len(latencies) / self.elapsed if self.elapsed > 0 else 0
+        print(f"Throughput: {throughput:.2f} reports/second")
+        print(f"Per-report latency: p50 {_percentile(latencies, 50):.2f}s, "
+              f"p95 {_percentile(latencies, 95):.2f}s, max {max(latencies):.2f}s")
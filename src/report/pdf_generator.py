@@ -6,15 +6,22 @@ import matplotlib.pyplot as plt
 import io
 from typing import List, Any
 from collections import Counter
-from src.utils.helpers import HelperMethods
+from src.utils.helpers import HelperMethods, MOOD_GENRES
+from src.report.visualizations import ChartGenerator
+from src.utils.metrics import metrics
 from datetime import datetime, timedelta
 from reportlab.lib.pdfencrypt import StandardEncryption
 from reportlab.pdfbase.pdfdoc import PDFInfo, PDFDate
 import os
 
+CHART_FORMATS = ('vector', 'png')
+
 class PDFGenerator:
-    def __init__(self, analyzer, output_file: str):
+    def __init__(self, analyzer, output_file: str, chart_format: str = 'vector', styles=None):
+        if chart_format not in CHART_FORMATS:
+            raise ValueError(f"Unknown chart format: {chart_format}")
         self.analyzer = analyzer
+        self.chart_format = chart_format
         
         # Ensure output directory exists
         output_dir = os.path.dirname(output_file)
@@ -45,7 +52,8 @@ class PDFGenerator:
             bottomMargin=72
         )
         
-        self.styles = getSampleStyleSheet()
+        # Stylesheets are read-only here, so batch runs can share one instance
+        self.styles = styles if styles is not None else getSampleStyleSheet()
         self.helpers = HelperMethods(analyzer)
 
     def generate_report(self):
@@ -53,10 +61,12 @@ class PDFGenerator:
         elements = []
         
         # Build elements list
-        self._build_report_elements(elements)
+        with metrics.stage('report sections'):
+            self._build_report_elements(elements)
         
         # Set PDF info during build
-        self.doc.build(elements, onFirstPage=self._set_pdf_info)
+        with metrics.stage('pdf build', records=len(elements)):
+            self.doc.build(elements, onFirstPage=self._set_pdf_info)
 
     def _set_pdf_info(self, canvas, doc):
         """Set PDF info during document build"""
@@ -67,8 +77,29 @@ class PDFGenerator:
             canvas.setCreator(self.doc_info['Creator'])
             canvas.setProducer(self.doc_info['Producer'])
 
-    def _create_chart(self, data, title, chart_type='pie'):
-        """Create charts for the report"""
+    def _create_chart(self, data, title, chart_type='pie', width=400, height=300):
+        """Create a chart flowable, vector by default with PNG as fallback"""
+        with metrics.stage('chart', title=title, format=self.chart_format):
+            if self.chart_format == 'vector':
+                if chart_type == 'pie':
+                    return ChartGenerator.create_vector_pie_chart(data.most_common(5), title, width, height)
+                elif chart_type == 'bar':
+                    return ChartGenerator.create_vector_bar_chart(data.most_common(10), title, width, height)
+            
+            return Image(self._create_png_chart(data, title, chart_type), width=width, height=height)
+
+    def _create_heatmap(self, matrix, title, width=400, height=200, column_labels=None):
+        """Create a heatmap flowable (weekday x hour unless column labels are given)"""
+        with metrics.stage('chart', title=title, format=self.chart_format):
+            matrix = [[float(value) for value in row] for row in matrix]
+            if self.chart_format == 'vector':
+                return ChartGenerator.create_vector_heatmap(matrix, title, width=width, height=height,
+                                                            column_labels=column_labels)
+            return Image(ChartGenerator.create_heatmap(matrix, title, column_labels=column_labels),
+                         width=width, height=height)
+
+    def _create_png_chart(self, data, title, chart_type='pie'):
+        """Render a chart to PNG with matplotlib"""
         plt.figure(figsize=(8, 6))
         
         if chart_type == 'pie':
@@ -95,11 +126,17 @@ class PDFGenerator:
     def _build_report_elements(self, elements):
         """Build all elements for the PDF report"""
         # Add each section in order
-        self._add_listening_overview(elements)
-        self._add_genre_analysis(elements)
-        self._add_artist_deep_dive(elements)
-        self._add_mood_recommendations(elements)
-        self._add_discovery_suggestions(elements)
+        sections = [
+            self._add_listening_overview,
+            self._add_year_in_review,
+            self._add_genre_analysis,
+            self._add_artist_deep_dive,
+            self._add_mood_recommendations,
+            self._add_discovery_suggestions
+        ]
+        for add_section in sections:
+            with metrics.stage('report section', section=add_section.__name__.replace('_add_', '')):
+                add_section(elements)
 
     def _add_listening_overview(self, elements):
         """Add detailed listening overview section"""
@@ -110,18 +147,80 @@ class PDFGenerator:
         recent_tracks = self.helpers._get_recent_tracks(days=90)  # Use helpers instance
         total_tracks = self.analyzer.track_processor.tracks
         
+        active_days, total_days = self.helpers._count_active_days()
+        streak, streak_start, streak_end = self.helpers._get_longest_streak()
+        sessions, session_minutes, session_tracks, sessions_per_day = self.helpers._get_session_stats()
+        
         # Add statistics
         stats_text = [
             f"Total Unique Artists: {len(self.analyzer.track_processor.artists)}",
             f"Recent Active Artists: {len(self.helpers._get_recent_artists(days=90))}",  # Use helpers
             f"Average Daily Listening Time: {self.helpers._calculate_daily_average():.1f} hours",  # Use helpers
-            f"Most Active Listening Time: {self.helpers._get_peak_listening_hours()}"  # Use helpers
+            f"Active Listening Days: {active_days} of {total_days}",
+            f"Longest Listening Streak: {streak} days"
+            + (f" ({streak_start:%Y-%m-%d} to {streak_end:%Y-%m-%d})" if streak else ""),
+            f"Most Active Listening Time: {self.helpers._get_peak_listening_hours()}",  # Use helpers
+            f"Listening Sessions: {sessions} (typically {session_minutes:.0f} minutes and "
+            f"{session_tracks:.1f} tracks, {sessions_per_day:.1f} per active day)"
         ]
         
         for stat in stats_text:
             elements.append(Paragraph(stat, self.styles['Normal']))
             elements.append(Spacer(1, 8))
         
+        if sessions:
+            elements.append(Spacer(1, 12))
+            session_data = [['Session Length', 'Sessions', 'Share']]
+            for label, count in self.helpers._get_session_length_distribution():
+                session_data.append([label, str(count), f"{count / sessions * 100:.1f}%"])
+            session_table = Table(session_data, colWidths=[200, 100, 150])
+            self._apply_table_style(session_table)
+            elements.append(session_table)
+        
+        elements.append(Spacer(1, 12))
+        elements.append(self._create_heatmap(
+            self.helpers._get_hour_of_week_heatmap(),
+            "Listening Time by Weekday and Hour"
+        ))
+        elements.append(Spacer(1, 12))
+        calendar, month_labels = self.helpers._get_listening_calendar()
+        elements.append(self._create_heatmap(
+            calendar,
+            "Listening Calendar (Last 53 Weeks)",
+            height=130,
+            column_labels=month_labels
+        ))
+        elements.append(Spacer(1, 24))
+
+    def _add_year_in_review(self, elements):
+        """Add a summary row for every year in the export, plus a lifetime total"""
+        elements.append(Paragraph("Year in Review", self.styles['Heading1']))
+        elements.append(Spacer(1, 12))
+        
+        partitions = self.analyzer.get_year_partitions()
+        if not partitions.years:
+            elements.append(Paragraph("No dated listening history found", self.styles['Normal']))
+            elements.append(Spacer(1, 24))
+            return
+        
+        tracks = self.analyzer.track_processor.tracks
+        year_data = [['Year', 'Hours', 'Days', 'Top Artist', 'Top Song']]
+        summaries = [partitions.years[year] for year in sorted(partitions.years)] + [partitions.lifetime()]
+        for summary in summaries:
+            top_artist = summary.artists.most_common(1)[0][0] if summary.artists else ''
+            top_key = summary.tracks.most_common(1)[0][0] if summary.tracks else ''
+            top_song = tracks[top_key].name if top_key in tracks else top_key
+            year_data.append([
+                str(summary.year) if summary.year else 'All',
+                f"{summary.ms_played / (1000 * 60 * 60):.0f}",
+                str(len(summary.days)),
+                top_artist,
+                top_song
+            ])
+        
+        table = Table(year_data, colWidths=[45, 55, 55, 140, 175])
+        self._apply_table_style(table)
+        elements.append(table)
         elements.append(Spacer(1, 24))
 
     def _add_genre_analysis(self, elements):
@@ -136,7 +235,7 @@ class PDFGenerator:
             "Genre Distribution",
             chart_type='pie'
         )
-        elements.append(Image(genre_chart, width=400, height=300))
+        elements.append(genre_chart)
         elements.append(Spacer(1, 24))
 
     def _add_artist_deep_dive(self, elements):
@@ -262,17 +361,27 @@ class PDFGenerator:
         elements.append(Paragraph("Mood-Based Playlist Suggestions", self.styles['Heading1']))
         elements.append(Spacer(1, 12))
         
-        moods = {
-            "Relaxing": "Ambient, Downtempo, Acoustic",
-            "Energetic": "Rock, Electronic, Pop",
-            "Melancholic": "Alternative, Indie, Blues",
-            "Happy": "Pop, Dance, Feel-good",
-            "Focus": "Instrumental, Classical, Minimal"
-        }
+        moods = self.helpers._get_mood_distribution()
+        if moods:
+            elements.append(self._create_chart(moods, "Listening Time by Mood", chart_type='pie'))
+            elements.append(Spacer(1, 12))
         
-        for mood, genres in moods.items():
+        # Only available when an audio features file was supplied
+        profile = self.helpers._get_audio_profile()
+        if profile:
+            elements.append(Paragraph("Your Audio Profile", self.styles['Heading2']))
+            elements.append(Paragraph(", ".join(
+                f"{name.capitalize()}: {value:.0f} BPM" if name == 'tempo' else f"{name.capitalize()}: {value:.2f}"
+                for name, value in profile.items()
+            ), self.styles['Normal']))
+            tempo = self.helpers._get_tempo_distribution()
+            if tempo:
+                elements.append(self._create_chart(tempo, "Listening Time by Tempo", chart_type='bar'))
+            elements.append(Spacer(1, 12))
+        
+        for mood, genres in MOOD_GENRES.items():
             elements.append(Paragraph(f"{mood} Playlist", self.styles['Heading2']))
-            elements.append(Paragraph(f"Related Genres: {genres}", self.styles['Normal']))
+            elements.append(Paragraph(f"Related Genres: {', '.join(genres)}", self.styles['Normal']))
             elements.append(Spacer(1, 12))
             
             # Add mood-specific recommendations
@@ -303,6 +412,7 @@ class PDFGenerator:
         """Generate discovery suggestions based on listening patterns"""
         suggestions = {
             "Similar Artists": [],
+            "More Like Your Favourite Songs": [],
             "Recommended Genres": [],
             "Hidden Gems": []
         }
@@ -315,6 +425,9 @@ class PDFGenerator:
         similar_artists = self.helpers._get_similar_artists(top_artists)
         suggestions["Similar Artists"] = similar_artists[:8]  # Limit to top 8 suggestions
     
+        # Songs that share listening sessions with the most played ones
+        suggestions["More Like Your Favourite Songs"] = self.helpers._get_more_like_this()
+    
         # Get genre recommendations based on listening history
         genre_suggestions = self.helpers._get_genre_recommendations()
         # Convert genre suggestions dictionary items to a list
@@ -0,0 +1,75 @@
+import time
+from typing import Callable, Dict, List, Optional, Set
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+from src.data.data_loader import DataLoader
+from src.data.folder_watcher import FolderChanges, FolderWatcher
+from src.report.pdf_generator import PDFGenerator
+
+# Which data categories each output is built from; an output is only
+# regenerated when one of its inputs changed
+OUTPUT_INPUTS: Dict[str, Set[str]] = {
+    'report': {'extended_history', 'recent_history'},
+}
+
+class ReportWatcher:
+    """Keep an analyzer live for a data folder and refresh outputs as export files arrive"""
+
+    def __init__(self, data_folder: str, output_factory: Callable[[], str], max_items: int = 20,
+                 chart_format: str = 'vector', interval: float = 5.0, timezone: Optional[str] = None,
+                 audio_features_path: Optional[str] = None, genres_path: Optional[str] = None):
+        self.analyzer = SpotifyAnalyzer(data_folder, max_items, timezone=timezone,
+                                        audio_features_path=audio_features_path, genres_path=genres_path)
+        self.watcher = FolderWatcher(data_folder)
+        self.output_factory = output_factory
+        self.chart_format = chart_format
+        self.interval = interval
+
+    def run(self) -> None:
+        print("Running initial analysis...")
+        self.watcher.mark_current()
+        self.analyzer.ingest_files(self.watcher.known_files())
+        self._regenerate(set(OUTPUT_INPUTS))
+
+        print(f"Watching {self.watcher.data_loader.data_folder} for changes (Ctrl+C to stop)...")
+        try:
+            while True:
+                time.sleep(self.interval)
+                changes = self.watcher.poll()
+                if changes:
+                    self.apply(changes)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+
+    def apply(self, changes: FolderChanges) -> None:
+        start_time = time.time()
+
+        if changes.changed or changes.removed:
+            # Plays already counted from a replaced or deleted file cannot be subtracted
+            # from the aggregates, so rebuild the affected categories from scratch
+            stale = self._categories([f.name for f in changes.changed] + changes.removed)
+            rebuild = self.analyzer.reset(stale)
+            print(f"Files changed or removed ({len(changes.changed) + len(changes.removed)}), "
+                  f"rebuilding {', '.join(sorted(rebuild))}...")
+            # Only files the watcher has accepted, so unsettled files are not counted twice
+            files = [f for f in self.watcher.known_files() if DataLoader.classify(f.name) in rebuild]
+            files += [f for f in changes.new if f not in files]
+            touched = rebuild | self.analyzer.ingest_files(files)
+        else:
+            print(f"Ingesting {len(changes.new)} new files...")
+            touched = self.analyzer.ingest_files(changes.new)
+
+        outputs = {output for output, inputs in OUTPUT_INPUTS.items() if inputs & touched}
+        self._regenerate(outputs)
+        print(f"Update complete in {time.time() - start_time:.2f} seconds")
+
+    def _categories(self, file_names: List[str]) -> Set[str]:
+        return {category for category in map(DataLoader.classify, file_names) if category}
+
+    def _regenerate(self, outputs: Set[str]) -> None:
+        if not outputs:
+            print("No outputs depend on the changed files, nothing to regenerate")
+            return
+        if 'report' in outputs:
+            output_file = self.output_factory()
+            PDFGenerator(self.analyzer, output_file, chart_format=self.chart_format).generate_report()
+            print(f"Report saved to: {output_file}")
@@ -1,6 +1,20 @@
 import matplotlib.pyplot as plt
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import io
+from reportlab.lib import colors
+from reportlab.graphics.shapes import Drawing, Rect, String
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+
+WEEKDAY_LABELS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# Same cycle matplotlib uses by default, so both chart paths look alike
+CHART_COLORS = [
+    colors.HexColor(c) for c in (
+        '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+        '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'
+    )
+]
 
 class ChartGenerator:
     @staticmethod
@@ -33,3 +47,123 @@ class ChartGenerator:
         plt.close()
         buf.seek(0)
         return buf
+
+    @staticmethod
+    def create_heatmap(matrix: List[List[float]], title: str, row_labels: List[str] = WEEKDAY_LABELS,
+                       column_labels: Optional[List[str]] = None) -> io.BytesIO:
+        column_labels = column_labels or ChartGenerator._hour_labels(len(matrix[0]))
+        plt.figure(figsize=(10, 4))
+        plt.imshow(matrix, cmap='Greens', aspect='auto')
+        plt.yticks(range(len(row_labels)), row_labels)
+        ticks = [(index, label) for index, label in enumerate(column_labels) if label]
+        plt.xticks([index for index, _ in ticks], [label for _, label in ticks])
+        plt.title(title)
+
+        buf = io.BytesIO()
+        plt.savefig(buf, format='png', bbox_inches='tight')
+        plt.close()
+        buf.seek(0)
+        return buf
+
+    @staticmethod
+    def create_vector_pie_chart(data: List[Tuple[str, int]], title: str,
+                                width: int = 400, height: int = 300) -> Drawing:
+        """Pie chart drawn with native PDF operations (no rasterization)"""
+        drawing = ChartGenerator._vector_canvas(title, width, height)
+        data = [(label, value) for label, value in data if value > 0]
+        if not data:
+            return ChartGenerator._add_no_data(drawing)
+
+        total = sum(value for _, value in data)
+        size = min(width, height) - 90
+
+        pie = Pie()
+        pie.x = (width - size) / 2
+        pie.y = (height - size) / 2 - 10
+        pie.width = size
+        pie.height = size
+        pie.data = [value for _, value in data]
+        pie.labels = [f"{label} ({value / total * 100:.1f}%)" for label, value in data]
+        pie.simpleLabels = 0
+        pie.slices.strokeColor = colors.white
+        pie.slices.strokeWidth = 0.5
+        pie.slices.fontSize = 8
+        for i in range(len(data)):
+            pie.slices[i].fillColor = CHART_COLORS[i % len(CHART_COLORS)]
+
+        drawing.add(pie)
+        return drawing
+
+    @staticmethod
+    def create_vector_bar_chart(data: List[Tuple[str, int]], title: str,
+                                width: int = 400, height: int = 300) -> Drawing:
+        """Bar chart drawn with native PDF operations (no rasterization)"""
+        drawing = ChartGenerator._vector_canvas(title, width, height)
+        if not data:
+            return ChartGenerator._add_no_data(drawing)
+
+        chart = VerticalBarChart()
+        chart.x = 50
+        chart.y = 70
+        chart.width = width - 70
+        chart.height = height - 110
+        chart.data = [[value for _, value in data]]
+        chart.bars[0].fillColor = CHART_COLORS[0]
+        chart.bars.strokeColor = None
+        chart.valueAxis.valueMin = 0
+        chart.valueAxis.labels.fontSize = 7
+        chart.categoryAxis.categoryNames = [str(label) for label, _ in data]
+        chart.categoryAxis.labels.angle = 45
+        chart.categoryAxis.labels.boxAnchor = 'ne'
+        chart.categoryAxis.labels.fontSize = 7
+
+        drawing.add(chart)
+        return drawing
+
+    @staticmethod
+    def create_vector_heatmap(matrix: List[List[float]], title: str, row_labels: List[str] = WEEKDAY_LABELS,
+                              width: int = 400, height: int = 200,
+                              column_labels: Optional[List[str]] = None) -> Drawing:
+        """Grid of shaded cells (e.g. weekday x hour) drawn with native PDF operations"""
+        drawing = ChartGenerator._vector_canvas(title, width, height)
+        peak = max((value for row in matrix for value in row), default=0)
+        if peak <= 0:
+            return ChartGenerator._add_no_data(drawing)
+
+        left, bottom = 30, 20
+        columns = len(matrix[0])
+        cell_width = (width - left - 5) / columns
+        cell_height = (height - bottom - 30) / len(matrix)
+        low, high = colors.HexColor('#f7fcf5'), colors.HexColor('#00441b')
+
+        for row_index, row in enumerate(matrix):
+            y = height - 30 - (row_index + 1) * cell_height
+            drawing.add(String(left - 4, y + cell_height / 2 - 3, row_labels[row_index],
+                               textAnchor='end', fontName='Helvetica', fontSize=7))
+            for column_index, value in enumerate(row):
+                drawing.add(Rect(left + column_index * cell_width, y, cell_width, cell_height,
+                                 fillColor=colors.linearlyInterpolatedColor(low, high, 0, 1, value / peak),
+                                 strokeColor=colors.white, strokeWidth=0.3))
+        for column_index, label in enumerate(column_labels or ChartGenerator._hour_labels(columns)):
+            if label:
+                drawing.add(String(left + (column_index + 0.5) * cell_width, bottom - 10, label,
+                                   textAnchor='middle', fontName='Helvetica', fontSize=7))
+        return drawing
+
+    @staticmethod
+    def _hour_labels(columns: int) -> List[str]:
+        return [f"{column:02d}" if column % 3 == 0 else '' for column in range(columns)]
+
+    @staticmethod
+    def _vector_canvas(title: str, width: int, height: int) -> Drawing:
+        drawing = Drawing(width, height)
+        drawing.add(String(width / 2, height - 15, title, textAnchor='middle',
+                           fontName='Helvetica-Bold', fontSize=12))
+        return drawing
+
+    @staticmethod
+    def _add_no_data(drawing: Drawing) -> Drawing:
+        drawing.add(String(drawing.width / 2, drawing.height / 2, "No data available",
+                           textAnchor='middle', fontName='Helvetica', fontSize=10,
+                           fillColor=colors.grey))
+        return drawing
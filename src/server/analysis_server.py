@@ -0,0 +1,331 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+from src.report.pdf_generator import PDFGenerator
+from src.utils.helpers import HelperMethods
+
+TIMEFRAMES = ('all', 'month', 'year', '2years')
+MAX_HEADER_BYTES = 64 * 1024
+
+STATUS_TEXT = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error'
+}
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class AnalysisService:
+    """One loaded export with warm aggregates, shared by all requests"""
+
+    def __init__(self, data_folder: str, max_items: int = 20, store_path: Optional[str] = None,
+                 report_dir: str = 'output', timezone: Optional[str] = None,
+                 audio_features_path: Optional[str] = None, genres_path: Optional[str] = None):
+        self.data_folder = data_folder
+        self.max_items = max_items
+        self.store_path = store_path
+        self.report_dir = report_dir
+        self.timezone = timezone
+        self.audio_features_path = audio_features_path
+        self.genres_path = genres_path
+        self.version = ''
+        self.generation = 0
+        self.analyzer: Optional[SpotifyAnalyzer] = None
+        self.helpers: Optional[HelperMethods] = None
+        self._recent_index: List[Tuple[datetime, str]] = []
+        self._cache: Dict[Tuple, Any] = {}
+
+    def load(self) -> None:
+        self.activate(self.prepare())
+
+    def prepare(self) -> Dict[str, Any]:
+        """Load the export and build warm indexes without touching the served state"""
+        analyzer = SpotifyAnalyzer(self.data_folder, self.max_items, store_path=self.store_path,
+                                   timezone=self.timezone, audio_features_path=self.audio_features_path,
+                                   genres_path=self.genres_path)
+        analyzer.analyze()
+        if not analyzer.store:
+            # Date range queries then only subtract prefix sums
+            analyzer.track_processor.time_cube('tracks')
+            analyzer.track_processor.time_cube('artists')
+
+        # Tracks ordered by last play, so a recent window is a bisect plus a slice
+        recent_index = sorted(
+            (track.last_played, key)
+            for key, track in analyzer.track_processor.tracks.items()
+            if track.last_played
+        )
+        return {
+            'analyzer': analyzer,
+            'recent_index': recent_index,
+            'fingerprint': analyzer.data_loader.fingerprint()
+        }
+
+    def activate(self, state: Dict[str, Any]) -> Optional[SpotifyAnalyzer]:
+        """Swap in prepared state; call from the event loop so no request sees it half-done.
+
+        Returns the analyzer that was replaced, for release() once nothing uses it any more.
+        """
+        previous = self.analyzer
+        self.analyzer = state['analyzer']
+        self.helpers = HelperMethods(self.analyzer)
+        self._recent_index = state['recent_index']
+        self._cache = {}
+        self.generation += 1
+        # Reloading an unchanged export keeps the version, so clients' ETags stay valid
+        self.version = state['fingerprint']
+        return previous
+
+    def release(self, analyzer: Optional[SpotifyAnalyzer]) -> None:
+        """Close a replaced analyzer's play store connection"""
+        if analyzer is not None:
+            analyzer.close()
+
+    def etag(self, path: str, query: Dict[str, List[str]]) -> str:
+        """ETag of a response, derived from the dataset version without computing the body"""
+        canonical = '&'.join(f"{k}={','.join(v)}" for k, v in sorted(query.items()))
+        # Timeframes are relative to today, so responses also change at midnight
+        digest = hashlib.sha1(f"{self.version}|{date.today()}|{path}?{canonical}".encode('utf-8')).hexdigest()
+        return f'"{digest[:32]}"'
+
+    def _cached(self, key: Tuple, compute):
+        key = (date.today(),) + key
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def top_tracks(self, timeframe: str, limit: int, start: Optional[date] = None,
+                   end: Optional[date] = None) -> List[Dict[str, Any]]:
+        ranked = self._cached(('top_tracks', timeframe, start, end),
+                              lambda: self.analyzer.get_top_tracks(timeframe, start, end))
+        return [{'track': key, 'ms_played': ms} for key, ms in ranked[:limit]]
+
+    def top_artists(self, timeframe: str, limit: int, start: Optional[date] = None,
+                    end: Optional[date] = None) -> List[Dict[str, Any]]:
+        ranked = self._cached(('top_artists', timeframe, start, end),
+                              lambda: self.analyzer.get_top_artists(timeframe, start, end))
+        return [{'artist': artist, 'ms_played': ms} for artist, ms in ranked[:limit]]
+
+    def peak_hours(self) -> str:
+        return self._cached(('peak_hours',), self.helpers._get_peak_listening_hours)
+
+    def recent(self, days: int, limit: int) -> Dict[str, Any]:
+        def compute():
+            cutoff = datetime.now() - timedelta(days=days)
+            start = bisect_left(self._recent_index, (cutoff, ''))
+            tracks = self.analyzer.track_processor.tracks
+            recent_tracks = Counter()
+            recent_artists = Counter()
+            for _, key in self._recent_index[start:]:
+                track = tracks[key]
+                recent_tracks[key] = track.play_count
+                recent_artists[track.artist] += track.play_count
+            return recent_tracks, recent_artists
+
+        recent_tracks, recent_artists = self._cached(('recent', days), compute)
+        return {
+            'days': days,
+            'tracks': [{'track': k, 'play_count': c} for k, c in recent_tracks.most_common(limit)],
+            'artists': [{'artist': a, 'play_count': c} for a, c in recent_artists.most_common(limit)]
+        }
+
+    def build_report(self) -> str:
+        """Write the PDF for the current dataset version (reused if already built)"""
+        digest = hashlib.sha1(f"{self.version}|{date.today()}".encode('utf-8')).hexdigest()[:12]
+        output_file = os.path.join(self.report_dir, f"spotify_analysis_{digest}.pdf")
+        if not os.path.exists(output_file):
+            PDFGenerator(self.analyzer, output_file).generate_report()
+        return output_file
+
+class AnalysisServer:
+    """Minimal asyncio HTTP/1.1 server exposing AnalysisService as JSON endpoints"""
+
+    def __init__(self, service: AnalysisService, host: str = '127.0.0.1', port: int = 8000):
+        self.service = service
+        self.host = host
+        self.port = port
+        # Report builds and reloads are CPU-bound; keep them off the event loop
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.routes = {
+            ('GET', '/top-tracks'): self._top_tracks,
+            ('GET', '/top-artists'): self._top_artists,
+            ('GET', '/peak-hours'): self._peak_hours,
+            ('GET', '/recent'): self._recent,
+            ('GET', '/report'): self._report,
+            ('POST', '/reload'): self._reload,
+        }
+
+    async def serve_forever(self) -> None:
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"Serving analysis of {self.service.data_folder} on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, target, headers = await self._read_request(reader)
+            except (HTTPError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                await self._send(writer, 400, self._json({'error': 'malformed request'}))
+                return
+
+            url = urlsplit(target)
+            query = parse_qs(url.query)
+            handler = self.routes.get((method, url.path))
+            if handler is None:
+                known_path = any(path == url.path for _, path in self.routes)
+                status = 405 if known_path else 404
+                await self._send(writer, status, self._json({'error': STATUS_TEXT[status]}))
+                return
+
+            etag = self.service.etag(url.path, query) if method == 'GET' else None
+            if etag and etag in self._parse_etags(headers.get('if-none-match', '')):
+                await self._send(writer, 304, b'', extra_headers={'ETag': etag})
+                return
+
+            try:
+                body, content_type = await handler(query)
+            except HTTPError as e:
+                await self._send(writer, e.status, self._json({'error': str(e)}))
+                return
+            except Exception as e:
+                await self._send(writer, 500, self._json({'error': str(e)}))
+                return
+
+            extra_headers = {'ETag': etag} if etag else {}
+            await self._send(writer, 200, body, content_type, extra_headers)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str]]:
+        head = await reader.readuntil(b'\r\n\r\n')
+        if len(head) > MAX_HEADER_BYTES:
+            raise HTTPError(400, 'headers too large')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0) or 0)
+        if length:
+            await reader.readexactly(length)  # Bodies are not used by any endpoint
+        return method.upper(), target, headers
+
+    @staticmethod
+    def _parse_etags(header: str) -> List[str]:
+        return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes,
+                    content_type: str = 'application/json', extra_headers: Optional[Dict[str, str]] = None) -> None:
+        headers = {
+            'Content-Type': content_type,
+            'Content-Length': str(len(body)),
+            'Connection': 'close',
+            'Cache-Control': 'no-cache'
+        }
+        headers.update(extra_headers or {})
+        head = f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + '\r\n'
+        writer.write(head.encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    def _json(payload: Any) -> bytes:
+        return json.dumps(payload, default=str).encode('utf-8')
+
+    @staticmethod
+    def _param(query: Dict[str, List[str]], name: str, default: str) -> str:
+        return query.get(name, [default])[0]
+
+    def _int_param(self, query: Dict[str, List[str]], name: str, default: int) -> int:
+        try:
+            value = int(self._param(query, name, str(default)))
+        except ValueError:
+            raise HTTPError(400, f"{name} must be an integer")
+        if value < 0:
+            raise HTTPError(400, f"{name} must not be negative")
+        return value
+
+    def _timeframe(self, query: Dict[str, List[str]]) -> str:
+        timeframe = self._param(query, 'timeframe', 'all')
+        if timeframe not in TIMEFRAMES:
+            raise HTTPError(400, f"timeframe must be one of {', '.join(TIMEFRAMES)}")
+        return timeframe
+
+    def _date_param(self, query: Dict[str, List[str]], name: str) -> Optional[date]:
+        value = self._param(query, name, '')
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise HTTPError(400, f"{name} must be a date (YYYY-MM-DD)")
+
+    async def _top_tracks(self, query):
+        limit = self._int_param(query, 'limit', self.service.max_items)
+        start, end = self._date_param(query, 'start'), self._date_param(query, 'end')
+        return self._json(self.service.top_tracks(self._timeframe(query), limit, start, end)), 'application/json'
+
+    async def _top_artists(self, query):
+        limit = self._int_param(query, 'limit', self.service.max_items)
+        start, end = self._date_param(query, 'start'), self._date_param(query, 'end')
+        return self._json(self.service.top_artists(self._timeframe(query), limit, start, end)), 'application/json'
+
+    async def _peak_hours(self, query):
+        return self._json({'peak_hours': self.service.peak_hours()}), 'application/json'
+
+    async def _recent(self, query):
+        days = self._int_param(query, 'days', 90)
+        limit = self._int_param(query, 'limit', self.service.max_items)
+        return self._json(self.service.recent(days, limit)), 'application/json'
+
+    async def _report(self, query):
+        loop = asyncio.get_running_loop()
+        output_file = await loop.run_in_executor(self.executor, self.service.build_report)
+        with open(output_file, 'rb') as f:
+            return f.read(), 'application/pdf'
+
+    async def _reload(self, query):
+        loop = asyncio.get_running_loop()
+        state = await loop.run_in_executor(self.executor, self.service.prepare)
+        previous = self.service.activate(state)
+        # Queries on the event loop see the new analyzer from here on; a report already
+        # queued on the executor may still use the old one, and runs before this
+        await loop.run_in_executor(self.executor, self.service.release, previous)
+        return self._json({
+            'version': self.service.version,
+            'generation': self.service.generation
+        }), 'application/json'
+
+def run_server(data_folder: str, max_items: int = 20, store_path: Optional[str] = None,
+               host: str = '127.0.0.1', port: int = 8000, timezone: Optional[str] = None,
+               audio_features_path: Optional[str] = None, genres_path: Optional[str] = None) -> None:
+    service = AnalysisService(data_folder, max_items, store_path, timezone=timezone,
+                              audio_features_path=audio_features_path, genres_path=genres_path)
+    print("Loading export...")
+    service.load()
+    try:
+        asyncio.run(AnalysisServer(service, host, port).serve_forever())
+    except KeyboardInterrupt:
+        print("Server stopped")
+    finally:
+        service.release(service.analyzer)
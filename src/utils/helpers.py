@@ -1,5 +1,35 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from collections import Counter
+import numpy as np
+from ..analyzer.moods import MOODS
+
+EPOCH_DATE = date(1970, 1, 1)
+
+# Session length buckets in minutes, (lower bound, label)
+SESSION_LENGTH_BUCKETS = [
+    (0, "Under 15 min"),
+    (15, "15-30 min"),
+    (30, "30-60 min"),
+    (60, "1-2 hours"),
+    (120, "Over 2 hours")
+]
+
+# Tempo bands in BPM, (lower bound, label)
+TEMPO_BANDS = [
+    (0, "Under 90 BPM"),
+    (90, "90-110 BPM"),
+    (110, "110-130 BPM"),
+    (130, "130-150 BPM"),
+    (150, "Over 150 BPM")
+]
+
+MOOD_GENRES = {
+    "Relaxing": ["Ambient", "Downtempo", "Acoustic"],
+    "Energetic": ["Rock", "Electronic", "Pop"],
+    "Melancholic": ["Alternative", "Indie", "Blues"],
+    "Happy": ["Pop", "Dance", "Feel-good"],
+    "Focus": ["Instrumental", "Classical", "Minimal"]
+}
 
 class HelperMethods:
     def __init__(self, analyzer):
@@ -28,62 +58,107 @@ class HelperMethods:
         return recent_artists
 
     def _calculate_daily_average(self):
-        """Calculate average daily listening time in hours"""
-        total_ms = sum(track.ms_played for track in self.analyzer.track_processor.tracks.values())
-        total_hours = total_ms / (1000 * 60 * 60)  # Convert ms to hours
-        
-        # Get date range from first to last play
-        dates = [track.last_played for track in self.analyzer.track_processor.tracks.values() 
-                if track.last_played]
-        if not dates:
+        """Calculate average daily listening time in hours from the first to the last listening day"""
+        daily_ms = self.analyzer.track_processor.daily_ms
+        if len(daily_ms) == 0:
             return 0
+        return daily_ms.sum() / (1000 * 60 * 60) / len(daily_ms)  # Convert ms to hours
+
+    def _count_active_days(self):
+        """Days with at least one play, and all days from the first to the last listening day"""
+        daily_plays = self.analyzer.track_processor.daily_plays
+        return int(np.count_nonzero(daily_plays)), len(daily_plays)
+
+    def _get_longest_streak(self):
+        """Longest run of consecutive listening days as (days, first date, last date)"""
+        active = self.analyzer.track_processor.daily_plays > 0
+        if not active.any():
+            return 0, None, None
+        
+        # Runs start where the day bitmap steps 0 -> 1 and end where it steps 1 -> 0
+        edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        longest = np.argmax(ends - starts)
+        return (int(ends[longest] - starts[longest]),
+                self._day_to_date(starts[longest]), self._day_to_date(ends[longest] - 1))
+
+    def _day_to_date(self, index):
+        """Calendar date of an index into the per-day arrays"""
+        return EPOCH_DATE + timedelta(days=int(self.analyzer.track_processor.first_day + index))
+
+    def _get_listening_calendar(self, weeks=53):
+        """Daily listening time in ms as a 7 x weeks grid ending with the last listening week,
+        plus a month label for each week column where a new month starts"""
+        processor = self.analyzer.track_processor
+        if processor.first_day is None:
+            return np.zeros((7, weeks), dtype=np.int64), [''] * weeks
+        
+        # Day numbers count from a Thursday, so day + 3 is a multiple of 7 on Mondays
+        last_day = processor.first_day + len(processor.daily_ms) - 1
+        grid_end = last_day + 6 - (last_day + 3) % 7
+        grid_start = grid_end - 7 * weeks + 1
         
-        date_range = (max(dates) - min(dates)).days + 1
-        return total_hours / date_range if date_range > 0 else 0
+        index = np.arange(grid_start, grid_end + 1) - processor.first_day
+        inside = (index >= 0) & (index < len(processor.daily_ms))
+        values = np.zeros(len(index), dtype=np.int64)
+        values[inside] = processor.daily_ms[index[inside]]
+        
+        labels = []
+        previous_month = None
+        for week in range(weeks):
+            monday = EPOCH_DATE + timedelta(days=grid_start + 7 * week)
+            labels.append(monday.strftime('%b') if monday.month != previous_month else '')
+            previous_month = monday.month
+        return values.reshape(weeks, 7).T, labels
+
+    def _get_session_stats(self):
+        """Session count, median session length in minutes, average tracks per session
+        and sessions per active listening day"""
+        sessions = self.analyzer.track_processor.sessions.columns()
+        if len(sessions['start']) == 0:
+            return 0, 0, 0, 0
+        
+        minutes = (sessions['end'] - sessions['start']) / 60
+        active_days, _ = self._count_active_days()
+        per_day = len(minutes) / active_days if active_days else 0
+        return len(minutes), float(np.median(minutes)), float(sessions['plays'].mean()), per_day
+
+    def _get_session_length_distribution(self):
+        """Number of sessions in each SESSION_LENGTH_BUCKETS bucket, shortest first"""
+        sessions = self.analyzer.track_processor.sessions.columns()
+        minutes = (sessions['end'] - sessions['start']) / 60
+        edges = [bound for bound, _ in SESSION_LENGTH_BUCKETS] + [np.inf]
+        counts, _ = np.histogram(minutes, bins=edges)
+        return [(label, int(count)) for (_, label), count in zip(SESSION_LENGTH_BUCKETS, counts)]
 
     def _get_peak_listening_hours(self):
         """Determine peak listening hours"""
-        hour_counts = Counter()
-        
-        for track in self.analyzer.track_processor.tracks.values():
-            if track.last_played:
-                hour_counts[track.last_played.hour] += track.ms_played
-            
-        peak_hours = sorted(hour_counts.items(), key=lambda x: x[1], reverse=True)[:2]
-        return f"{peak_hours[0][0]:02d}:00-{peak_hours[0][0]+1:02d}:00 and {peak_hours[1][0]:02d}:00-{peak_hours[1][0]+1:02d}:00"
+        hourly = self._get_hour_of_week_heatmap().sum(axis=0)
+        peak_hours = [hour for hour in hourly.argsort()[::-1][:2] if hourly[hour] > 0]
+        if not peak_hours:
+            return "Not enough data"
+        return " and ".join(f"{hour:02d}:00-{hour + 1:02d}:00" for hour in peak_hours)
+
+    def _get_hour_of_week_heatmap(self):
+        """Listening time in ms as a 7x24 (weekday x hour) array, Monday first"""
+        return self.analyzer.track_processor.hour_of_week_ms.reshape(7, 24)
 
     def _analyze_genres(self, days=None):
-        """Analyze genre distribution based on artist genres"""
-        # This is a simplified version - in real implementation, you'd want to use
-        # Spotify's API to get actual genre information
-        genres = Counter({
-            "Rock": 0,
-            "Electronic": 0,
-            "Pop": 0,
-            "Hip Hop": 0,
-            "Alternative": 0
-        })
-        
-        # Manually classify some artists based on the data we have
-        genre_mapping = {
-            "Muse": "Rock",
-            "Depeche Mode": "Electronic",
-            "Twenty One Pilots": "Alternative",
-            "Princess Goes": "Alternative",
-            "Vulfpeck": "Pop",
-            "Nine Inch Nails": "Electronic",
-            "Metallica": "Rock"
-        }
-        
-        cutoff_date = datetime.now() - timedelta(days=days) if days else None
+        """Listening time per genre, each artist's time spread over its mapped genres"""
+        processor = self.analyzer.track_processor
+        genre_map = self.analyzer.genre_map
+        if days:
+            # Exact listening inside the window, from the artist time cube
+            cube = processor.time_cube('artists')
+            today = (date.today() - EPOCH_DATE).days
+            artists, ms_played = cube.names, cube.totals(today - days, None)
+        else:
+            artists = list(processor.artists)
+            ms_played = np.fromiter(processor.artists.values(), dtype=np.int64, count=len(artists))
         
-        for track in self.analyzer.track_processor.tracks.values():
-            if track.artist in genre_mapping:
-                # Only count if within the date range (if specified)
-                if not cutoff_date or (track.last_played and track.last_played >= cutoff_date):
-                    genres[genre_mapping[track.artist]] += track.ms_played
-        
-        return genres
+        distribution = genre_map.distribution(artists, ms_played)
+        return Counter({genre: int(ms) for genre, ms in zip(genre_map.genres, distribution.tolist())})
 
     def _calculate_artist_playtime(self, artist):
         """Calculate total playtime for an artist in hours"""
@@ -93,26 +168,61 @@ class HelperMethods:
 
     def _get_mood_related_artists(self, mood):
         """Get artists related to specific mood based on listening patterns"""
-        # Create mood categories based on audio features and listening patterns
-        recent_artists = self._get_recent_artists(days=90)
-        top_artists = [artist for artist, _ in recent_artists.most_common(20)]
-        
-        # Analyze patterns and categorize artists
-        mood_artists = {
-            "Relaxing": [],
-            "Energetic": [],
-            "Melancholic": [],
-            "Happy": [],
-            "Focus": []
-        }
+        if mood not in MOODS:
+            return []
+        processor = self.analyzer.track_processor
+        names, artist_of_track = processor.artist_index()
+        ms_played = np.fromiter((track.ms_played for track in processor.tracks.values()),
+                                dtype=np.int64, count=len(processor.tracks))
+        scores = processor.mood_engine().artist_scores(artist_of_track, ms_played, len(names))
         
-        # Categorize artists based on their typical genres and your listening patterns
-        for artist in top_artists:
-            # Add logic here to categorize artists based on their characteristics
-            # This is a placeholder - you'd want to implement proper categorization
-            pass
+        # Artists whose listening fits this mood better than any other, most played first
+        column = MOODS.index(mood)
+        fitting = np.flatnonzero((scores.argmax(axis=1) == column) & (scores[:, column] > 0))
+        listened = np.bincount(artist_of_track, weights=ms_played, minlength=len(names))
+        artists = [names[i] for i in fitting[np.argsort(-listened[fitting], kind='stable')][:10]]
         
-        return mood_artists.get(mood, [])
+        # Fill up with artists close to those in the listening embedding (or to artists whose genre fits)
+        seeds = artists or [artist for artist, _ in self.analyzer.genre_map.artists_in(MOOD_GENRES[mood])]
+        embeddings = processor.artist_embeddings()
+        vector = embeddings.vector(seeds)
+        if vector is not None and len(artists) < 10:
+            artists.extend(artist for artist, _ in embeddings.nearest(vector, k=10, exclude=tuple(artists)))
+        return artists[:10]
+
+    def _get_mood_distribution(self):
+        """Listening time in ms per track mood"""
+        moods = Counter()
+        for track in self.analyzer.track_processor.tracks.values():
+            if track.mood:
+                moods[track.mood] += track.ms_played
+        return moods
+
+    def _get_audio_profile(self):
+        """Listening-weighted average of each audio feature, over the tracks that have it"""
+        processor = self.analyzer.track_processor
+        ms_played = np.fromiter((track.ms_played for track in processor.tracks.values()),
+                                dtype=np.float64, count=len(processor.tracks))
+        profile = {}
+        for name, values in processor.audio_features.items():
+            weights = ms_played[:len(values)]
+            known = ~np.isnan(values)
+            if weights[known].sum() > 0:
+                profile[name] = float(np.average(values[known], weights=weights[known]))
+        return profile
+
+    def _get_tempo_distribution(self):
+        """Listening time in ms per TEMPO_BANDS band, over tracks with a known tempo"""
+        processor = self.analyzer.track_processor
+        tempo = processor.audio_features.get('tempo')
+        if tempo is None:
+            return Counter()
+        ms_played = np.fromiter((track.ms_played for track in processor.tracks.values()),
+                                dtype=np.float64, count=len(processor.tracks))[:len(tempo)]
+        known = ~np.isnan(tempo)
+        edges = [bound for bound, _ in TEMPO_BANDS] + [np.inf]
+        totals, _ = np.histogram(tempo[known], bins=edges, weights=ms_played[known])
+        return Counter({label: int(total) for (_, label), total in zip(TEMPO_BANDS, totals) if total > 0})
 
     def _generate_discovery_suggestions(self):
         """Generate discovery suggestions based on listening patterns"""
@@ -136,7 +246,18 @@ class HelperMethods:
                 "Laura Jane Grace"
             ]
         }
-        return suggestions
+        
+        # Artists you play alongside your favourites, from the co-listening graph
+        graph = self.analyzer.track_processor.artist_graph()
+        top_artists = [artist for artist, _ in Counter(self.analyzer.track_processor.artists).most_common(3)]
+        listened = {}
+        for artist in top_artists:
+            # Your other favourites are not news, so leave them out
+            neighbours = [neighbour for neighbour, _ in graph.neighbours(artist, k=4 + len(top_artists))
+                          if neighbour not in top_artists][:4]
+            if neighbours:
+                listened[f"Similar to {artist}"] = neighbours
+        return listened or suggestions
 
     def _get_similar_artists(self, artists: list) -> list:
         """Get similar artists based on input artists list"""
@@ -177,6 +298,10 @@ class HelperMethods:
             ]
         }
         
+        # Artists closest to the input ones in the listening embedding come first
+        embeddings = self.analyzer.track_processor.artist_embeddings()
+        similar_artists.extend(artist for artist, _ in embeddings.similar(artists, k=20))
+        
         # Collect similar artists for each input artist
         for artist in artists:
             if artist in artist_similarities:
@@ -185,48 +310,26 @@ class HelperMethods:
         # Remove duplicates while preserving order
         return list(dict.fromkeys(similar_artists))
 
+    def _get_more_like_this(self, count=5, limit=8):
+        """Songs often played in the same sessions as your most played ones"""
+        processor = self.analyzer.track_processor
+        favourites = sorted(processor.tracks, key=lambda key: processor.tracks[key].play_count, reverse=True)[:count]
+        similar = processor.track_similarity().more_like(favourites, k=limit)
+        return [f"{processor.tracks[key].name} by {processor.tracks[key].artist}"
+                for key, _ in similar if key in processor.tracks]
+
     def _get_genre_recommendations(self):
         """Get genre-based recommendations"""
-        genre_recommendations = {
-            "Rock": [
-                "Tool",
-                "A Perfect Circle",
-                "Queens of the Stone Age",
-                "System of a Down"
-            ],
-            "Electronic": [
-                "Front 242",
-                "Covenant",
-                "VNV Nation",
-                "Assemblage 23"
-            ],
-            "Alternative": [
-                "The Dresden Dolls",
-                "Placebo",
-                "The Decemberists",
-                "Modest Mouse"
-            ],
-            "Pop": [
-                "Theo Katzman",
-                "Joey Dosik",
-                "Lawrence",
-                "Lake Street Dive"
-            ],
-            "Hip Hop": [
-                "Run the Jewels",
-                "Aesop Rock",
-                "MF DOOM",
-                "Del the Funky Homosapien"
-            ]
-        }
-        
-        # Get the user's top genres based on listening history
-        top_genres = self._analyze_genres().most_common(3)
+        listened = self.analyzer.track_processor.artists
+        top_genres = [genre for genre, ms in self._analyze_genres().most_common(3) if ms > 0]
         recommendations = {}
         
-        for genre, _ in top_genres:
-            if genre in genre_recommendations:
-                recommendations[f"Based on your {genre} listening"] = genre_recommendations[genre]
+        for genre in top_genres:
+            # Artists the genre mapping puts in this genre that are not in your history yet
+            artists = [artist for artist, _ in self.analyzer.genre_map.artists_in([genre])
+                       if artist not in listened][:4]
+            if artists:
+                recommendations[f"Based on your {genre} listening"] = artists
             
         return recommendations
 
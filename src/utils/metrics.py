@@ -0,0 +1,109 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+@dataclass
+class StageRecord:
+    name: str
+    parent: Optional[str] = None
+    depth: int = 0
+    details: Dict[str, Any] = field(default_factory=dict)
+    records: Optional[int] = None
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_memory: int = 0
+
+class MetricsRecorder:
+    """Collects wall time, CPU time, record counts and tracemalloc peaks per pipeline stage.
+
+    Disabled by default, in which case stage() costs a single attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages: List[StageRecord] = []
+        self._stack: List[StageRecord] = []
+        self._child_peaks: List[int] = []
+        self._null_stage = StageRecord('disabled')
+
+    def enable(self) -> None:
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self) -> None:
+        self.stages = []
+        self._stack = []
+        self._child_peaks = []
+
+    @contextmanager
+    def stage(self, name: str, records: Optional[int] = None, **details):
+        """Time a block; set `.records` on the yielded record if the count is only known inside"""
+        if not self.enabled:
+            yield self._null_stage
+            return
+
+        record = StageRecord(
+            name=name,
+            parent=self._stack[-1].name if self._stack else None,
+            depth=len(self._stack),
+            details=details,
+            records=records
+        )
+        self.stages.append(record)
+
+        # tracemalloc has one global peak, so fold the peak seen so far into the
+        # enclosing stage before resetting it for this one
+        self._fold_peak()
+        self._stack.append(record)
+        self._child_peaks.append(0)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_time = time.perf_counter() - wall_start
+            record.cpu_time = time.process_time() - cpu_start
+            _, peak = tracemalloc.get_traced_memory()
+            record.peak_memory = max(peak, self._child_peaks.pop())
+            self._stack.pop()
+            if self._child_peaks:
+                self._child_peaks[-1] = max(self._child_peaks[-1], record.peak_memory)
+            tracemalloc.reset_peak()
+
+    def _fold_peak(self) -> None:
+        if self._child_peaks:
+            _, peak = tracemalloc.get_traced_memory()
+            self._child_peaks[-1] = max(self._child_peaks[-1], peak)
+        tracemalloc.reset_peak()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_wall_time': sum(s.wall_time for s in self.stages if s.parent is None),
+            'stages': [asdict(s) for s in self.stages]
+        }
+
+    def export_json(self, output_file: str) -> None:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def print_summary(self) -> None:
+        print(f"{'Stage':<45} {'Wall (s)':>9} {'CPU (s)':>9} {'Records':>10} {'Peak MB':>9}")
+        for s in self.stages:
+            label = s.name + ''.join(f" [{v}]" for v in s.details.values())
+            label = ('  ' * s.depth + label)[:45]
+            records = '' if s.records is None else str(s.records)
+            print(f"{label:<45} {s.wall_time:>9.3f} {s.cpu_time:>9.3f} {records:>10} "
+                  f"{s.peak_memory / (1024 * 1024):>9.1f}")
+
+# Shared recorder used by the whole pipeline
+metrics = MetricsRecorder()
@@ -0,0 +1,28 @@
+import pytest
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+from src.data.audio_features import URI_PREFIX
+from src.data.synthetic_export import MIN_PLAYS, SyntheticExportGenerator
+
+@pytest.fixture(scope='session')
+def export_folder(tmp_path_factory):
+    """A small synthetic export with extended history, recent history and a marquee file"""
+    folder = tmp_path_factory.mktemp('export')
+    SyntheticExportGenerator(str(folder), plays=MIN_PLAYS, seed=7, years=2).generate()
+    return str(folder)
+
+@pytest.fixture(scope='session')
+def recordings(export_folder):
+    """Mock API objects for every track in the export, with one artist object per artist name"""
+    analyzer = SpotifyAnalyzer(export_folder)
+    analyzer.analyze()
+    artist_ids = {}
+    recordings = {'tracks': {}, 'artists': {}, 'audio-features': {}}
+    for track in analyzer.track_processor.tracks.values():
+        if not track.uri.startswith(URI_PREFIX):
+            continue
+        track_id = track.uri[len(URI_PREFIX):]
+        artist_id = artist_ids.setdefault(track.artist, f"a{len(artist_ids):021d}")
+        recordings['tracks'][track_id] = {'id': track_id, 'artists': [{'id': artist_id, 'name': track.artist}]}
+        recordings['artists'][artist_id] = {'id': artist_id, 'name': track.artist, 'genres': ['pop']}
+        recordings['audio-features'][track_id] = {'id': track_id, 'energy': 0.5, 'valence': 0.5}
+    return recordings
@@ -0,0 +1,28 @@
+import asyncio
+import json
+import sqlite3
+import pytest
+from src.server.analysis_server import AnalysisServer, AnalysisService
+
+def test_store_queries_after_reload(export_folder, tmp_path):
+    service = AnalysisService(export_folder, store_path=str(tmp_path / 'plays.sqlite'),
+                              report_dir=str(tmp_path / 'reports'))
+    service.load()
+    server = AnalysisServer(service)
+
+    async def reload_then_query():
+        # The reload opens a new store in the executor thread; queries run on the event loop
+        await server._reload({})
+        tracks, _ = await server._top_tracks({})
+        artists, _ = await server._top_artists({})
+        return json.loads(tracks), json.loads(artists)
+
+    first = service.analyzer
+    tracks, artists = asyncio.run(reload_then_query())
+    assert service.generation == 2
+    # The replaced analyzer's store connection is closed, the new one still serves
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.store.get_top_tracks()
+    assert service.analyzer.store.get_top_tracks()
+    assert tracks and artists
+    assert tracks == sorted(tracks, key=lambda item: item['ms_played'], reverse=True)
@@ -0,0 +1,30 @@
+import os
+import shutil
+from src.analyzer.dataset_manager import DatasetManager, estimate_footprint
+
+def test_footprint_counts_arrays_and_caches(export_folder, tmp_path):
+    manager = DatasetManager(snapshot_dir=str(tmp_path))
+    analyzer = manager.get(export_folder)
+    processor = analyzer.track_processor
+    before = estimate_footprint(analyzer)
+    play_log_bytes = sum(column.nbytes for column in processor.play_log())
+    assert before > processor.daily_ms.nbytes + processor.track_time_ms.nbytes + play_log_bytes
+
+    processor.time_cube('tracks')
+    processor.artist_graph()
+    assert estimate_footprint(analyzer) > before
+
+def test_evicted_analyzer_restores_from_snapshot(export_folder, tmp_path):
+    second = tmp_path / 'second'
+    shutil.copytree(export_folder, second)
+    os.remove(next(second.glob('Marquee*.json')))  # A different fingerprint
+    manager = DatasetManager(memory_budget_mb=0, snapshot_dir=str(tmp_path / 'snapshots'))
+    first = manager.get(export_folder)
+    manager.get(str(second))
+    assert manager.stats['evictions'] == 1
+    assert any(path.suffix == '.snapshot' for path in (tmp_path / 'snapshots').iterdir())
+    assert any(path.name.endswith('.embeddings.npz') for path in (tmp_path / 'snapshots').iterdir())
+
+    restored = manager.get(export_folder)
+    assert manager.stats['snapshot_loads'] == 1
+    assert restored.get_top_tracks() == first.get_top_tracks()
@@ -0,0 +1,31 @@
+from src.analyzer.enrichment_pipeline import EnrichmentPipeline
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+from src.data.response_cache import ResponseCache
+from src.data.spotify_client import SpotifyClient
+from src.data.spotify_mock import MockSpotifyServer
+
+def test_each_object_is_fetched_once(export_folder, recordings, tmp_path):
+    server = MockSpotifyServer(recordings).start()
+    try:
+        cache = ResponseCache(str(tmp_path / 'responses.sqlite'))
+        with SpotifyClient(token='token', api_url=f"{server.url}/v1", cache=cache) as client:
+            analyzer = SpotifyAnalyzer(export_folder)
+            enrichment = EnrichmentPipeline(analyzer, client).run()
+            # A fresh cache only hits when the same ID is asked for twice
+            assert client.stats['cache_hits'] == 0
+    finally:
+        server.stop()
+    top_artists = {artist for artist, _ in analyzer.get_top_artists()}
+    assert top_artists <= {artist['name'] for artist in enrichment.artists.values() if artist}
+
+def test_api_errors_fall_back_to_local_data(export_folder, monkeypatch):
+    monkeypatch.delenv('SPOTIPY_CLIENT_ID', raising=False)
+    monkeypatch.delenv('SPOTIPY_CLIENT_SECRET', raising=False)
+    with SpotifyClient(api_url='http://127.0.0.1:9/v1') as client:
+        analyzer = SpotifyAnalyzer(export_folder)
+        enrichment = EnrichmentPipeline(analyzer, client).run()
+    local = SpotifyAnalyzer(export_folder)
+    local.analyze()
+    assert not any(enrichment.artists.values())
+    assert analyzer.get_top_tracks() == local.get_top_tracks()
+    assert analyzer.genre_map.artists == local.genre_map.artists
@@ -0,0 +1,21 @@
+import pytest
+from src.analyzer.snapshot import load_snapshot, read_sections, save_snapshot
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+
+def test_restore_copies_columns_and_closes_the_map(export_folder, tmp_path):
+    analyzer = SpotifyAnalyzer(export_folder)
+    analyzer.analyze()
+    path = str(tmp_path / 'export.snapshot')
+    save_snapshot(analyzer.track_processor, analyzer.marquee_segments, path)
+
+    processor, marquee_segments = load_snapshot(path)
+    assert marquee_segments == analyzer.marquee_segments
+    for column in (processor.daily_ms, processor.hour_of_week_ms, processor.track_time_ms, *processor.play_log()):
+        assert column.flags.writeable
+    assert (processor.daily_ms == analyzer.track_processor.daily_ms).all()
+
+    with read_sections(path) as sections:
+        daily_ms = sections['daily.ms']
+        assert list(daily_ms) == analyzer.track_processor.daily_ms.tolist()
+    with pytest.raises(ValueError):
+        daily_ms[0]
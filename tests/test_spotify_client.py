@@ -0,0 +1,56 @@
+from src.data.audio_features import URI_PREFIX
+from src.data.response_cache import ResponseCache
+from src.data.spotify_client import BATCH_SIZES, SpotifyClient
+from src.data.spotify_mock import MockSpotifyServer
+
+UNKNOWN_URIS = [f"{URI_PREFIX}unknown{n:015d}" for n in range(3)]
+
+def _uris(recordings):
+    return [URI_PREFIX + track_id for track_id in recordings['tracks']] + UNKNOWN_URIS
+
+def _enrich(server, cache_path, uris, **cache_options):
+    with SpotifyClient(token='token', api_url=f"{server.url}/v1",
+                       cache=ResponseCache(cache_path, **cache_options)) as client:
+        return client.enrich(uris), client.stats
+
+def test_second_run_is_served_from_the_cache(recordings, tmp_path):
+    uris = _uris(recordings)
+    server = MockSpotifyServer(recordings, closed=['audio-features']).start()
+    try:
+        first, first_stats = _enrich(server, str(tmp_path / 'responses.sqlite'), uris)
+        second, second_stats = _enrich(server, str(tmp_path / 'responses.sqlite'), uris)
+    finally:
+        server.stop()
+    assert first_stats['requests'] > 0
+    # Unknown IDs and the refused audio-features endpoint are cached as negatives too
+    assert second_stats['requests'] == 0
+    assert second.tracks == first.tracks and second.artists == first.artists
+    assert second.audio_features == first.audio_features == {}
+
+def test_expired_negative_entries_are_fetched_again(recordings, tmp_path):
+    uris = _uris(recordings)
+    server = MockSpotifyServer(recordings).start()
+    try:
+        _enrich(server, str(tmp_path / 'responses.sqlite'), uris, negative_ttl=0)
+        second, stats = _enrich(server, str(tmp_path / 'responses.sqlite'), uris, negative_ttl=0)
+    finally:
+        server.stop()
+    # Only the unknown IDs go out again: one tracks batch and one audio-features batch
+    assert stats['requests'] == 2
+    assert all(second.tracks[uri[len(URI_PREFIX):]] is None for uri in UNKNOWN_URIS)
+    assert len(second.audio_features) == len(uris)
+
+def test_rate_limits_and_server_errors_are_retried(recordings):
+    track_ids = list(recordings['tracks'])[:400]
+    server = MockSpotifyServer(recordings, rate_limit=4, failures=2).start()
+    try:
+        with SpotifyClient(token='token', api_url=f"{server.url}/v1") as client:
+            tracks = client.fetch('tracks', track_ids)
+            stats = client.stats
+    finally:
+        server.stop()
+    assert server.stats['rate_limited'] > 0 and stats['rate_limited'] == server.stats['rate_limited']
+    assert server.stats['server_errors'] == 2 and stats['retries'] >= 2
+    assert tracks == {track_id: recordings['tracks'][track_id] for track_id in track_ids}
+    # Full batches, never more IDs than the endpoint accepts
+    assert server.stats['max_batch'] == BATCH_SIZES['tracks']
@@ -0,0 +1,135 @@
+from src.analyzer.spotify_analyzer import SpotifyAnalyzer
+from src.analyzer.track_processor import TrackProcessor, is_track_play
+from src.data.data_loader import DataLoader
+
+def _extended_ms(export_folder):
+    """Listening time in the extended history, which the recent history repeats"""
+    data = DataLoader(export_folder).load_all_files()
+    assert data['recent_history'], 'the export should have recent history overlapping the extended one'
+    return sum(item.get('ms_played', 0) for item in data['extended_history']
+               if item.get('ts') and not item.get('skipped', False) and is_track_play(item))
+
+def test_time_bins_count_extended_history_once(export_folder):
+    analyzer = SpotifyAnalyzer(export_folder)
+    analyzer.analyze()
+    processor = analyzer.track_processor
+    expected = _extended_ms(export_folder)
+    assert processor.daily_ms.sum() == expected
+    assert processor.hour_of_week_ms.sum() == expected
+    assert processor.track_time_ms.sum() == expected
+
+def test_time_bins_after_store_restore(export_folder, tmp_path):
+    store_path = str(tmp_path / 'plays.sqlite')
+    SpotifyAnalyzer(export_folder, store_path=store_path).analyze()
+    restored = SpotifyAnalyzer(export_folder, store_path=store_path)
+    restored.analyze()
+    expected = _extended_ms(export_folder)
+    assert restored.track_processor.daily_ms.sum() == expected
+    assert restored.track_processor.hour_of_week_ms.sum() == expected
+
+def test_year_partitions_after_store_restore(export_folder, tmp_path):
+    store_path = str(tmp_path / 'plays.sqlite')
+    fresh = SpotifyAnalyzer(export_folder, store_path=store_path)
+    fresh.analyze()
+    restored = SpotifyAnalyzer(export_folder, store_path=store_path)
+    restored.analyze()
+    for analyzer in (fresh, restored):
+        partitions = analyzer.get_year_partitions()
+        lifetime = partitions.lifetime()
+        assert len(partitions.years) >= 2
+        assert lifetime.ms_played == analyzer.track_processor.daily_ms.sum()
+        assert sum(lifetime.monthly_ms) == lifetime.ms_played
+        assert sum(lifetime.tracks.values()) == sum(track.ms_played for track in analyzer.track_processor.tracks.values())
+    expected, actual = fresh.get_year_partitions().years, restored.get_year_partitions().years
+    assert expected.keys() == actual.keys()
+    for year in expected:
+        assert expected[year].ms_played == actual[year].ms_played
+        assert expected[year].days == actual[year].days
+        assert expected[year].tracks.most_common(5) == actual[year].tracks.most_common(5)
+
+def test_replaced_file_rebuilds_only_its_year_partitions(export_folder, tmp_path):
+    import json
+    import shutil
+
+    folder = tmp_path / 'export'
+    shutil.copytree(export_folder, folder)
+    # Split the extended history into one file per year, like real exports
+    extended = next(folder.glob('Streaming_History_Audio_*.json'))
+    with open(extended, encoding='utf-8') as f:
+        plays = json.load(f)
+    extended.unlink()
+    by_year = {}
+    for item in plays:
+        by_year.setdefault(item['ts'][:4], []).append(item)
+    for year, items in by_year.items():
+        with open(folder / f'Streaming_History_Audio_{year}_0.json', 'w', encoding='utf-8') as f:
+            json.dump(items, f)
+
+    analyzer = SpotifyAnalyzer(str(folder))
+    analyzer.analyze()
+    before = {name: partition.years for name, partition in analyzer.get_year_partitions().files.items()}
+    first, last = min(by_year), max(by_year)
+    replaced = f'Streaming_History_Audio_{last}_0.json'
+    with open(folder / replaced, 'w', encoding='utf-8') as f:
+        json.dump(by_year[last][::2], f)
+
+    # What ReportWatcher does when a history file changes
+    analyzer.reset({'extended_history'})
+    analyzer.ingest_files(sorted(folder.glob('*.json')))
+    after = analyzer.get_year_partitions()
+    assert after.files[f'Streaming_History_Audio_{first}_0.json'].years is before[f'Streaming_History_Audio_{first}_0.json']
+    assert after.files[replaced].years is not before[replaced]
+
+    fresh = SpotifyAnalyzer(str(folder))
+    fresh.analyze()
+    expected = fresh.get_year_partitions().years
+    assert after.years.keys() == expected.keys()
+    for year, summary in expected.items():
+        assert after.years[year].ms_played == summary.ms_played
+        assert after.years[year].days == summary.days
+        assert after.years[year].tracks == summary.tracks
+    assert after.lifetime().ms_played == analyzer.track_processor.daily_ms.sum()
+
+def test_plays_without_track_metadata_are_left_out(export_folder, tmp_path):
+    import json
+    import shutil
+    from src.analyzer.moods import MOODS
+    from src.utils.helpers import HelperMethods
+
+    folder = tmp_path / 'export'
+    shutil.copytree(export_folder, folder)
+    # Podcast episodes in the extended history have null track, artist and album fields
+    episodes = [{
+        'ts': f'2025-01-{day:02d}T21:00:00Z', 'ms_played': 3_600_000, 'skipped': False,
+        'master_metadata_track_name': None, 'master_metadata_album_artist_name': None,
+        'master_metadata_album_album_name': None, 'spotify_track_uri': None,
+        'episode_name': 'Episode', 'episode_show_name': 'Show',
+    } for day in range(1, 29)]
+    with open(folder / 'Streaming_History_Audio_2025_9.json', 'w', encoding='utf-8') as f:
+        json.dump(episodes, f)
+
+    analyzer = SpotifyAnalyzer(str(folder))
+    analyzer.analyze()
+    processor = analyzer.track_processor
+    assert None not in processor.artists
+    assert all(track.name and track.artist for track in processor.tracks.values())
+    assert len(processor.mood_engine().scores) == len(processor.tracks)
+    helpers = HelperMethods(analyzer)
+    for mood in MOODS:
+        assert all(isinstance(artist, str) for artist in helpers._get_mood_related_artists(mood))
+
+def test_skips_count_when_the_track_is_played_in_a_later_file():
+    def play(day, skipped):
+        return {'ts': f'2024-03-{day:02d}T10:00:00Z', 'ms_played': 200_000, 'skipped': skipped,
+                'master_metadata_track_name': 'Song', 'master_metadata_album_artist_name': 'Artist'}
+    skips = [play(1, True), play(2, True)]
+    plays = [play(3, False)]
+
+    together = TrackProcessor()
+    together.process_extended_history(skips + plays)
+    one_file_at_a_time = TrackProcessor()
+    one_file_at_a_time.process_extended_history(skips)
+    one_file_at_a_time.process_extended_history(plays)
+    assert together.tracks['Song:Artist'].skip_count == 2
+    assert one_file_at_a_time.tracks['Song:Artist'].skip_count == 2
+    assert not one_file_at_a_time.pending_skips